@@ -0,0 +1,92 @@
+"""
+Requêtes de tableau de bord : scan des événements bruts vs agrégats journaliers
+
+Usage : python -m benchmarks.bench_agregats [--evenements 1000000] [--annonces 5000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.database import Database
+
+SOURCES = [None, 'facebook', 'google', 'whatsapp', 'newsletter']
+
+
+def remplir(db: Database, annonces: int, evenements: int) -> None:
+    """Insérer des annonces et des événements répartis sur 180 jours."""
+    maintenant = datetime.utcnow()
+    with db.connexion() as conn:
+        conn.executemany('''
+            INSERT INTO annonces (titre, description, categorie, type_annonce, prix, localisation,
+                                  ville, contact_nom, contact_telephone, statut)
+            VALUES (?, 'Description', ?, 'vente', 1000, 'Centre', 'Libreville', 'Test', '0', 'publie')
+        ''', ((f"Annonce {i}", random.choice(['immobilier', 'vehicules', 'informatique']))
+              for i in range(annonces)))
+        conn.executemany('''
+            INSERT INTO analytics (annonce_id, type_evenement, source_utm, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', ((random.randint(1, annonces), random.choice(['vue', 'vue', 'vue', 'clic_contact', 'partage']),
+               random.choice(SOURCES),
+               (maintenant - timedelta(seconds=random.randint(0, 180 * 86400))).strftime('%Y-%m-%d %H:%M:%S'))
+              for _ in range(evenements)))
+        conn.commit()
+
+
+def chronometrer(fonction, repetitions: int = 3) -> float:
+    """Meilleure durée observée, en millisecondes."""
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--evenements', type=int, default=1_000_000)
+    parser.add_argument('--annonces', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            remplir(db, args.annonces, args.evenements)
+
+            def vues_par_jour_brut():
+                with db.connexion() as conn:
+                    return conn.execute('''
+                        SELECT date(e.timestamp) AS jour, a.categorie, COUNT(*) AS total
+                        FROM analytics e JOIN annonces a ON a.id = e.annonce_id
+                        WHERE e.timestamp >= datetime('now', '-90 days') AND e.type_evenement = 'vue'
+                        GROUP BY jour, a.categorie
+                    ''').fetchall()
+
+            def sources_brut():
+                with db.connexion() as conn:
+                    return conn.execute('''
+                        SELECT source_utm, COUNT(*) AS total FROM analytics
+                        WHERE timestamp >= datetime('now', '-30 days') AND source_utm IS NOT NULL
+                        GROUP BY source_utm ORDER BY total DESC LIMIT 10
+                    ''').fetchall()
+
+            brut_jours = chronometrer(vues_par_jour_brut)
+            brut_sources = chronometrer(sources_brut)
+
+            debut = time.perf_counter()
+            db.compacter_analytics()
+            compactage = time.perf_counter() - debut
+
+            agregat_jours = chronometrer(lambda: db.statistiques_par_jour(90))
+            agregat_sources = chronometrer(lambda: db.top_sources_utm(30))
+
+    print(f"{args.evenements} événements, {args.annonces} annonces (compactage initial {compactage:.1f} s)")
+    print(f"vues/jour/catégorie 90 j : brut {brut_jours:9.1f} ms   agrégats {agregat_jours:8.1f} ms")
+    print(f"top sources UTM 30 j     : brut {brut_sources:9.1f} ms   agrégats {agregat_sources:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Débit de désérialisation de pages de 10k annonces selon la vue et le décodage
+
+Usage : python -m benchmarks.bench_deserialisation [--lignes 10000]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from models.annonce_models import AnnonceVehicule, MARQUES_VEHICULES, VILLES_GABON
+from models.database import SELECT_ANNONCE, Database
+from models.lignes import AnnonceParesseuse, deserialiser_annonce, orjson
+
+
+def remplir(db: Database, lignes: int) -> None:
+    def generer():
+        for i in range(lignes):
+            vehicule = AnnonceVehicule(
+                titre=f"Véhicule {i}", description="Très bon état " * 20, categorie='vehicules',
+                type_annonce='vente', prix=random.randint(1_000_000, 40_000_000),
+                marque=random.choice(MARQUES_VEHICULES), annee=random.randint(2000, 2024),
+                kilometrage=random.randint(0, 300_000),
+            )
+            yield (
+                vehicule.titre, vehicule.description, 'vehicules', 'vente', vehicule.prix,
+                'Centre', random.choice(VILLES_GABON), 'Test', '0', 'publie',
+                json.dumps(vehicule.to_dict()),
+                json.dumps([f"uploads/{i}_{n}.jpg" for n in range(6)]),
+                json.dumps([]),
+            )
+
+    with db.connexion() as conn:
+        conn.executemany('''
+            INSERT INTO annonces (titre, description, categorie, type_annonce, prix, localisation,
+                                  ville, contact_nom, contact_telephone, statut,
+                                  donnees_specifiques, photos, videos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', generer())
+        conn.commit()
+
+
+def debit(fonction, lignes: int, repetitions: int = 3) -> float:
+    """Meilleur débit observé, en lignes/s."""
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return lignes / meilleur
+
+
+def usage_carte(annonces) -> None:
+    """Ce qu'une page de liste lit réellement de chaque annonce."""
+    for annonce in annonces:
+        annonce['titre'], annonce['prix'], annonce['ville']
+        photos = annonce.get('photos')
+        photos[0] if photos else annonce.get('photo_principale')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lignes', type=int, default=10_000)
+    args = parser.parse_args()
+    n = args.lignes
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            remplir(db, n)
+            with db.connexion() as conn:
+                rows = conn.execute(f"SELECT {SELECT_ANNONCE} FROM annonces").fetchall()
+
+            print(f"Désérialisation seule de {n} lignes")
+            print(f"  json (stdlib)        {debit(lambda: [deserialiser_annonce(r, json.loads) for r in rows], n):10.0f} lignes/s")
+            if orjson is not None:
+                print(f"  orjson               {debit(lambda: [deserialiser_annonce(r, orjson.loads) for r in rows], n):10.0f} lignes/s")
+            print(f"  paresseux (carte)    {debit(lambda: usage_carte([AnnonceParesseuse(r) for r in rows]), n):10.0f} lignes/s")
+
+            print(f"Page complète obtenir_annonces(limit={n}), lecture SQL incluse")
+            for libelle, options in (
+                ('vue complete', {}),
+                ('vue complete paresseuse', {'decodage_paresseux': True}),
+                ('vue carte', {'vue': 'carte'}),
+            ):
+                print(f"  {libelle:24} {debit(lambda: usage_carte(db.obtenir_annonces({}, n, **options)), n):10.0f} lignes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Détection des doublons : recherche par bandes LSH vs comparaison à toutes les annonces
+
+Usage : python -m benchmarks.bench_doublons [--annonces 20000] [--doublons 500] [--processus 2]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from models import doublons
+from models.database import Database
+
+MOTS = ("villa studio appartement chambre salon cuisine terrasse jardin piscine garage climatisé "
+        "meublé calme sécurisé proche école marché route goudronnée forage gardien parking vue mer "
+        "plage duplex carrelé balcon buanderie").split()
+VILLES = ['Libreville', 'Port-Gentil', 'Franceville', 'Oyem', 'Moanda', 'Lambaréné']
+
+
+def annonce_aleatoire(generateur: random.Random) -> dict:
+    return {
+        'titre': ' '.join(generateur.sample(MOTS, 4)),
+        'description': ' '.join(generateur.choices(MOTS, k=40)),
+        'categorie': 'immobilier', 'type_annonce': 'location',
+        'prix': generateur.randint(50, 3000) * 1000, 'localisation': 'Centre',
+        'ville': generateur.choice(VILLES), 'contact_nom': 'Test', 'contact_telephone': '0',
+        'statut': 'publie',
+        'donnees_specifiques': {'type_bien': generateur.choice(['Villa', 'Studio', 'Appartement']),
+                                'nombre_chambres': generateur.randint(1, 6)},
+    }
+
+
+def retouche(annonce: dict, generateur: random.Random) -> dict:
+    """Republication retouchée : prix arrondi, un mot ajouté au titre ou à la description."""
+    copie = dict(annonce, prix=round(annonce['prix'] * 0.98, -3))
+    if generateur.random() < 0.5:
+        copie['titre'] = 'URGENT ' + annonce['titre']
+    else:
+        copie['description'] = annonce['description'] + ' ' + generateur.choice(MOTS)
+    return copie
+
+
+def percentile(durees: list, rang: float) -> float:
+    durees = sorted(durees)
+    return durees[min(len(durees) - 1, int(rang * len(durees)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--annonces', type=int, default=20_000)
+    parser.add_argument('--doublons', type=int, default=500)
+    parser.add_argument('--processus', type=int, default=None)
+    args = parser.parse_args()
+
+    generateur = random.Random(42)
+    originales = [annonce_aleatoire(generateur) for _ in range(args.annonces)]
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            debut = time.perf_counter()
+            db.ajouter_annonces_bulk(originales, taille_lot=2000)
+            import_s = time.perf_counter() - debut
+
+            echantillon = generateur.sample(range(args.annonces), args.doublons)
+            durees, trouves = [], 0
+            for indice in echantillon:
+                candidate = retouche(originales[indice], generateur)
+                debut = time.perf_counter()
+                resultat = db.rechercher_doublons(candidate)
+                durees.append(time.perf_counter() - debut)
+                trouves += any(voisin['annonce_id'] == indice + 1 for voisin in resultat)
+
+            # Référence : comparaison à chaque empreinte enregistrée
+            with db.connexion() as conn:
+                toutes = [(row[0], doublons.lire_signature(conn, row[0])) for row in conn.execute(
+                    "SELECT annonce_id FROM annonces_signatures")]
+            signature = doublons.signature_annonce(retouche(originales[0], generateur))
+            debut = time.perf_counter()
+            [annonce_id for annonce_id, autre in toutes
+             if doublons.similarite(signature, autre) >= doublons.SEUIL_SIMILARITE]
+            parcours_ms = (time.perf_counter() - debut) * 1000
+
+            for indice in echantillon[:args.doublons // 2]:
+                db.ajouter_annonce(retouche(originales[indice], generateur))
+            debut = time.perf_counter()
+            groupes = db.dedupliquer_annonces(processus=args.processus)
+            dedup_s = time.perf_counter() - debut
+
+    print(f"{args.annonces} annonces (import avec empreintes {import_s:.1f} s)")
+    print(f"recherche par bandes : p50 {percentile(durees, 0.5):.2f} ms  p99 {percentile(durees, 0.99):.2f} ms  "
+          f"(empreinte comprise) ; rappel {trouves}/{args.doublons}")
+    print(f"comparaison à toutes les empreintes : {parcours_ms:.1f} ms par annonce")
+    print(f"déduplication complète : {dedup_s:.1f} s, {len(groupes)} groupes "
+          f"({args.doublons // 2} republications injectées)")
+
+
+if __name__ == '__main__':
+    main()
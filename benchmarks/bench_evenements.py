@@ -0,0 +1,52 @@
+"""
+Débit d'ingestion des événements analytics : écriture directe vs tampon
+
+Usage : python -m benchmarks.bench_evenements [--evenements 20000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from models.database import Database
+from models.tampon_evenements import ConfigTampon
+
+TYPES = ['vue', 'vue', 'vue', 'clic_contact', 'partage']
+
+
+def mesurer(tampon, nombre: int) -> float:
+    """Retourner le débit en événements/s, vidage final inclus."""
+    with tempfile.TemporaryDirectory() as dossier:
+        db = Database(os.path.join(dossier, 'bench.db'), tampon_analytics=tampon)
+        ids = [db.ajouter_annonce({
+            'titre': f"Annonce {i}", 'description': "Test", 'categorie': 'vehicules',
+            'type_annonce': 'vente', 'prix': 1_000_000, 'localisation': 'Centre',
+            'ville': 'Libreville', 'contact_nom': 'Test', 'contact_telephone': '0',
+            'statut': 'publie',
+        }) for i in range(100)]
+
+        debut = time.perf_counter()
+        for _ in range(nombre):
+            db.enregistrer_evenement(random.choice(ids), random.choice(TYPES), source_utm='whatsapp')
+        db.fermer()
+        return nombre / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--evenements', type=int, default=20000)
+    args = parser.parse_args()
+
+    scenarios = [
+        ('direct', None, args.evenements // 10),
+        ('tampon fenetre 1s', ConfigTampon(taille_max=500, delai_ms=1000), args.evenements),
+        ('tampon sortie', ConfigTampon(taille_max=5000, durabilite='sortie'), args.evenements),
+    ]
+    for nom, tampon, nombre in scenarios:
+        print(f"{nom:20} {mesurer(tampon, nombre):10.0f} événements/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Débit d'import (ajouter_annonce vs ajouter_annonces_bulk) et d'export streaming
+
+Usage : python -m benchmarks.bench_import_export [--lignes 200000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from models.annonce_models import MARQUES_VEHICULES, VILLES_GABON
+from models.database import Database
+
+
+def flux(lignes: int):
+    """Flux partenaire synthétique au format d'ajouter_annonce."""
+    for i in range(lignes):
+        yield {
+            'titre': f"{random.choice(MARQUES_VEHICULES)} réf. {i}",
+            'description': "Véhicule importé, dédouané, très bon état.",
+            'categorie': 'vehicules',
+            'type_annonce': 'vente',
+            'prix': random.randint(1_000_000, 40_000_000),
+            'localisation': 'Centre',
+            'ville': random.choice(VILLES_GABON),
+            'contact_nom': 'Partenaire',
+            'contact_telephone': '+241 00 00 00 00',
+            'statut': 'publie',
+            'donnees_specifiques': {
+                'marque': random.choice(MARQUES_VEHICULES),
+                'annee': random.randint(2000, 2024),
+                'kilometrage': random.randint(0, 300_000),
+            },
+            'photos': [f"uploads/{i}.jpg"],
+        }
+
+
+def chronometrer(fonction) -> float:
+    debut = time.perf_counter()
+    fonction()
+    return time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lignes', type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.lignes
+    unitaire = min(n, 2_000)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'unitaire.db')) as db:
+            duree = chronometrer(lambda: [db.ajouter_annonce(a) for a in flux(unitaire)])
+            print(f"import ajouter_annonce           {unitaire / duree:10.0f} lignes/s ({unitaire} lignes)")
+
+        for differer in (False, True):
+            with Database(os.path.join(dossier, f'bulk_{differer}.db')) as db:
+                duree = chronometrer(lambda: db.ajouter_annonces_bulk(flux(n), differer_index=differer))
+                print(f"import bulk differer_index={differer!s:5} {n / duree:10.0f} lignes/s ({n} lignes)")
+
+        with Database(os.path.join(dossier, 'bulk_True.db')) as db:
+            for format in ('jsonl', 'csv'):
+                duree = chronometrer(lambda: sum(1 for _ in db.exporter_annonces(format)))
+                print(f"export {format:5}                     {n / duree:10.0f} lignes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Surcoût de l'instrumentation : sans instrumentation, suspendue (actif=False), active
+
+Usage : python -m benchmarks.bench_instrumentation [--annonces 2000] [--iterations 3000] [--tours 5]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_doublons import annonce_aleatoire
+from models.database import Database
+from models.instrumentation import Instrumentation
+
+
+def operations(db: Database, generateur: random.Random, annonces: int):
+    """Appels courants d'une page : paramètre, annonce par id, page de cartes."""
+    return {
+        'get_setting': lambda: db.get_setting('site_nom'),
+        'obtenir_annonce_par_id': lambda: db.obtenir_annonce_par_id(generateur.randint(1, annonces)),
+        'obtenir_annonces (carte)': lambda: db.obtenir_annonces({'ville': 'Libreville'}, limit=20, vue='carte'),
+    }
+
+
+def mesurer(fonction, iterations: int) -> float:
+    """Durée moyenne d'un appel, en microsecondes."""
+    debut = time.perf_counter()
+    for _ in range(iterations):
+        fonction()
+    return (time.perf_counter() - debut) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--annonces', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=3000)
+    parser.add_argument('--tours', type=int, default=5)
+    args = parser.parse_args()
+
+    generateur = random.Random(42)
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, 'bench.db')
+        with Database(chemin) as db:
+            db.set_setting('site_nom', 'Immo Gabon')
+            db.ajouter_annonces_bulk([annonce_aleatoire(generateur) for _ in range(args.annonces)])
+
+        suspendue = Instrumentation(actif=False)
+        configurations = {
+            'sans instrumentation': Database(chemin),
+            'instrumentation suspendue': Database(chemin, instrumentation=suspendue),
+            'instrumentation active': Database(chemin, instrumentation=Instrumentation(seuil_requete_lente=1.0)),
+        }
+        # Meilleur de plusieurs tours alternés : le bruit de la machine ne favorise aucune configuration
+        resultats = {nom: {} for nom in configurations}
+        for _ in range(args.tours):
+            for nom, db in configurations.items():
+                for operation, fonction in operations(db, generateur, args.annonces).items():
+                    duree = mesurer(fonction, args.iterations)
+                    resultats[nom][operation] = min(duree, resultats[nom].get(operation, duree))
+        for db in configurations.values():
+            db.fermer()
+
+    reference = resultats['sans instrumentation']
+    print(f"{'':28}" + ''.join(f"{operation:>27}" for operation in reference))
+    for nom, durees in resultats.items():
+        print(f"{nom:28}" + ''.join(
+            f"{duree:14.1f} µs ({(duree / reference[operation] - 1) * 100:+5.1f} %)"
+            for operation, duree in durees.items()))
+
+
+if __name__ == '__main__':
+    main()
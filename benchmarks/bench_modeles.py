@@ -0,0 +1,146 @@
+"""
+Mémoire et débit des modèles d'annonces : dataclasses à __dict__ vs slots,
+validation ligne par ligne vs validation en colonnes (LotAnnonces)
+
+Usage : python -m benchmarks.bench_modeles [--annonces 100000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from datetime import datetime
+
+from models.annonce_models import MARQUES_VEHICULES, VILLES_GABON, AnnonceVehicule, annonce_depuis_dict
+from models.lot_annonces import LotAnnonces
+
+
+def to_dict_historique(self) -> dict:
+    """``AnnonceVehicule.to_dict`` d'avant la sérialisation générée."""
+    return {
+        'marque': self.marque,
+        'modele': self.modele,
+        'annee': self.annee,
+        'kilometrage': self.kilometrage,
+        'carburant': self.carburant,
+        'transmission': self.transmission,
+        'couleur': self.couleur,
+        'nombre_portes': self.nombre_portes,
+        'nombre_places': self.nombre_places,
+        'puissance': self.puissance,
+        'cylindree': self.cylindree,
+        'etat': self.etat,
+        'premiere_main': self.premiere_main,
+        'carnet_entretien': self.carnet_entretien,
+        'controle_technique': self.controle_technique,
+        'assurance_valide': self.assurance_valide,
+        'papiers_en_regle': self.papiers_en_regle,
+        'accidents': self.accidents
+    }
+
+
+def post_init_historique(self) -> None:
+    self.categorie = 'vehicules'
+
+
+def classe_historique(classe: type) -> type:
+    """Les champs de ``classe`` dans une dataclass sans slots (instances à __dict__).
+
+    ``to_dict`` et ``__post_init__`` sont ceux d'avant les slots. ``valider``
+    reste celui de ``classe`` : les règles sont les mêmes, seul l'accès aux
+    attributs diffère.
+    """
+    definitions = []
+    for champ in fields(classe):
+        options = {'default': champ.default} if champ.default_factory is field().default_factory \
+            else {'default_factory': champ.default_factory}
+        definitions.append((champ.name, champ.type, field(**options)))
+    return make_dataclass(f"{classe.__name__}Historique", definitions,
+                          namespace={'to_dict': to_dict_historique, 'valider': classe.valider,
+                                     '__post_init__': post_init_historique})
+
+
+def depuis_dict_historique(classe: type, noms: frozenset, donnees: dict):
+    """Construction telle qu'avant : parcours des clés de l'annonce et de ses données spécifiques."""
+    valeurs = {cle: valeur for cle, valeur in donnees.items() if cle in noms and valeur is not None}
+    for cle, valeur in (donnees.get('donnees_specifiques') or {}).items():
+        if cle in noms and valeur is not None:
+            valeurs[cle] = valeur
+    return classe(**valeurs)
+
+
+def generer(annonces: int) -> list:
+    return [
+        {
+            'titre': f"Véhicule {i}", 'description': "Très bon état", 'categorie': 'vehicules',
+            'type_annonce': 'vente', 'prix': random.randint(1_000_000, 40_000_000),
+            'ville': random.choice(VILLES_GABON), 'statut': 'publie',
+            'donnees_specifiques': {
+                'marque': random.choice(MARQUES_VEHICULES), 'annee': random.randint(2000, 2024),
+                'kilometrage': random.randint(0, 300_000), 'carburant': random.choice(['Essence', 'Diesel']),
+                'transmission': 'automatique',
+            },
+        }
+        for i in range(annonces)
+    ]
+
+
+def mesurer_memoire(construire) -> tuple:
+    """(octets alloués, résultat) pour ``construire()``."""
+    tracemalloc.start()
+    resultat = construire()
+    taille, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return taille, resultat
+
+
+def chronometrer(fonction) -> float:
+    debut = time.perf_counter()
+    fonction()
+    return time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--annonces', type=int, default=100_000)
+    args = parser.parse_args()
+
+    donnees = generer(args.annonces)
+    VehiculeDict = classe_historique(AnnonceVehicule)
+    noms = frozenset(champ.name for champ in fields(AnnonceVehicule))
+    date_fixe = datetime(2024, 1, 1)
+    for ligne in donnees:
+        ligne['date_creation'] = date_fixe
+
+    memoire_dict, modeles_dict = mesurer_memoire(
+        lambda: [depuis_dict_historique(VehiculeDict, noms, ligne) for ligne in donnees])
+    memoire_slots, modeles_slots = mesurer_memoire(lambda: [annonce_depuis_dict(ligne) for ligne in donnees])
+    memoire_lot, lot = mesurer_memoire(lambda: LotAnnonces.depuis_annonces(donnees))
+
+    construction_dict = chronometrer(lambda: [depuis_dict_historique(VehiculeDict, noms, l) for l in donnees])
+    construction_slots = chronometrer(lambda: [annonce_depuis_dict(ligne) for ligne in donnees])
+    serialisation_dict = chronometrer(lambda: [modele.to_dict() for modele in modeles_dict])
+    serialisation_slots = chronometrer(lambda: [modele.to_dict() for modele in modeles_slots])
+
+    def valider_lignes(modeles):
+        for modele in modeles:
+            modele.valider()
+
+    validation_dict = chronometrer(lambda: valider_lignes(modeles_dict))
+    validation_lignes = chronometrer(lambda: valider_lignes(modeles_slots))
+    validation_lot = chronometrer(lot.valider)
+    assert not lot.valider()
+
+    n = args.annonces
+    print(f"{n} annonces véhicules")
+    print(f"mémoire       __dict__ {memoire_dict / n:7.0f} o/annonce   slots {memoire_slots / n:7.0f} o/annonce"
+          f"   colonnes {memoire_lot / n:7.0f} o/annonce")
+    print(f"construction  __dict__ {n / construction_dict:9.0f} /s   slots {n / construction_slots:9.0f} /s")
+    print(f"to_dict       __dict__ {n / serialisation_dict:9.0f} /s   slots {n / serialisation_slots:9.0f} /s")
+    print(f"validation    __dict__ {n / validation_dict:9.0f} /s   slots {n / validation_lignes:9.0f} /s"
+          f"   colonnes {n / validation_lot:9.0f} /s")
+
+
+if __name__ == '__main__':
+    main()
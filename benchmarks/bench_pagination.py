@@ -0,0 +1,82 @@
+"""
+Latence de la page 1 et de la page N : pagination OFFSET vs curseur (keyset)
+
+Usage : python -m benchmarks.bench_pagination [--lignes 1000000] [--page 1000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from models.database import Database
+
+TAILLE_PAGE = 20
+
+
+def remplir(db: Database, lignes: int) -> None:
+    """Insérer ``lignes`` annonces publiées directement par lots."""
+    origine = datetime(2024, 1, 1)
+    categories = ['immobilier', 'vehicules', 'informatique']
+
+    def lot(debut: int, fin: int):
+        for i in range(debut, fin):
+            yield (
+                f"Annonce {i}", "Description", random.choice(categories), 'vente',
+                random.randint(10_000, 50_000_000), 'Centre', 'Libreville', 'Test', '0', 'publie',
+                (origine + timedelta(seconds=i * 30)).strftime('%Y-%m-%d %H:%M:%S'),
+            )
+
+    with db.connexion() as conn:
+        for debut in range(0, lignes, 50_000):
+            conn.executemany('''
+                INSERT INTO annonces (titre, description, categorie, type_annonce, prix,
+                                      localisation, ville, contact_nom, contact_telephone,
+                                      statut, date_creation)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', lot(debut, min(lignes, debut + 50_000)))
+            conn.commit()
+
+
+def chronometrer(fonction, repetitions: int = 5) -> float:
+    """Meilleure durée observée, en millisecondes."""
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lignes', type=int, default=1_000_000)
+    parser.add_argument('--page', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            remplir(db, args.lignes)
+            filtres = {'statut': 'publie'}
+
+            # Curseur de la page demandée, obtenu en parcourant les pages précédentes
+            curseur = None
+            for _ in range(args.page - 1):
+                _, curseur = db.obtenir_annonces_par_curseur(filtres, TAILLE_PAGE, curseur)
+
+            offset_p1 = chronometrer(lambda: db.obtenir_annonces(filtres, TAILLE_PAGE, 0))
+            offset_pn = chronometrer(
+                lambda: db.obtenir_annonces(filtres, TAILLE_PAGE, (args.page - 1) * TAILLE_PAGE)
+            )
+            curseur_p1 = chronometrer(lambda: db.obtenir_annonces_par_curseur(filtres, TAILLE_PAGE))
+            curseur_pn = chronometrer(lambda: db.obtenir_annonces_par_curseur(filtres, TAILLE_PAGE, curseur))
+
+    print(f"{args.lignes} annonces, pages de {TAILLE_PAGE}")
+    print(f"OFFSET  page 1 : {offset_p1:8.2f} ms   page {args.page} : {offset_pn:8.2f} ms")
+    print(f"curseur page 1 : {curseur_p1:8.2f} ms   page {args.page} : {curseur_pn:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Microbenchmark : connexion par appel vs pool de connexions
+
+Usage : python -m benchmarks.bench_pool [--iterations 5000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from models.database import Database
+
+
+def _connexion_par_appel(db: Database, cle: str):
+    """Chemin historique : une connexion ouverte et fermée par lecture."""
+    conn = db.get_connection()
+    try:
+        row = conn.execute("SELECT valeur FROM settings WHERE cle = ?", (cle,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def mesurer(fonction, iterations: int) -> float:
+    """Retourner le nombre d'appels par seconde."""
+    debut = time.perf_counter()
+    for _ in range(iterations):
+        fonction()
+    return iterations / (time.perf_counter() - debut)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            db.set_setting('site_nom', 'Immo Gabon')
+
+            sans_pool = mesurer(lambda: _connexion_par_appel(db, 'site_nom'), args.iterations)
+            avec_pool = mesurer(lambda: db.get_setting('site_nom'), args.iterations)
+
+    print(f"connexion par appel : {sans_pool:10.0f} get_setting/s")
+    print(f"pool de connexions  : {avec_pool:10.0f} get_setting/s")
+    print(f"gain                : x{avec_pool / sans_pool:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Recherche plein texte FTS5 (bm25) vs parcours LIKE '%terme%'
+
+Usage : python -m benchmarks.bench_recherche [--lignes 200000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from models.annonce_models import MARQUES_VEHICULES, TYPES_BIEN_IMMOBILIER, VILLES_GABON
+from models.database import Database
+
+MOTS = ['climatisé', 'spacieux', 'sécurisé', 'neuf', 'occasion', 'garage', 'jardin',
+        'carrelé', 'meublé', 'vue', 'mer', 'route', 'goudronnée', 'forage', 'groupe',
+        'électrogène', 'diesel', 'automatique', 'entretien', 'papiers', 'ordre']
+
+REQUETES = ['lambarene', 'toyota diesel', 'villa piscine', 'electrogene']
+
+
+def remplir(db: Database, lignes: int) -> None:
+    def generer():
+        for i in range(lignes):
+            sujet = random.choice(TYPES_BIEN_IMMOBILIER + MARQUES_VEHICULES)
+            ville = random.choice(VILLES_GABON)
+            yield (
+                f"{sujet} à {ville}",
+                ' '.join(random.choices(MOTS, k=25)) + f" {sujet} {ville}",
+                'immobilier', 'vente', random.randint(10_000, 50_000_000),
+                'Centre', ville, 'Test', '0', 'publie',
+            )
+
+    with db.connexion() as conn:
+        conn.executemany('''
+            INSERT INTO annonces (titre, description, categorie, type_annonce, prix,
+                                  localisation, ville, contact_nom, contact_telephone, statut)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', generer())
+        conn.commit()
+
+
+def recherche_like(db: Database, requete: str, limit: int = 20):
+    """Base de comparaison : tous les mots en LIKE sur titre et description."""
+    conditions, params = [], []
+    for mot in requete.split():
+        conditions.append("(titre LIKE ? OR description LIKE ?)")
+        params.extend([f"%{mot}%", f"%{mot}%"])
+    with db.connexion() as conn:
+        return conn.execute(
+            f"SELECT * FROM annonces WHERE statut = 'publie' AND {' AND '.join(conditions)} "
+            "ORDER BY date_creation DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+
+
+def chronometrer(fonction, repetitions: int = 5) -> float:
+    meilleur = float('inf')
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lignes', type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db')) as db:
+            remplir(db, args.lignes)
+            print(f"{args.lignes} annonces")
+            for requete in REQUETES:
+                fts = chronometrer(lambda: db.rechercher_annonces(requete))
+                like = chronometrer(lambda: recherche_like(db, requete))
+                trouves_fts = len(db.rechercher_annonces(requete))
+                trouves_like = len(recherche_like(db, requete))
+                print(f"{requete!r:18} FTS5 {fts:8.2f} ms ({trouves_fts:2} résultats)"
+                      f"   LIKE {like:8.2f} ms ({trouves_like:2} résultats)")
+
+
+if __name__ == '__main__':
+    main()
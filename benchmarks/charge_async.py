@@ -0,0 +1,120 @@
+"""
+Charge de clients asynchrones concurrents : AsyncDatabase vs appels synchrones
+
+Les clients simulent un front web asyncio : page de liste, fiche annonce avec
+son résumé analytics, puis un événement. En mode « sync », les méthodes de
+Database sont appelées directement depuis la boucle d'événements (bloquante).
+
+Usage : python -m benchmarks.charge_async [--annonces 5000] [--clients 50] [--requetes 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from models.async_database import AsyncDatabase
+from models.database import Database
+
+CATEGORIES = ['immobilier', 'vehicules', 'informatique']
+
+
+def remplir(db: Database, annonces: int) -> None:
+    db.ajouter_annonces_bulk(
+        {
+            'titre': f"Annonce {i}", 'description': "Description", 'categorie': random.choice(CATEGORIES),
+            'type_annonce': 'vente', 'prix': random.randint(10_000, 50_000_000), 'localisation': 'Centre',
+            'ville': random.choice(['Libreville', 'Port-Gentil', 'Franceville']),
+            'contact_nom': 'Test', 'contact_telephone': '0', 'statut': 'publie',
+        }
+        for i in range(annonces)
+    )
+
+
+async def client_async(adb: AsyncDatabase, annonces: int, requetes: int, latences: list) -> None:
+    for _ in range(requetes):
+        debut = time.perf_counter()
+        await adb.obtenir_annonces({'statut': 'publie', 'categorie': random.choice(CATEGORIES)}, 20)
+        annonce_id = random.randint(1, annonces)
+        await adb.obtenir_annonce_avec_statistiques(annonce_id)
+        await adb.enregistrer_evenement(annonce_id, 'vue')
+        latences.append(time.perf_counter() - debut)
+
+
+async def client_sync(db: Database, annonces: int, requetes: int, latences: list) -> None:
+    for _ in range(requetes):
+        debut = time.perf_counter()
+        db.obtenir_annonces({'statut': 'publie', 'categorie': random.choice(CATEGORIES)}, 20)
+        annonce_id = random.randint(1, annonces)
+        db.obtenir_annonce_par_id(annonce_id)
+        db.obtenir_statistiques_annonce(annonce_id)
+        db.enregistrer_evenement(annonce_id, 'vue')
+        latences.append(time.perf_counter() - debut)
+        await asyncio.sleep(0)
+
+
+async def charger(client, cible, args) -> dict:
+    latences: list = []
+    debut = time.perf_counter()
+    await asyncio.gather(*(client(cible, args.annonces, args.requetes, latences)
+                           for _ in range(args.clients)))
+    duree = time.perf_counter() - debut
+    latences.sort()
+    return {
+        'debit': len(latences) / duree,
+        'p50': statistics.median(latences) * 1000,
+        'p99': latences[int(len(latences) * 0.99) - 1] * 1000,
+    }
+
+
+async def sonde_boucle(arret: asyncio.Event, retards: list) -> None:
+    """Mesurer le retard de la boucle d'événements (réactivité du front)."""
+    while not arret.is_set():
+        debut = time.perf_counter()
+        await asyncio.sleep(0.005)
+        retards.append(time.perf_counter() - debut - 0.005)
+
+
+async def mesurer(client, cible, args) -> dict:
+    arret, retards = asyncio.Event(), []
+    sonde = asyncio.create_task(sonde_boucle(arret, retards))
+    resultat = await charger(client, cible, args)
+    arret.set()
+    await sonde
+    resultat['retard_boucle'] = max(retards, default=0.0) * 1000
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--annonces', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requetes', type=int, default=20)
+    parser.add_argument('--pool', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        with Database(os.path.join(dossier, 'bench.db'), taille_pool=args.pool, profil='performance') as db:
+            remplir(db, args.annonces)
+            sync = asyncio.run(mesurer(client_sync, db, args))
+
+            async def scenario_async() -> dict:
+                adb = AsyncDatabase(db)
+                try:
+                    return await mesurer(client_async, adb, args)
+                finally:
+                    await adb.fermer()
+
+            asynchrone = asyncio.run(scenario_async())
+
+    print(f"{args.clients} clients x {args.requetes} requêtes, {args.annonces} annonces, pool de {args.pool}")
+    for nom, r in (('sync ', sync), ('async', asynchrone)):
+        print(f"{nom} : {r['debit']:8.1f} req/s   p50 {r['p50']:7.2f} ms   p99 {r['p99']:7.2f} ms   "
+              f"retard max de la boucle {r['retard_boucle']:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
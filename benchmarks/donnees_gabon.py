@@ -0,0 +1,362 @@
+"""
+Jeu de données synthétique du marché gabonais : annonces et événements analytics
+
+Les annonces sont construites avec les modèles de catégorie (AnnonceImmobilier,
+AnnonceVehicule, AnnonceInformatique) et les listes de référence de
+models.annonce_models ; une même graine produit toujours les mêmes données.
+
+Usage : python -m benchmarks.donnees_gabon --echelle 100k [--sortie data/bench_100k.db] [--graine 42]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator, Optional, Tuple
+
+from models.annonce_models import (
+    MARQUES_INFORMATIQUE, MARQUES_VEHICULES, TYPES_BIEN_IMMOBILIER, VILLES_GABON,
+    AnnonceBase, AnnonceImmobilier, AnnonceInformatique, AnnonceVehicule,
+)
+from models.database import Database
+
+ECHELLES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+EVENEMENTS_PAR_ANNONCE = 5
+
+# Toutes les dates sont relatives à cette référence, pour que les données
+# ne dépendent pas du jour de génération
+DATE_REFERENCE = datetime(2026, 1, 1)
+# Version du générateur : une base générée par une autre version est refaite
+VERSION_JEU = 1
+
+# Poids des villes de VILLES_GABON, grossièrement proportionnels à leur
+# population (1 pour les villes non citées)
+POIDS_VILLES = {
+    'Libreville': 40, 'Port-Gentil': 14, 'Franceville': 8, 'Oyem': 5, 'Moanda': 5,
+    'Mouila': 3, 'Lambaréné': 3, 'Tchibanga': 2, 'Koulamoutou': 2, 'Makokou': 2, 'Bitam': 2,
+}
+QUARTIERS = {
+    'Libreville': ['Louis', 'Glass', 'Nombakélé', 'Akébé', 'Nzeng-Ayong', 'Angondjé',
+                   'Batterie IV', 'Okala', 'Charbonnages', 'Owendo', 'Akanda', 'Lalala'],
+    'Port-Gentil': ['Centre-ville', 'Balise', 'Grand Village', 'Matanda', 'Château'],
+    'Franceville': ['Potos', 'Mbaya', 'Yéné', 'Ombélé'],
+    'Oyem': ['Akoakam', 'Ngouema'],
+    'Moanda': ['Leyima', 'Moukaba'],
+}
+CATEGORIES_PONDEREES = (('immobilier', 50), ('vehicules', 30), ('informatique', 20))
+
+# Loyer mensuel en FCFA (bornes) ; la vente vaut environ 120 à 200 mois de loyer
+LOYERS = {
+    'Studio': (80_000, 250_000), 'Appartement': (200_000, 900_000), 'Maison': (250_000, 1_500_000),
+    'Villa': (600_000, 4_000_000), 'Duplex': (500_000, 2_500_000), 'Bureau': (300_000, 2_000_000),
+    'Commerce': (250_000, 1_500_000), 'Entrepôt': (500_000, 3_000_000), 'Terrain': (50_000, 300_000),
+}
+CHAMBRES = {'Studio': (0, 0), 'Appartement': (1, 4), 'Maison': (2, 5), 'Villa': (3, 7), 'Duplex': (3, 6)}
+SURFACES = {
+    'Studio': (18, 40), 'Appartement': (45, 160), 'Maison': (80, 300), 'Villa': (150, 800),
+    'Duplex': (120, 400), 'Bureau': (20, 500), 'Commerce': (15, 300), 'Entrepôt': (200, 3000),
+    'Terrain': (200, 10_000),
+}
+MODELES = {
+    'Toyota': ['Hilux', 'Land Cruiser', 'Prado', 'Corolla', 'RAV4', 'Yaris', 'Fortuner'],
+    'Nissan': ['Patrol', 'Navara', 'Sunny', 'X-Trail'], 'Honda': ['Civic', 'CR-V', 'Accord'],
+    'Hyundai': ['Tucson', 'Accent', 'Santa Fe', 'i10'], 'Kia': ['Sportage', 'Picanto', 'Rio'],
+    'Ford': ['Ranger', 'Everest', 'Focus'], 'Chevrolet': ['Captiva', 'Spark'],
+    'Peugeot': ['308', '3008', '508', 'Partner'], 'Renault': ['Duster', 'Logan', 'Clio'],
+    'Volkswagen': ['Golf', 'Touareg', 'Polo'], 'BMW': ['X5', 'Série 3'], 'Mercedes-Benz': ['Classe C', 'GLE'],
+    'Audi': ['A4', 'Q5'], 'Mitsubishi': ['Pajero', 'L200'], 'Mazda': ['BT-50', 'CX-5'],
+    'Suzuki': ['Vitara', 'Swift', 'Jimny'],
+}
+# Poids des marques de véhicules : le parc gabonais est dominé par les 4x4 japonais
+POIDS_MARQUES_VEHICULES = {'Toyota': 30, 'Nissan': 10, 'Hyundai': 8, 'Mitsubishi': 6, 'Kia': 6}
+MATERIELS = {
+    'smartphone': (40_000, 900_000), 'ordinateur_portable': (120_000, 1_800_000),
+    'tablette': (60_000, 800_000), 'ordinateur_bureau': (150_000, 1_500_000), 'accessoire': (5_000, 150_000),
+}
+PROCESSEURS = ['Intel Core i3', 'Intel Core i5', 'Intel Core i7', 'AMD Ryzen 5', 'AMD Ryzen 7', 'Apple M1',
+               'Apple M2', 'Snapdragon 8', 'Helio G99']
+ATOUTS = ['climatisé', 'sécurisé', 'gardien', 'forage', 'groupe électrogène', 'parking', 'carrelé',
+          'route goudronnée', 'proche école', 'vue mer', 'calme', 'meublé', 'cuisine équipée',
+          'papiers en règle', 'dédouané', 'très bon état', 'première main', 'garantie', 'facture disponible']
+PRENOMS = ['Jean', 'Marie', 'Landry', 'Ghislain', 'Prisca', 'Arnaud', 'Chancelle', 'Davy', 'Ornella',
+           'Brice', 'Sandrine', 'Fabrice', 'Nadège', 'Rodrigue']
+NOMS = ['Ndong', 'Obiang', 'Mba', 'Nguema', 'Moussavou', 'Mintsa', 'Ondo', 'Nzé', 'Koumba',
+        'Boussougou', 'Mouele', 'Nzoghe']
+STATUTS_PONDERES = (('publie', 80), ('expire', 10), ('brouillon', 5), ('archive', 5))
+
+TYPES_EVENEMENTS = (('vue', 85), ('clic_contact', 10), ('partage', 5))
+SOURCES_UTM = ((None, 50), ('facebook', 20), ('whatsapp', 15), ('google', 10), ('newsletter', 5))
+NAVIGATEURS = [
+    'Mozilla/5.0 (Linux; Android 13; SM-A145F) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 12; TECNO KG5) AppleWebKit/537.36 Chrome/118.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 Version/17.1 Mobile Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+]
+JOURS_EVENEMENTS = 180
+
+
+def _ponderer(valeurs_et_poids) -> Tuple[list, list]:
+    valeurs, poids = zip(*valeurs_et_poids)
+    return list(valeurs), list(poids)
+
+
+_VILLES, _POIDS_VILLES = _ponderer((ville, POIDS_VILLES.get(ville, 1)) for ville in VILLES_GABON)
+_CATEGORIES, _POIDS_CATEGORIES = _ponderer(CATEGORIES_PONDEREES)
+_STATUTS, _POIDS_STATUTS = _ponderer(STATUTS_PONDERES)
+_MARQUES_VEHICULES, _POIDS_VEHICULES = _ponderer(
+    (marque, POIDS_MARQUES_VEHICULES.get(marque, 2)) for marque in MARQUES_VEHICULES)
+_TYPES_EVENEMENTS, _POIDS_EVENEMENTS = _ponderer(TYPES_EVENEMENTS)
+_SOURCES, _POIDS_SOURCES = _ponderer(SOURCES_UTM)
+
+
+def _log_uniforme(generateur: random.Random, bas: float, haut: float) -> float:
+    return math.exp(generateur.uniform(math.log(bas), math.log(haut)))
+
+
+def _arrondir_prix(prix: float) -> int:
+    """Prix affiché : arrondi à 5 000 FCFA (1 000 sous 100 000)."""
+    pas = 1_000 if prix < 100_000 else 5_000
+    return max(pas, int(round(prix / pas)) * pas)
+
+
+def _commun(generateur: random.Random, numero: int) -> dict:
+    """Champs communs : ville, quartier, contact, statut, dates et photos."""
+    ville = generateur.choices(_VILLES, _POIDS_VILLES)[0]
+    quartier = generateur.choice(QUARTIERS.get(ville, ['Centre']))
+    statut = generateur.choices(_STATUTS, _POIDS_STATUTS)[0]
+    creation = DATE_REFERENCE - timedelta(seconds=generateur.randint(0, 365 * 86400))
+    if statut == 'expire':
+        expiration = DATE_REFERENCE - timedelta(days=generateur.randint(1, 90))
+    else:
+        expiration = DATE_REFERENCE + timedelta(days=generateur.randint(1, 90))
+    prenom, nom = generateur.choice(PRENOMS), generateur.choice(NOMS)
+    telephone = f"+241 0{generateur.choice('67')}{generateur.randint(0, 9)} " + ' '.join(
+        f"{generateur.randint(0, 99):02d}" for _ in range(3))
+    return {
+        'localisation': f"{quartier}, {ville}",
+        'ville': ville,
+        'quartier': quartier,
+        'contact_nom': f"{prenom} {nom}",
+        'contact_telephone': telephone,
+        'contact_whatsapp': telephone if generateur.random() < 0.7 else '',
+        'contact_email': f"{prenom}.{nom}@example.ga".lower() if generateur.random() < 0.3 else '',
+        'statut': statut,
+        'date_creation': creation.replace(microsecond=0),
+        'date_expiration': expiration.replace(microsecond=0),
+        'photos': [f"uploads/annonces/{numero}_{rang}.jpg" for rang in range(generateur.randint(0, 8))],
+    }
+
+
+def _description(generateur: random.Random, debut: str) -> str:
+    return f"{debut}. " + ', '.join(generateur.sample(ATOUTS, generateur.randint(3, 7))).capitalize() + '.'
+
+
+def _immobilier(generateur: random.Random, commun: dict) -> AnnonceImmobilier:
+    type_bien = generateur.choice(TYPES_BIEN_IMMOBILIER)
+    type_annonce = 'vente' if type_bien == 'Terrain' or generateur.random() < 0.4 else 'location'
+    loyer = _log_uniforme(generateur, *LOYERS[type_bien])
+    prix = loyer if type_annonce == 'location' else loyer * generateur.uniform(120, 200)
+    chambres = generateur.randint(*CHAMBRES[type_bien]) if type_bien in CHAMBRES else None
+    surface = round(_log_uniforme(generateur, *SURFACES[type_bien]))
+    action = 'à louer' if type_annonce == 'location' else 'à vendre'
+    titre = f"{type_bien} {action} {commun['quartier']}"
+    if chambres:
+        titre = f"{type_bien} {chambres} chambres {action} {commun['quartier']}"
+    return AnnonceImmobilier(
+        titre=titre,
+        description=_description(generateur, f"{type_bien} de {surface} m² à {commun['ville']}"),
+        categorie='immobilier', type_annonce=type_annonce, prix=_arrondir_prix(prix),
+        type_bien=type_bien, surface=surface, nombre_chambres=chambres,
+        nombre_salles_bain=max(1, (chambres or 0) // 2) if chambres is not None else None,
+        parking=generateur.random() < 0.5, jardin=generateur.random() < 0.3,
+        piscine=type_bien == 'Villa' and generateur.random() < 0.3,
+        climatisation=generateur.random() < 0.7, meuble=generateur.random() < 0.25,
+        caution=_arrondir_prix(prix * 2) if type_annonce == 'location' else None,
+        **commun,
+    )
+
+
+def _vehicule(generateur: random.Random, commun: dict) -> AnnonceVehicule:
+    marque = generateur.choices(_MARQUES_VEHICULES, _POIDS_VEHICULES)[0]
+    modele = generateur.choice(MODELES.get(marque, ['']))
+    annee = generateur.randint(1998, DATE_REFERENCE.year)
+    age = DATE_REFERENCE.year - annee
+    type_annonce = 'location' if generateur.random() < 0.1 else 'vente'
+    # Location à la journée ; à la vente, la valeur baisse d'environ 10 % par an
+    prix = (_log_uniforme(generateur, 25_000, 150_000) if type_annonce == 'location'
+            else _log_uniforme(generateur, 8_000_000, 60_000_000) * 0.9 ** age)
+    return AnnonceVehicule(
+        titre=f"{marque} {modele} {annee}".strip(),
+        description=_description(generateur, f"{marque} {modele} de {annee}, visible à {commun['ville']}"),
+        categorie='vehicules', type_annonce=type_annonce, prix=_arrondir_prix(prix),
+        marque=marque, modele=modele, annee=annee,
+        kilometrage=int(age * generateur.uniform(8_000, 25_000)) + generateur.randint(0, 5_000),
+        carburant='diesel' if generateur.random() < 0.6 else 'essence',
+        transmission='automatique' if generateur.random() < 0.45 else 'manuelle',
+        nombre_portes=generateur.choice([3, 5, 5, 5]), nombre_places=generateur.choice([5, 5, 7]),
+        etat=generateur.choice(['neuf', 'tres_bon', 'bon', 'bon', 'correct']),
+        papiers_en_regle=generateur.random() < 0.9,
+        **commun,
+    )
+
+
+def _informatique(generateur: random.Random, commun: dict) -> AnnonceInformatique:
+    type_materiel = generateur.choice(list(MATERIELS))
+    marque = generateur.choice(MARQUES_INFORMATIQUE)
+    memoire, stockage = generateur.choice([(4, 64), (8, 128), (8, 256), (16, 512), (32, 1024)])
+    libelle = type_materiel.replace('_', ' ').capitalize()
+    return AnnonceInformatique(
+        titre=f"{libelle} {marque} {memoire} Go / {stockage} Go",
+        description=_description(generateur, f"{libelle} {marque}, disponible à {commun['ville']}"),
+        categorie='informatique', type_annonce='vente',
+        prix=_arrondir_prix(_log_uniforme(generateur, *MATERIELS[type_materiel])),
+        type_materiel=type_materiel, marque=marque,
+        processeur=generateur.choice(PROCESSEURS) if type_materiel != 'accessoire' else '',
+        memoire_ram=memoire if type_materiel != 'accessoire' else None,
+        stockage=stockage if type_materiel != 'accessoire' else None,
+        type_stockage=generateur.choice(['SSD', 'SSD', 'HDD', 'eMMC']),
+        etat=generateur.choice(['neuf', 'comme_neuf', 'tres_bon', 'bon', 'correct']),
+        garantie=generateur.random() < 0.3,
+        **commun,
+    )
+
+
+_CONSTRUCTEURS = {'immobilier': _immobilier, 'vehicules': _vehicule, 'informatique': _informatique}
+
+
+def generer_annonces(nombre: int, graine: int = 42, depart: int = 0) -> Iterator[AnnonceBase]:
+    """``nombre`` annonces réalistes, numérotées à partir de ``depart`` (photos)."""
+    generateur = random.Random(graine)
+    for numero in range(depart, depart + nombre):
+        categorie = generateur.choices(_CATEGORIES, _POIDS_CATEGORIES)[0]
+        yield _CONSTRUCTEURS[categorie](generateur, _commun(generateur, numero))
+
+
+def generer_evenements(nombre: int, annonces: int, graine: int = 42) -> Iterator[Tuple]:
+    """``nombre`` lignes analytics (annonce_id, type, source, ip, navigateur, horodatage).
+
+    La popularité suit une loi de puissance : quelques annonces concentrent
+    l'essentiel des vues, réparties au hasard parmi les id 1..``annonces``.
+    """
+    generateur = random.Random(graine)
+    # Multiplicateur premier avec ``annonces`` : le rang de popularité est permuté sur les id
+    pas = 2_654_435_761 % annonces or 1
+    while math.gcd(pas, annonces) != 1:
+        pas += 1
+    for _ in range(nombre):
+        rang = int(annonces ** generateur.random()) - 1
+        moment = DATE_REFERENCE - timedelta(seconds=generateur.randint(0, JOURS_EVENEMENTS * 86400))
+        yield (
+            rang * pas % annonces + 1,
+            generateur.choices(_TYPES_EVENEMENTS, _POIDS_EVENEMENTS)[0],
+            generateur.choices(_SOURCES, _POIDS_SOURCES)[0],
+            f"41.158.{generateur.randint(0, 255)}.{generateur.randint(1, 254)}",
+            generateur.choice(NAVIGATEURS),
+            moment.strftime('%Y-%m-%d %H:%M:%S'),
+        )
+
+
+def description_jeu(annonces: int, evenements: int, graine: int) -> dict:
+    """Paramètres d'un jeu de données, enregistrés dans la base générée."""
+    return {'version': VERSION_JEU, 'annonces': annonces, 'evenements': evenements, 'graine': graine}
+
+
+def lire_description(chemin: str) -> Optional[dict]:
+    """Description du jeu contenu dans la base ``chemin``, ou None."""
+    if not os.path.exists(chemin):
+        return None
+    with Database(chemin) as db:
+        valeur = db.get_setting('jeu_donnees')
+    return json.loads(valeur) if valeur else None
+
+
+def generer_base(chemin: str, annonces: int, evenements: Optional[int] = None, graine: int = 42,
+                 taille_lot: int = 10_000, afficher: bool = False) -> dict:
+    """Créer (ou recréer) la base ``chemin`` remplie du jeu de données.
+
+    Les annonces passent par ``ajouter_annonces_bulk`` (validation par les
+    modèles, index différés) ; les événements sont insérés par lots dans
+    ``analytics``, puis les compteurs des annonces et les agrégats sont
+    recalculés. Retourne la description du jeu.
+    """
+    evenements = annonces * EVENEMENTS_PAR_ANNONCE if evenements is None else evenements
+    description = description_jeu(annonces, evenements, graine)
+    for suffixe in ('', '-wal', '-shm'):
+        if os.path.exists(chemin + suffixe):
+            os.remove(chemin + suffixe)
+    shutil.rmtree(os.path.splitext(os.path.abspath(chemin))[0] + '_archives', ignore_errors=True)
+
+    debut = time.perf_counter()
+    with Database(chemin) as db:
+        db.ajouter_annonces_bulk(generer_annonces(annonces, graine), taille_lot=taille_lot, differer_index=True)
+        if afficher:
+            print(f"{annonces} annonces en {time.perf_counter() - debut:.1f} s")
+
+        flux = generer_evenements(evenements, annonces, graine + 1)
+        with db.connexion() as conn:
+            while True:
+                lot = list(islice(flux, taille_lot * 10))
+                if not lot:
+                    break
+                conn.executemany('''
+                    INSERT INTO analytics (annonce_id, type_evenement, source_utm, ip_address, user_agent, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', lot)
+                conn.commit()
+            # Compteurs des annonces cohérents avec les événements insérés
+            conn.execute('''
+                UPDATE annonces SET vues = c.vues, clics_contact = c.clics, partages = c.partages
+                FROM (
+                    SELECT annonce_id,
+                           SUM(type_evenement = 'vue') AS vues,
+                           SUM(type_evenement = 'clic_contact') AS clics,
+                           SUM(type_evenement = 'partage') AS partages
+                    FROM analytics GROUP BY annonce_id
+                ) AS c
+                WHERE annonces.id = c.annonce_id
+            ''')
+            conn.execute("ANALYZE")
+            conn.commit()
+        db.compacter_analytics()
+        db.set_setting('jeu_donnees', json.dumps(description))
+    if afficher:
+        print(f"{evenements} événements, total {time.perf_counter() - debut:.1f} s -> {chemin}")
+    return description
+
+
+def preparer_base(chemin: str, annonces: int, evenements: Optional[int] = None, graine: int = 42,
+                  afficher: bool = False) -> dict:
+    """Réutiliser la base ``chemin`` si elle contient déjà ce jeu, sinon la générer."""
+    evenements = annonces * EVENEMENTS_PAR_ANNONCE if evenements is None else evenements
+    attendu = description_jeu(annonces, evenements, graine)
+    if lire_description(chemin) == attendu:
+        return attendu
+    return generer_base(chemin, annonces, evenements, graine, afficher=afficher)
+
+
+def nombre_annonces(echelle: str) -> int:
+    """Nombre d'annonces d'une échelle ('10k', '100k', '1m', '10m') ou d'un entier."""
+    return ECHELLES[echelle.lower()] if echelle.lower() in ECHELLES else int(echelle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--echelle', default='10k', help="10k, 100k, 1m, 10m ou un nombre d'annonces")
+    parser.add_argument('--evenements', type=int, default=None,
+                        help=f"nombre d'événements (défaut : {EVENEMENTS_PAR_ANNONCE} par annonce)")
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--sortie', default=None, help="chemin de la base (défaut : data/bench_<echelle>.db)")
+    args = parser.parse_args()
+
+    sortie = args.sortie or os.path.join('data', f"bench_{args.echelle.lower()}.db")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    generer_base(sortie, nombre_annonces(args.echelle), args.evenements, args.graine, afficher=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Test de charge : N lecteurs et M écrivains concurrents sur la même base
+
+Compare le profil 'standard' (journal rollback) au profil 'performance'
+(WAL + écrivain unique) : débit et latence p99 par type d'opération,
+ainsi que le nombre d'erreurs "database is locked".
+
+Usage : python -m benchmarks.stress_concurrence [--lecteurs 8] [--ecrivains 4] [--duree 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from models.database import Database
+
+
+def percentile(valeurs: List[float], p: float) -> float:
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    rang = min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))
+    return valeurs[rang]
+
+
+def peupler(db: Database, nombre: int) -> List[int]:
+    """Créer ``nombre`` annonces publiées et retourner leurs identifiants."""
+    ids = []
+    for i in range(nombre):
+        ids.append(db.ajouter_annonce({
+            'titre': f"Annonce {i}",
+            'description': "Description de test",
+            'categorie': random.choice(['immobilier', 'vehicules', 'informatique']),
+            'type_annonce': random.choice(['vente', 'location']),
+            'prix': random.randint(10_000, 50_000_000),
+            'localisation': 'Centre',
+            'ville': random.choice(['Libreville', 'Port-Gentil', 'Franceville']),
+            'contact_nom': 'Test',
+            'contact_telephone': '+241 00 00 00 00',
+            'statut': 'publie',
+        }))
+    return ids
+
+
+def executer_scenario(profil: str, lecteurs: int, ecrivains: int, duree: float) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as dossier:
+        db = Database(os.path.join(dossier, 'stress.db'), taille_pool=lecteurs + ecrivains, profil=profil)
+        ids = peupler(db, 2000)
+
+        latences: Dict[str, List[float]] = {'lecture': [], 'ecriture': []}
+        erreurs = {'lecture': 0, 'ecriture': 0}
+        verrou = threading.Lock()
+        fin = time.perf_counter() + duree
+
+        def travailleur(nature: str):
+            locales, nb_erreurs = [], 0
+            while time.perf_counter() < fin:
+                debut = time.perf_counter()
+                try:
+                    if nature == 'lecture':
+                        db.obtenir_annonces({'categorie': 'immobilier'}, limit=20,
+                                            offset=random.randint(0, 200))
+                    elif random.random() < 0.5:
+                        db.incrementer_vues(random.choice(ids))
+                    else:
+                        db.enregistrer_evenement(random.choice(ids), 'clic_contact', source_utm='facebook')
+                except sqlite3.OperationalError:
+                    nb_erreurs += 1
+                    continue
+                locales.append(time.perf_counter() - debut)
+            with verrou:
+                latences[nature].extend(locales)
+                erreurs[nature] += nb_erreurs
+
+        threads = [threading.Thread(target=travailleur, args=('lecture',)) for _ in range(lecteurs)]
+        threads += [threading.Thread(target=travailleur, args=('ecriture',)) for _ in range(ecrivains)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        db.fermer()
+
+    return {
+        nature: {
+            'debit': len(valeurs) / duree,
+            'p99_ms': percentile(valeurs, 99) * 1000,
+            'erreurs': erreurs[nature],
+        }
+        for nature, valeurs in latences.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lecteurs', type=int, default=8)
+    parser.add_argument('--ecrivains', type=int, default=4)
+    parser.add_argument('--duree', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.lecteurs} lecteurs, {args.ecrivains} écrivains, {args.duree:.0f}s par profil")
+    for profil in ('standard', 'performance'):
+        resultats = executer_scenario(profil, args.lecteurs, args.ecrivains, args.duree)
+        for nature, mesures in resultats.items():
+            print(f"{profil:12} {nature:9} {mesures['debit']:9.0f} op/s"
+                  f"  p99 {mesures['p99_ms']:8.2f} ms  erreurs {mesures['erreurs']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+Suite de benchmarks reproductible sur le jeu de données synthétique gabonais
+
+Chaque cas est chronométré appel par appel (échauffement puis ``--tours``
+mesures) sur une copie de la base générée par benchmarks.donnees_gabon.
+Les résultats sont écrits en JSON, dans un format proche de celui de
+pytest-benchmark (machine, commit, statistiques par cas), pour comparer
+deux commits.
+
+Usage : python -m benchmarks.suite [--echelle 10k] [--tours 200] [--comparer precedent.json]
+        python -m benchmarks.suite --comparer ancien.json nouveau.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.donnees_gabon import generer_annonces, nombre_annonces, preparer_base
+from models.database import Database, encoder_curseur
+from models.lignes import BACKEND_JSON
+
+VERSION_FORMAT = 1
+TAILLE_PAGE = 20
+
+# Combinaisons de filtres des pages de recherche les plus consultées
+FILTRES_TYPIQUES = {
+    'accueil': {'statut': 'publie'},
+    'immobilier_libreville_location': {
+        'statut': 'publie', 'categorie': 'immobilier', 'ville': 'Libreville', 'type_annonce': 'location',
+    },
+    'villa_3_chambres_budget': {
+        'statut': 'publie', 'categorie': 'immobilier', 'type_bien': 'Villa', 'chambres_min': 3,
+        'prix_max': 2_000_000,
+    },
+    'toyota_diesel_recent': {
+        'statut': 'publie', 'categorie': 'vehicules', 'marque': 'Toyota', 'carburant': 'diesel',
+        'annee_min': 2015,
+    },
+    'portable_8go_port_gentil': {
+        'statut': 'publie', 'categorie': 'informatique', 'ville': 'Port-Gentil', 'memoire_ram_min': 8,
+    },
+}
+PAGES_PROFONDES = (1, 10, 100, 1000)
+
+
+def statistiques(durees: List[float]) -> Dict[str, float]:
+    """Statistiques d'une série de durées (secondes), clés de pytest-benchmark."""
+    triees = sorted(durees)
+    quartiles = statistics.quantiles(triees, n=4) if len(triees) > 1 else [triees[0]] * 3
+    centiles = statistics.quantiles(triees, n=100) if len(triees) > 1 else [triees[0]] * 99
+    moyenne = statistics.fmean(triees)
+    return {
+        'min': triees[0],
+        'max': triees[-1],
+        'mean': moyenne,
+        'stddev': statistics.stdev(triees) if len(triees) > 1 else 0.0,
+        'median': statistics.median(triees),
+        'q1': quartiles[0],
+        'q3': quartiles[2],
+        'iqr': quartiles[2] - quartiles[0],
+        'p95': centiles[94],
+        'p99': centiles[98],
+        'ops': 1 / moyenne if moyenne else 0.0,
+        'rounds': len(triees),
+        'total': sum(triees),
+    }
+
+
+class Suite:
+    """Cas mesurés et leurs statistiques."""
+
+    def __init__(self, tours: int, echauffement: int):
+        self.tours = tours
+        self.echauffement = echauffement
+        self.resultats: List[Dict[str, Any]] = []
+
+    def _ajouter(self, nom: str, groupe: str, durees: List[float], params: Optional[dict],
+                 extra: Optional[dict] = None) -> None:
+        resultat = {'name': nom, 'group': groupe, 'params': params or {}, 'stats': statistiques(durees)}
+        if extra:
+            resultat['extra_info'] = extra
+        self.resultats.append(resultat)
+        stats = resultat['stats']
+        print(f"  {nom:58} médiane {stats['median'] * 1000:9.3f} ms  p99 {stats['p99'] * 1000:9.3f} ms")
+
+    def mesurer(self, nom: str, groupe: str, fonction: Callable[[], Any], tours: Optional[int] = None,
+                params: Optional[dict] = None) -> None:
+        """Chronométrer ``fonction`` appel par appel, après quelques appels d'échauffement."""
+        for _ in range(self.echauffement):
+            fonction()
+        durees = []
+        for _ in range(tours or self.tours):
+            debut = time.perf_counter()
+            fonction()
+            durees.append(time.perf_counter() - debut)
+        self._ajouter(nom, groupe, durees, params)
+
+    def mesurer_concurrent(self, nom: str, groupe: str, fonction: Callable[[random.Random], Any],
+                           threads: int, appels_par_thread: int, params: Optional[dict] = None) -> None:
+        """Lancer ``threads`` threads ensemble ; latence de chaque appel et débit global."""
+        durees: List[float] = []
+        erreurs = []
+        verrou = threading.Lock()
+        depart = threading.Barrier(threads + 1)
+
+        def travailleur(numero: int) -> None:
+            generateur = random.Random(numero)
+            locales = []
+            depart.wait()
+            for _ in range(appels_par_thread):
+                debut = time.perf_counter()
+                try:
+                    fonction(generateur)
+                except sqlite3.Error as exc:
+                    erreurs.append(str(exc))
+                    continue
+                locales.append(time.perf_counter() - debut)
+            with verrou:
+                durees.extend(locales)
+
+        fils = [threading.Thread(target=travailleur, args=(numero,)) for numero in range(threads)]
+        for fil in fils:
+            fil.start()
+        depart.wait()
+        debut = time.perf_counter()
+        for fil in fils:
+            fil.join()
+        ecoule = time.perf_counter() - debut
+        self._ajouter(nom, groupe, durees or [ecoule], params,
+                      {'debit': len(durees) / ecoule, 'erreurs': len(erreurs), 'threads': threads})
+
+
+def _lectures(suite: Suite, db: Database, annonces: int, graine: int) -> None:
+    generateur = random.Random(graine)
+    suite.mesurer('obtenir_annonce_par_id', 'lecture',
+                  lambda: db.obtenir_annonce_par_id(generateur.randint(1, annonces)))
+
+    for nom, filtres in FILTRES_TYPIQUES.items():
+        suite.mesurer(f"obtenir_annonces[{nom}]", 'filtres',
+                      lambda filtres=filtres: db.obtenir_annonces(filtres, limit=TAILLE_PAGE), params=filtres)
+    suite.mesurer('obtenir_annonces[accueil,carte]', 'filtres',
+                  lambda: db.obtenir_annonces(FILTRES_TYPIQUES['accueil'], limit=TAILLE_PAGE, vue='carte'))
+    for nom, filtres in FILTRES_TYPIQUES.items():
+        suite.mesurer(f"compter_facettes[{nom}]", 'facettes',
+                      lambda filtres=filtres: db.compter_facettes(filtres), params=filtres)
+
+    with db.connexion() as conn:
+        publiees = conn.execute("SELECT COUNT(*) FROM annonces WHERE statut = 'publie'").fetchone()[0]
+    for page in PAGES_PROFONDES:
+        decalage = (page - 1) * TAILLE_PAGE
+        if decalage >= publiees:
+            break
+        params = {'page': page, 'offset': decalage}
+        suite.mesurer(f"obtenir_annonces[page={page}]", 'pagination',
+                      lambda decalage=decalage: db.obtenir_annonces(
+                          FILTRES_TYPIQUES['accueil'], limit=TAILLE_PAGE, offset=decalage), params=params)
+        curseur = None
+        if decalage:
+            with db.connexion() as conn:
+                precedente = conn.execute('''
+                    SELECT date_creation, id FROM annonces WHERE statut = 'publie'
+                    ORDER BY date_creation DESC, id DESC LIMIT 1 OFFSET ?
+                ''', (decalage - 1,)).fetchone()
+            curseur = encoder_curseur(precedente['date_creation'], precedente['id'])
+        suite.mesurer(f"obtenir_annonces_par_curseur[page={page}]", 'pagination',
+                      lambda curseur=curseur: db.obtenir_annonces_par_curseur(
+                          FILTRES_TYPIQUES['accueil'], limit=TAILLE_PAGE, curseur=curseur), params=params)
+
+
+def _ecritures(suite: Suite, db: Database, annonces: int, graine: int, tours: int) -> None:
+    # Annonces absentes du jeu : numérotées après les siennes, autre graine
+    nouvelles = iter([modele.vers_donnees() for modele in
+                      generer_annonces(tours + suite.echauffement, graine + 2, depart=annonces)])
+    suite.mesurer('ajouter_annonce', 'ecriture', lambda: db.ajouter_annonce(next(nouvelles)), tours=tours)
+
+
+def _concurrence(suite: Suite, chemin: str, annonces: int, threads: int, appels: int) -> None:
+    def evenement(generateur: random.Random) -> None:
+        db.enregistrer_evenement(generateur.randint(1, annonces),
+                                 generateur.choice(['vue', 'vue', 'vue', 'clic_contact', 'partage']),
+                                 source_utm=generateur.choice([None, 'facebook', 'whatsapp']))
+
+    for profil in ('standard', 'performance'):
+        with Database(chemin, taille_pool=threads, profil=profil) as db:
+            suite.mesurer_concurrent(f"enregistrer_evenement[{profil},{threads} threads]", 'concurrence',
+                                     evenement, threads, appels, params={'profil': profil, 'threads': threads})
+
+
+def _git(*arguments: str) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *arguments], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def informations_commit() -> Dict[str, Any]:
+    return {
+        'id': _git('rev-parse', 'HEAD'),
+        'branch': _git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'time': _git('show', '-s', '--format=%cI', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def informations_machine() -> Dict[str, Any]:
+    return {
+        'python_version': platform.python_version(),
+        'python_implementation': platform.python_implementation(),
+        'system': platform.system(),
+        'release': platform.release(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'sqlite_version': sqlite3.sqlite_version,
+        'json_backend': BACKEND_JSON,
+    }
+
+
+def executer(args: argparse.Namespace) -> Tuple[Dict[str, Any], str]:
+    """Préparer le jeu, exécuter tous les cas ; retourne les résultats et le fichier écrit."""
+    annonces = nombre_annonces(args.echelle)
+    source = args.donnees or os.path.join('data', f"bench_{args.echelle.lower()}.db")
+    os.makedirs(os.path.dirname(os.path.abspath(source)), exist_ok=True)
+    jeu = preparer_base(source, annonces, graine=args.graine, afficher=True)
+
+    suite = Suite(args.tours, args.echauffement)
+    with tempfile.TemporaryDirectory() as dossier:
+        # Les cas d'écriture modifient la base : la suite travaille sur une copie
+        chemin = os.path.join(dossier, 'suite.db')
+        shutil.copyfile(source, chemin)
+        print(f"Jeu {args.echelle} : {jeu['annonces']} annonces, {jeu['evenements']} événements")
+        with Database(chemin) as db:
+            _lectures(suite, db, annonces, args.graine)
+            _ecritures(suite, db, annonces, args.graine, args.tours_ecriture)
+        _concurrence(suite, chemin, annonces, args.threads, args.appels_par_thread)
+
+    commit = informations_commit()
+    resultats = {
+        'version': VERSION_FORMAT,
+        'datetime': datetime.now().isoformat(timespec='seconds'),
+        'machine_info': informations_machine(),
+        'commit_info': commit,
+        'jeu_donnees': dict(jeu, echelle=args.echelle),
+        'benchmarks': suite.resultats,
+    }
+    os.makedirs(args.sortie, exist_ok=True)
+    fichier = os.path.join(args.sortie, "{}_{}_{}.json".format(
+        datetime.now().strftime('%Y%m%d-%H%M%S'), (commit['id'] or 'hors-git')[:10], args.echelle.lower()))
+    with open(fichier, 'w', encoding='utf-8') as sortie:
+        json.dump(resultats, sortie, indent=2, ensure_ascii=False)
+    print(f"Résultats : {fichier}")
+    return resultats, fichier
+
+
+def comparer(ancien: Dict[str, Any], nouveau: Dict[str, Any], seuil: float) -> List[str]:
+    """Afficher l'évolution des médianes ; retourne les cas ralentis de plus de ``seuil``."""
+    print(f"Comparaison {(ancien['commit_info'].get('id') or '?')[:10]} -> "
+          f"{(nouveau['commit_info'].get('id') or '?')[:10]}"
+          f" (jeu {ancien['jeu_donnees']['annonces']} -> {nouveau['jeu_donnees']['annonces']} annonces)")
+    anciens = {cas['name']: cas for cas in ancien['benchmarks']}
+    regressions = []
+    for cas in nouveau['benchmarks']:
+        reference = anciens.get(cas['name'])
+        if reference is None:
+            print(f"  {cas['name']:58} nouveau cas")
+            continue
+        avant, apres = reference['stats']['median'], cas['stats']['median']
+        variation = apres / avant - 1 if avant else 0.0
+        marque = ''
+        if variation > seuil:
+            marque = '  RÉGRESSION'
+            regressions.append(cas['name'])
+        elif variation < -seuil:
+            marque = '  amélioration'
+        print(f"  {cas['name']:58} {avant * 1000:9.3f} -> {apres * 1000:9.3f} ms ({variation * 100:+6.1f} %){marque}")
+    return regressions
+
+
+def _charger(chemin: str) -> Dict[str, Any]:
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--echelle', default='10k', help="10k, 100k, 1m, 10m ou un nombre d'annonces")
+    parser.add_argument('--graine', type=int, default=42)
+    parser.add_argument('--donnees', default=None, help="base du jeu (défaut : data/bench_<echelle>.db)")
+    parser.add_argument('--tours', type=int, default=200, help="mesures par cas de lecture")
+    parser.add_argument('--tours-ecriture', type=int, default=100)
+    parser.add_argument('--echauffement', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--appels-par-thread', type=int, default=50)
+    parser.add_argument('--sortie', default=os.path.join('benchmarks', 'resultats'))
+    parser.add_argument('--comparer', nargs='+', metavar='JSON',
+                        help="résultats de référence ; avec deux fichiers, compare sans rien mesurer")
+    parser.add_argument('--seuil', type=float, default=0.10, help="ralentissement signalé (0.10 = 10 %%)")
+    parser.add_argument('--echec-si-regression', action='store_true',
+                        help="code de sortie 1 si un cas a régressé (intégration continue)")
+    args = parser.parse_args()
+
+    if args.comparer and len(args.comparer) > 2:
+        parser.error("--comparer attend un ou deux fichiers")
+    if args.comparer and len(args.comparer) == 2:
+        nouveau = _charger(args.comparer[1])
+    else:
+        nouveau, _ = executer(args)
+    if args.comparer:
+        regressions = comparer(_charger(args.comparer[0]), nouveau, args.seuil)
+        if regressions and args.echec_si_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Agrégats des événements analytics
+Compactage incrémental vers des compteurs horaires et journaliers
+"""
+
+import gzip
+import json
+import sqlite3
+from typing import Any, Callable, Dict, Optional
+
+from models.taches import TachePeriodique
+
+# Table d'agrégat -> expression de la période calculée depuis analytics.timestamp
+PERIODES = {
+    'analytics_horaire': ('heure', "strftime('%Y-%m-%d %H:00:00', timestamp)"),
+    'analytics_journalier': ('jour', "date(timestamp)"),
+}
+
+
+def lire_marque(conn: sqlite3.Connection) -> int:
+    """Plus grand id d'analytics déjà reporté dans les agrégats."""
+    row = conn.execute("SELECT valeur FROM analytics_etat WHERE cle = 'dernier_id_agrege'").fetchone()
+    return row[0] if row else 0
+
+
+class CompacteurAnalytics:
+    """Reporter les nouveaux événements bruts dans les tables d'agrégats.
+
+    Une marque (``analytics_etat.dernier_id_agrege``) retient le dernier id
+    compacté : chaque passe agrège les lignes d'id supérieur, par lots de
+    ``taille_lot``, et avance la marque dans la même transaction que les
+    agrégats. Un événement n'est donc compté qu'une fois, même après un
+    échec ou un redémarrage.
+    """
+
+    def __init__(self, ecrire: Callable[[Callable[[sqlite3.Connection], Any]], Any],
+                 intervalle: Optional[float] = None, taille_lot: int = 50_000):
+        self._ecrire = ecrire
+        self.taille_lot = taille_lot
+        self._tache = (
+            TachePeriodique(self.compacter, intervalle, nom='compacteur-analytics') if intervalle else None
+        )
+
+    def _compacter_lot(self, conn: sqlite3.Connection) -> int:
+        # Exécuté sous le verrou d'écriture (BEGIN IMMEDIATE de _ecrire) : deux
+        # compactages concurrents ne peuvent lire la même marque
+        debut = lire_marque(conn)
+        fin = conn.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM analytics WHERE id > ? ORDER BY id LIMIT ?)",
+            (debut, self.taille_lot),
+        ).fetchone()[0]
+        if fin is None:
+            return 0
+        for table, (colonne, expression) in PERIODES.items():
+            conn.execute(f"""
+                INSERT INTO {table} ({colonne}, annonce_id, type_evenement, source_utm, total)
+                SELECT {expression}, annonce_id, type_evenement, COALESCE(source_utm, ''), COUNT(*)
+                FROM analytics WHERE id > ? AND id <= ? AND annonce_id IS NOT NULL
+                  AND date(timestamp) IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT DO UPDATE SET total = total + excluded.total
+            """, (debut, fin))
+        conn.execute("UPDATE analytics_etat SET valeur = ? WHERE cle = 'dernier_id_agrege'", (fin,))
+        return fin - debut
+
+    def compacter(self) -> int:
+        """Agréger tous les événements en attente ; retourne l'avancée de la marque (en ids)."""
+        total = 0
+        while True:
+            avance = self._ecrire(self._compacter_lot)
+            if not avance:
+                return total
+            total += avance
+
+    def purger(self, jours_bruts: int, jours_horaires: Optional[int] = None,
+               archive: Optional[str] = None, taille_lot: int = 10_000) -> Dict[str, int]:
+        """Supprimer les événements bruts de plus de ``jours_bruts`` jours.
+
+        Seuls les événements déjà agrégés sont supprimés. Avec ``archive``
+        (chemin d'un fichier ``.jsonl.gz``), ils y sont d'abord ajoutés, une
+        ligne JSON par événement. ``jours_horaires`` borne de même la durée
+        de conservation des agrégats horaires ; les journaliers sont gardés.
+        """
+        self.compacter()
+        limite = f'-{int(jours_bruts)} days'
+
+        def operation(conn: sqlite3.Connection) -> list:
+            curseur = conn.execute("""
+                SELECT * FROM analytics
+                WHERE timestamp < datetime('now', ?) AND id <= ?
+                ORDER BY id LIMIT ?
+            """, (limite, lire_marque(conn), taille_lot))
+            rows = curseur.fetchall()
+            if rows:
+                # Archiver avant de supprimer : une suppression échouée laisse au pire un doublon
+                if archive:
+                    colonnes = [description[0] for description in curseur.description]
+                    with gzip.open(archive, 'at', encoding='utf-8') as fichier:
+                        for row in rows:
+                            fichier.write(json.dumps(dict(zip(colonnes, row)), ensure_ascii=False) + '\n')
+                conn.execute(
+                    "DELETE FROM analytics WHERE id BETWEEN ? AND ? AND timestamp < datetime('now', ?)",
+                    (rows[0][0], rows[-1][0], limite),
+                )
+            return rows
+
+        supprimes = 0
+        while True:
+            rows = self._ecrire(operation)
+            supprimes += len(rows)
+            if len(rows) < taille_lot:
+                break
+
+        horaires = 0
+        if jours_horaires is not None:
+            horaires = self._ecrire(lambda conn: conn.execute(
+                "DELETE FROM analytics_horaire WHERE heure < datetime('now', ?)",
+                (f'-{int(jours_horaires)} days',),
+            ).rowcount)
+        return {'evenements': supprimes, 'agregats_horaires': horaires}
+
+    def fermer(self) -> None:
+        """Arrêter le compactage périodique et agréger le reliquat."""
+        if self._tache is not None:
+            self._tache.arreter()
+            self._tache = None
+            self.compacter()
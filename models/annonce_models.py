@@ -3,11 +3,23 @@ Modèles spécifiques pour chaque catégorie d'annonces
 Immobilier, Véhicules, Matériel Informatique
 """
 
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+from typing import Callable, List, Dict, Optional, Any
 from datetime import datetime
 
-@dataclass
+from models.texte import normaliser_texte
+
+CATEGORIES = ('immobilier', 'vehicules', 'informatique')
+TYPES_ANNONCE = ('vente', 'location')
+STATUTS = ('brouillon', 'publie', 'expire', 'archive')
+CARBURANTS = ('essence', 'diesel', 'hybride', 'electrique')
+TRANSMISSIONS = ('manuelle', 'automatique')
+
+# Années de mise en circulation acceptées (la borne haute suit l'année courante)
+ANNEE_MIN_VEHICULE = 1900
+
+@dataclass(slots=True)
 class AnnonceBase:
     """Modèle de base pour toutes les annonces"""
     titre: str
@@ -33,7 +45,33 @@ class AnnonceBase:
         """Méthode appelée après l'initialisation"""
         pass
 
-@dataclass
+    def valider(self) -> None:
+        """Vérifier les champs communs ; lève ValueError si l'annonce est invalide."""
+        if not self.titre or not self.description:
+            raise ValueError("Le titre et la description sont obligatoires")
+        if self.categorie not in CATEGORIES:
+            raise ValueError(f"Catégorie invalide : {self.categorie}")
+        if self.type_annonce not in TYPES_ANNONCE:
+            raise ValueError(f"Type d'annonce invalide : {self.type_annonce}")
+        if self.statut not in STATUTS:
+            raise ValueError(f"Statut invalide : {self.statut}")
+        if not isinstance(self.prix, (int, float)) or self.prix < 0:
+            raise ValueError(f"Prix invalide : {self.prix}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Données spécifiques à la catégorie (aucune pour la classe de base)"""
+        return {}
+
+    def vers_donnees(self) -> Dict[str, Any]:
+        """Convertir en dictionnaire au format attendu par Database.ajouter_annonce"""
+        donnees = dict(zip(CHAMPS_BASE, _lire_champs_base(self)))
+        donnees['donnees_specifiques'] = self.to_dict()
+        for champ in ('date_creation', 'date_expiration'):
+            if isinstance(donnees[champ], datetime):
+                donnees[champ] = donnees[champ].isoformat(sep=' ', timespec='seconds')
+        return donnees
+
+@dataclass(slots=True)
 class AnnonceImmobilier(AnnonceBase):
     """Modèle spécifique pour les annonces immobilières"""
     type_bien: str = ''  # 'maison', 'appartement', 'terrain', 'bureau', 'commerce'
@@ -54,31 +92,10 @@ class AnnonceImmobilier(AnnonceBase):
     disponibilite: Optional[datetime] = None
 
     def __post_init__(self):
-        super().__post_init__()
+        AnnonceBase.__post_init__(self)
         self.categorie = 'immobilier'
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convertir en dictionnaire pour stockage en base"""
-        return {
-            'type_bien': self.type_bien,
-            'surface': self.surface,
-            'nombre_chambres': self.nombre_chambres,
-            'nombre_salles_bain': self.nombre_salles_bain,
-            'nombre_pieces': self.nombre_pieces,
-            'etage': self.etage,
-            'ascenseur': self.ascenseur,
-            'parking': self.parking,
-            'jardin': self.jardin,
-            'piscine': self.piscine,
-            'climatisation': self.climatisation,
-            'meuble': self.meuble,
-            'charges_incluses': self.charges_incluses,
-            'caution': self.caution,
-            'frais_agence': self.frais_agence,
-            'disponibilite': self.disponibilite.isoformat() if self.disponibilite else None
-        }
-
-@dataclass
+
+@dataclass(slots=True)
 class AnnonceVehicule(AnnonceBase):
     """Modèle spécifique pour les annonces de véhicules"""
     marque: str = ''
@@ -101,33 +118,26 @@ class AnnonceVehicule(AnnonceBase):
     accidents: bool = False
     
     def __post_init__(self):
-        super().__post_init__()
+        AnnonceBase.__post_init__(self)
         self.categorie = 'vehicules'
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convertir en dictionnaire pour stockage en base"""
-        return {
-            'marque': self.marque,
-            'modele': self.modele,
-            'annee': self.annee,
-            'kilometrage': self.kilometrage,
-            'carburant': self.carburant,
-            'transmission': self.transmission,
-            'couleur': self.couleur,
-            'nombre_portes': self.nombre_portes,
-            'nombre_places': self.nombre_places,
-            'puissance': self.puissance,
-            'cylindree': self.cylindree,
-            'etat': self.etat,
-            'premiere_main': self.premiere_main,
-            'carnet_entretien': self.carnet_entretien,
-            'controle_technique': self.controle_technique,
-            'assurance_valide': self.assurance_valide,
-            'papiers_en_regle': self.papiers_en_regle,
-            'accidents': self.accidents
-        }
-
-@dataclass
+
+    def valider(self) -> None:
+        """Vérifier aussi année, kilométrage, carburant et transmission (s'ils sont renseignés)."""
+        AnnonceBase.valider(self)
+        if self.annee is not None and (
+            not isinstance(self.annee, int) or not ANNEE_MIN_VEHICULE <= self.annee <= datetime.now().year + 1
+        ):
+            raise ValueError(f"Année invalide : {self.annee}")
+        if self.kilometrage is not None and (
+            not isinstance(self.kilometrage, (int, float)) or self.kilometrage < 0
+        ):
+            raise ValueError(f"Kilométrage invalide : {self.kilometrage}")
+        if self.carburant and normaliser_texte(self.carburant) not in CARBURANTS:
+            raise ValueError(f"Carburant invalide : {self.carburant}")
+        if self.transmission and normaliser_texte(self.transmission) not in TRANSMISSIONS:
+            raise ValueError(f"Transmission invalide : {self.transmission}")
+
+@dataclass(slots=True)
 class AnnonceInformatique(AnnonceBase):
     """Modèle spécifique pour les annonces de matériel informatique"""
     type_materiel: str = ''  # 'ordinateur_portable', 'ordinateur_bureau', 'smartphone', 'tablette', 'accessoire'
@@ -149,30 +159,96 @@ class AnnonceInformatique(AnnonceBase):
     facture_disponible: bool = False
     
     def __post_init__(self):
-        super().__post_init__()
+        AnnonceBase.__post_init__(self)
         self.categorie = 'informatique'
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convertir en dictionnaire pour stockage en base"""
-        return {
-            'type_materiel': self.type_materiel,
-            'marque': self.marque,
-            'modele': self.modele,
-            'processeur': self.processeur,
-            'memoire_ram': self.memoire_ram,
-            'stockage': self.stockage,
-            'type_stockage': self.type_stockage,
-            'carte_graphique': self.carte_graphique,
-            'taille_ecran': self.taille_ecran,
-            'resolution_ecran': self.resolution_ecran,
-            'systeme_exploitation': self.systeme_exploitation,
-            'etat': self.etat,
-            'garantie': self.garantie,
-            'duree_garantie': self.duree_garantie,
-            'accessoires_inclus': self.accessoires_inclus,
-            'boite_origine': self.boite_origine,
-            'facture_disponible': self.facture_disponible
-        }
+
+CLASSES_PAR_CATEGORIE = {
+    'immobilier': AnnonceImmobilier,
+    'vehicules': AnnonceVehicule,
+    'informatique': AnnonceInformatique,
+}
+
+# Noms des champs, calculés une fois (dataclasses.fields est coûteux)
+CHAMPS_BASE = tuple(champ.name for champ in fields(AnnonceBase))
+_lire_champs_base = attrgetter(*CHAMPS_BASE)
+
+
+def _est_date(champ) -> bool:
+    return champ.type is datetime or datetime in getattr(champ.type, '__args__', ())
+
+
+def _compiler(nom: str, source: str, espace: Dict[str, Any]) -> Callable:
+    exec(source, espace)
+    return espace[nom]
+
+
+def _generer_to_dict(classe: type) -> Callable[[AnnonceBase], Dict[str, Any]]:
+    """``to_dict`` de la catégorie : un littéral de dictionnaire sur ses champs propres."""
+    elements = []
+    for champ in fields(classe):
+        if champ.name in CHAMPS_BASE:
+            continue
+        valeur = f"self.{champ.name}"
+        if _est_date(champ):
+            valeur = f"{valeur}.isoformat() if {valeur} else None"
+        elements.append(f"{champ.name!r}: {valeur}")
+    source = "def to_dict(self):\n    return {" + ", ".join(elements) + "}\n"
+    fonction = _compiler('to_dict', source, {})
+    fonction.__qualname__ = f"{classe.__name__}.to_dict"
+    fonction.__doc__ = "Convertir en dictionnaire pour stockage en base"
+    return fonction
+
+
+def _generer_constructeur(classe: type) -> Callable[[Dict[str, Any]], AnnonceBase]:
+    """Construire une instance depuis une annonce au format base, sans parcourir ses clés.
+
+    Pour chaque champ, la valeur de ``donnees_specifiques`` l'emporte sur
+    celle de premier niveau ; les valeurs None sont ignorées et les dates
+    des champs propres sont relues depuis leur forme ISO.
+    """
+    lignes = [
+        "def construire(donnees):",
+        "    specifiques = donnees.get('donnees_specifiques') or {}",
+        "    valeurs = {}",
+    ]
+    for champ in fields(classe):
+        nom = champ.name
+        lignes += [
+            f"    valeur = specifiques.get({nom!r})",
+            "    if valeur is None:",
+            f"        valeur = donnees.get({nom!r})",
+            "    if valeur is not None:",
+        ]
+        if _est_date(champ) and nom not in CHAMPS_BASE:
+            lignes += [
+                "        if isinstance(valeur, str):",
+                "            valeur = datetime.fromisoformat(valeur)",
+            ]
+        lignes.append(f"        valeurs[{nom!r}] = valeur")
+    lignes.append("    return classe(**valeurs)")
+    return _compiler('construire', "\n".join(lignes) + "\n", {'classe': classe, 'datetime': datetime})
+
+
+# Sérialisation et construction générées une fois par catégorie
+_CONSTRUCTEURS: Dict[type, Callable[[Dict[str, Any]], AnnonceBase]] = {}
+for _classe in CLASSES_PAR_CATEGORIE.values():
+    _classe.to_dict = _generer_to_dict(_classe)
+    _CONSTRUCTEURS[_classe] = _generer_constructeur(_classe)
+del _classe
+
+def annonce_depuis_dict(donnees: Dict[str, Any]) -> AnnonceBase:
+    """Construire le modèle de la catégorie à partir d'une annonce au format base.
+
+    Les champs de ``donnees_specifiques`` alimentent les attributs propres à
+    la catégorie ; les clés inconnues sont ignorées.
+    """
+    classe = CLASSES_PAR_CATEGORIE.get(donnees.get('categorie'))
+    if classe is None:
+        raise ValueError(f"Catégorie invalide : {donnees.get('categorie')}")
+    try:
+        return _CONSTRUCTEURS[classe](donnees)
+    except TypeError as exc:  # champ obligatoire manquant
+        raise ValueError(str(exc)) from exc
 
 # Constantes pour les choix dans les formulaires
 VILLES_GABON = [
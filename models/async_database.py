@@ -0,0 +1,101 @@
+"""
+Façade asynchrone de Database pour un front web asyncio
+Les appels bloquants s'exécutent sur un pool de threads borné
+"""
+
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from models.database import Database
+
+# Méthodes publiques de Database gardées hors de la façade : cycle de vie et
+# connexions, propres à AsyncDatabase, et générateurs, qui bloqueraient à chaque
+# élément hors du pool de threads
+METHODES_SYNCHRONES = frozenset({
+    'fermer', 'connexion', 'get_connection', 'init_database',
+    'exporter_annonces', 'iterer_annonces',
+})
+
+# Méthodes de Database exposées en coroutines par AsyncDatabase, dans l'ordre de la classe
+METHODES_ASYNCHRONES = tuple(
+    nom for nom, attribut in vars(Database).items()
+    if inspect.isfunction(attribut) and not nom.startswith('_') and nom not in METHODES_SYNCHRONES
+)
+
+
+class AsyncDatabase:
+    """Même surface que Database, en coroutines.
+
+    Les appels s'exécutent sur un ThreadPoolExecutor de la taille du pool
+    de connexions, pour qu'aucun thread n'attende une connexion. Au-delà
+    de ``max_en_attente`` appels en cours ou en file, les appelants
+    attendent leur tour (contre-pression) au lieu d'empiler du travail.
+
+    L'annulation d'une coroutine retire l'appel de la file s'il n'a pas
+    encore démarré ; une requête SQLite déjà en cours va à son terme.
+    """
+
+    def __init__(self, db: Optional[Database] = None, max_en_attente: Optional[int] = None,
+                 **options_database: Any):
+        self.db = db if db is not None else Database(**options_database)
+        self._proprietaire = db is None
+        taille = self.db._pool.taille
+        self._executeur = ThreadPoolExecutor(max_workers=taille, thread_name_prefix='async-db')
+        self._max_en_attente = max_en_attente or taille * 4
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _executer(self, fonction, *args, **kwargs) -> Any:
+        if self._semaphore is None:
+            # Créé à la première utilisation, dans la boucle d'événements courante
+            self._semaphore = asyncio.Semaphore(self._max_en_attente)
+        async with self._semaphore:
+            boucle = asyncio.get_running_loop()
+            return await boucle.run_in_executor(
+                self._executeur, functools.partial(fonction, *args, **kwargs)
+            )
+
+    async def rassembler(self, *appels: Awaitable[Any]) -> Tuple[Any, ...]:
+        """Exécuter plusieurs appels en parallèle et retourner leurs résultats dans l'ordre."""
+        return tuple(await asyncio.gather(*appels))
+
+    async def obtenir_annonce_avec_statistiques(self, annonce_id: int) -> Optional[Dict[str, Any]]:
+        """Annonce et résumé analytics, lus en parallèle ; None si l'annonce n'existe pas."""
+        annonce, statistiques = await self.rassembler(
+            self.obtenir_annonce_par_id(annonce_id),
+            self.obtenir_statistiques_annonce(annonce_id),
+        )
+        if annonce is None:
+            return None
+        annonce['statistiques'] = statistiques
+        return annonce
+
+    async def fermer(self) -> None:
+        """Attendre les appels en cours puis fermer la base si elle a été créée ici."""
+        boucle = asyncio.get_running_loop()
+        await boucle.run_in_executor(None, functools.partial(self._executeur.shutdown, wait=True))
+        if self._proprietaire:
+            await boucle.run_in_executor(None, self.db.fermer)
+
+    async def __aenter__(self) -> "AsyncDatabase":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.fermer()
+
+
+def _methode_asynchrone(nom: str):
+    methode = getattr(Database, nom)
+
+    @functools.wraps(methode)
+    async def appel(self: AsyncDatabase, *args: Any, **kwargs: Any) -> Any:
+        return await self._executer(getattr(self.db, nom), *args, **kwargs)
+
+    return appel
+
+
+for _nom in METHODES_ASYNCHRONES:
+    setattr(AsyncDatabase, _nom, _methode_asynchrone(_nom))
+del _nom
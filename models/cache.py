@@ -0,0 +1,80 @@
+"""
+Cache mémoire LRU avec expiration (TTL)
+Utilisé par Database pour les paramètres, les annonces et les pages de résultats
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+# Valeur retournée par CacheLRU.obtenir lorsqu'une clé est absente ou expirée
+ABSENT = object()
+
+
+class CacheLRU:
+    """Cache borné en nombre d'entrées, éviction LRU et expiration par TTL.
+
+    Sûr entre threads ; ``statistiques()`` expose succès, échecs, évictions
+    et expirations.
+    """
+
+    def __init__(self, taille_max: int = 1024, ttl: float = 60.0):
+        if taille_max < 1:
+            raise ValueError("La taille du cache doit être au moins 1")
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def obtenir(self, cle: Hashable) -> Any:
+        """Valeur associée à ``cle`` ou ``ABSENT``."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.echecs += 1
+                return ABSENT
+            expiration, valeur = entree
+            if expiration < time.monotonic():
+                del self._entrees[cle]
+                self.expirations += 1
+                self.echecs += 1
+                return ABSENT
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return valeur
+
+    def definir(self, cle: Hashable, valeur: Any) -> None:
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + self.ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def invalider(self, cle: Hashable) -> None:
+        with self._verrou:
+            self._entrees.pop(cle, None)
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+    def statistiques(self) -> Dict[str, Any]:
+        total = self.succes + self.echecs
+        return {
+            'entrees': len(self._entrees),
+            'taille_max': self.taille_max,
+            'succes': self.succes,
+            'echecs': self.echecs,
+            'taux_succes': self.succes / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,139 @@
+"""
+Accumulateur de compteurs d'annonces (vues, clics contact, partages)
+Coalesce les incréments en mémoire et les écrit par lots
+"""
+
+import itertools
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from models.taches import TachePeriodique
+
+COLONNES_COMPTEURS = ('vues', 'clics_contact', 'partages')
+
+
+class CompteursAccumules:
+    """Deltas de compteurs par annonce, répartis en fragments par thread.
+
+    Chaque thread reçoit un fragment à sa première incrémentation (tour à
+    tour), ce qui limite la contention sur les verrous. ``vider`` fusionne
+    les fragments et applique tous les deltas en un seul UPDATE groupé
+    (``executemany``).
+
+    Les lectures passent par ``lire_avec_deltas`` pour ajouter les deltas
+    non encore écrits à la valeur stockée : un compteur de génération
+    (impair pendant la fusion des fragments, puis de l'UPDATE à l'oubli
+    des deltas écrits) garantit qu'un delta n'est compté ni zéro ni deux
+    fois pendant qu'il passe de la mémoire à la base. L'attente du verrou
+    d'écriture se fait en génération paire : elle ne bloque pas les lectures.
+    """
+
+    def __init__(self, ecrire: Callable[[Callable[[sqlite3.Connection], Any]], Any],
+                 fragments: int = 16, intervalle: Optional[float] = 1.0,
+                 apres_vidage: Optional[Callable[[List[int]], None]] = None):
+        """``apres_vidage(ids)`` est appelé après chaque écriture, avant toute nouvelle lecture."""
+        self._ecrire = ecrire
+        self._apres_vidage = apres_vidage
+        self._fragments: List[Dict[int, List[int]]] = [{} for _ in range(fragments)]
+        self._verrous = [threading.Lock() for _ in range(fragments)]
+        # get_ident() est une adresse alignée : modulo le nombre de fragments, toujours 0
+        self._fragment_du_thread = threading.local()
+        self._attribution = itertools.count()
+        self._en_vol: Dict[int, List[int]] = {}
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._verrou_vidage = threading.Lock()
+        self._tache = (
+            TachePeriodique(self.vider, intervalle, nom='compteurs-annonces') if intervalle else None
+        )
+
+    def incrementer(self, annonce_id: int, colonne: str, pas: int = 1) -> None:
+        """Ajouter ``pas`` au compteur ``colonne`` de l'annonce."""
+        position = COLONNES_COMPTEURS.index(colonne)
+        indice = getattr(self._fragment_du_thread, 'indice', None)
+        if indice is None:
+            indice = self._fragment_du_thread.indice = next(self._attribution) % len(self._fragments)
+        with self._verrous[indice]:
+            deltas = self._fragments[indice].get(annonce_id)
+            if deltas is None:
+                deltas = self._fragments[indice][annonce_id] = [0, 0, 0]
+            deltas[position] += pas
+
+    def en_attente(self, annonce_id: int) -> Dict[str, int]:
+        """Deltas non encore visibles en base pour une annonce."""
+        total = [0, 0, 0]
+        sources = [self._en_vol] + self._fragments
+        for source in sources:
+            deltas = source.get(annonce_id)
+            if deltas:
+                for position, valeur in enumerate(deltas):
+                    total[position] += valeur
+        return dict(zip(COLONNES_COMPTEURS, total))
+
+    def lire_avec_deltas(self, lire: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Exécuter ``lire`` et ajouter les deltas en attente aux annonces retournées."""
+        while True:
+            with self._condition:
+                while self._generation % 2:
+                    self._condition.wait()
+                generation = self._generation
+            annonces = lire()
+            for annonce in annonces:
+                for colonne, delta in self.en_attente(annonce['id']).items():
+                    if delta and colonne in annonce:
+                        annonce[colonne] = (annonce[colonne] or 0) + delta
+            if self._generation == generation:
+                return annonces
+
+    def _changer_generation(self) -> None:
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def vider(self) -> int:
+        """Écrire les deltas accumulés ; retourne le nombre d'annonces touchées."""
+        with self._verrou_vidage:
+            self._changer_generation()
+            try:
+                for indice, verrou in enumerate(self._verrous):
+                    with verrou:
+                        fragment, self._fragments[indice] = self._fragments[indice], {}
+                    for annonce_id, deltas in fragment.items():
+                        cumul = self._en_vol.setdefault(annonce_id, [0, 0, 0])
+                        for position, valeur in enumerate(deltas):
+                            cumul[position] += valeur
+            finally:
+                self._changer_generation()
+            if not self._en_vol:
+                return 0
+
+            lignes = [(*deltas, annonce_id) for annonce_id, deltas in self._en_vol.items()]
+
+            def operation(conn: sqlite3.Connection) -> None:
+                # Verrou d'écriture déjà pris : les lectures n'attendent plus que l'UPDATE et le commit
+                self._changer_generation()
+                conn.executemany(
+                    "UPDATE annonces SET vues = vues + ?, clics_contact = clics_contact + ?, "
+                    "partages = partages + ? WHERE id = ?",
+                    lignes,
+                )
+
+            try:
+                self._ecrire(operation)
+                # En cas d'échec, les deltas restent « en vol » pour le prochain vidage
+                annonces = list(self._en_vol)
+                self._en_vol = {}
+                if self._apres_vidage is not None:
+                    self._apres_vidage(annonces)
+            finally:
+                if self._generation % 2:
+                    self._changer_generation()
+            return len(lignes)
+
+    def fermer(self) -> None:
+        """Arrêter le vidage périodique et écrire le reliquat."""
+        if self._tache is not None:
+            self._tache.arreter()
+            self._tache = None
+        self.vider()
@@ -0,0 +1,274 @@
+"""
+Gestion des connexions SQLite réutilisables
+Pool borné de connexions longues durées partagées entre threads
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Any
+
+# PRAGMA appliqués une seule fois, à l'ouverture de chaque connexion
+PRAGMAS_PAR_DEFAUT: Dict[str, Any] = {
+    'temp_store': 'MEMORY',  # tris et index temporaires hors disque
+}
+
+
+class PoolFermeError(RuntimeError):
+    """Levée lorsqu'on emprunte une connexion à un pool fermé."""
+
+
+class PoolConnexions:
+    """Pool borné de connexions SQLite, sûr entre threads.
+
+    Les connexions sont créées à la demande jusqu'à ``taille`` puis
+    réutilisées : les emprunteurs suivants attendent qu'une connexion
+    soit rendue (au plus ``delai_attente`` secondes). ``fabrique`` est la
+    classe (ou fabrique) de connexion passée à ``sqlite3.connect``.
+    """
+
+    def __init__(self, db_path: str, taille: int = 5,
+                 pragmas: Optional[Dict[str, Any]] = None,
+                 delai_attente: float = 30.0,
+                 fabrique: Callable[..., sqlite3.Connection] = sqlite3.Connection):
+        if taille < 1:
+            raise ValueError("La taille du pool doit être au moins 1")
+        self.db_path = db_path
+        self.taille = taille
+        self.pragmas = dict(PRAGMAS_PAR_DEFAUT if pragmas is None else pragmas)
+        self.delai_attente = delai_attente
+        self.fabrique = fabrique
+        self._disponibles: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._toutes: List[sqlite3.Connection] = []
+        self._verrou = threading.Lock()
+        self._ferme = False
+
+    def _ouvrir(self) -> sqlite3.Connection:
+        """Ouvrir une nouvelle connexion et appliquer les PRAGMA."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=self.fabrique)
+        conn.row_factory = sqlite3.Row
+        for nom, valeur in self.pragmas.items():
+            conn.execute(f"PRAGMA {nom} = {valeur}")
+        return conn
+
+    def acquerir(self) -> sqlite3.Connection:
+        """Obtenir une connexion du pool (à rendre avec ``liberer``)."""
+        if self._ferme:
+            raise PoolFermeError("Le pool de connexions est fermé")
+        try:
+            return self._disponibles.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._verrou:
+            if len(self._toutes) < self.taille:
+                conn = self._ouvrir()
+                self._toutes.append(conn)
+                return conn
+
+        try:
+            return self._disponibles.get(timeout=self.delai_attente)
+        except queue.Empty:
+            raise TimeoutError(
+                f"Aucune connexion disponible après {self.delai_attente}s"
+            ) from None
+
+    def liberer(self, conn: sqlite3.Connection) -> None:
+        """Rendre une connexion au pool."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._ferme:
+            conn.close()
+            return
+        self._disponibles.put(conn)
+
+    @contextmanager
+    def connexion(self) -> Iterator[sqlite3.Connection]:
+        """Emprunter une connexion le temps d'un bloc ``with``.
+
+        Une transaction laissée ouverte (exception ou oubli de commit)
+        est annulée avant que la connexion ne retourne dans le pool.
+        """
+        conn = self.acquerir()
+        try:
+            yield conn
+        finally:
+            self.liberer(conn)
+
+    def fermer(self) -> None:
+        """Fermer toutes les connexions ; les emprunts en cours sont fermés à leur retour."""
+        with self._verrou:
+            self._ferme = True
+            while True:
+                try:
+                    self._disponibles.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._toutes.clear()
+
+    @property
+    def ferme(self) -> bool:
+        return self._ferme
+
+
+# Profil opt-in pour les charges concurrentes lecteurs/écrivains
+PRAGMAS_PERFORMANCE: Dict[str, Any] = {
+    **PRAGMAS_PAR_DEFAUT,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # en Kio : 64 Mio par connexion
+    'busy_timeout': 5000,  # en millisecondes
+}
+
+PROFILS: Dict[str, Dict[str, Any]] = {
+    'standard': PRAGMAS_PAR_DEFAUT,
+    'performance': PRAGMAS_PERFORMANCE,
+}
+
+
+class EcrivainUnique:
+    """Thread écrivain dédié sérialisant toutes les écritures.
+
+    Les opérations soumises (``fonction(conn)``) sont exécutées dans
+    l'ordre sur une connexion réservée. Les opérations en attente sont
+    regroupées dans une même transaction (un point de sauvegarde par
+    opération), ce qui amortit le coût du commit.
+
+    La connexion est ouverte par le constructeur, qui lève l'erreur
+    d'ouverture. Si le thread s'arrête sur une erreur, les écritures en
+    attente échouent avec elle et ``soumettre`` la lève ensuite.
+    """
+
+    _ARRET = object()
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None,
+                 taille_lot: int = 100,
+                 fabrique: Callable[..., sqlite3.Connection] = sqlite3.Connection):
+        self.db_path = db_path
+        self.fabrique = fabrique
+        self.pragmas = dict(PRAGMAS_PAR_DEFAUT if pragmas is None else pragmas)
+        self.taille_lot = taille_lot
+        self._file: "queue.Queue[Any]" = queue.Queue()
+        self._ferme = False
+        self._erreur: Optional[BaseException] = None
+        self._verrou = threading.Lock()  # soumission contre arrêt sur erreur
+        self._conn = self._ouvrir()
+        self._thread = threading.Thread(target=self._boucle, name='sqlite-ecrivain', daemon=True)
+        self._thread.start()
+
+    def _ouvrir(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               factory=self.fabrique)
+        conn.row_factory = sqlite3.Row
+        try:
+            for nom, valeur in self.pragmas.items():
+                conn.execute(f"PRAGMA {nom} = {valeur}")
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def soumettre(self, fonction: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Mettre une écriture en file ; le résultat est disponible après commit."""
+        with self._verrou:
+            if self._erreur is not None:
+                raise self._erreur
+            if self._ferme:
+                raise PoolFermeError("L'écrivain est arrêté")
+            futur: Future = Future()
+            self._file.put((fonction, futur))
+        return futur
+
+    def executer(self, fonction: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Soumettre une écriture et attendre son résultat."""
+        return self.soumettre(fonction).result()
+
+    def _boucle(self) -> None:
+        conn = self._conn
+        lot: List[Any] = []
+        try:
+            while True:
+                element = self._file.get()
+                if element is self._ARRET:
+                    break
+                lot = [element]
+                arret = False
+                while len(lot) < self.taille_lot:
+                    try:
+                        suivant = self._file.get_nowait()
+                    except queue.Empty:
+                        break
+                    if suivant is self._ARRET:
+                        arret = True
+                        break
+                    lot.append(suivant)
+                self._executer_lot(conn, lot)
+                if arret:
+                    break
+        except BaseException as exc:
+            self._echouer(exc, lot)
+        finally:
+            conn.close()
+
+    def _echouer(self, exc: BaseException, lot: List[Any]) -> None:
+        """Refuser les écritures futures et faire échouer celles du lot et de la file avec ``exc``."""
+        with self._verrou:
+            self._erreur = exc
+            self._ferme = True
+        en_attente = list(lot)
+        while True:
+            try:
+                en_attente.append(self._file.get_nowait())
+            except queue.Empty:
+                break
+        for element in en_attente:
+            if element is self._ARRET:
+                continue
+            futur = element[1]
+            if not futur.done() and (futur.running() or futur.set_running_or_notify_cancel()):
+                futur.set_exception(exc)
+
+    def _executer_lot(self, conn: sqlite3.Connection, lot: List[Any]) -> None:
+        resultats = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fonction, futur in lot:
+                if not futur.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT operation")
+                try:
+                    resultat = fonction(conn)
+                except BaseException as exc:
+                    conn.execute("ROLLBACK TO operation")
+                    conn.execute("RELEASE operation")
+                    resultats.append((futur, None, exc))
+                else:
+                    conn.execute("RELEASE operation")
+                    resultats.append((futur, resultat, None))
+            conn.execute("COMMIT")
+        except BaseException as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, futur in lot:
+                if futur.done():
+                    continue
+                if futur.running() or futur.set_running_or_notify_cancel():
+                    futur.set_exception(exc)
+            return
+
+        for futur, resultat, exc in resultats:
+            if exc is None:
+                futur.set_result(resultat)
+            else:
+                futur.set_exception(exc)
+
+    def fermer(self) -> None:
+        """Traiter les écritures en attente puis arrêter le thread."""
+        if self._ferme:
+            return
+        self._ferme = True
+        self._file.put(self._ARRET)
+        self._thread.join()
@@ -5,15 +5,303 @@ Gestion des annonces immobilières, véhicules et matériel informatique
 
 import sqlite3
 import json
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Any, Tuple, TypeVar, Union
+import atexit
+import base64
+import binascii
+import csv
+import io
 import os
+import threading
+
+from models.annonce_models import CATEGORIES, STATUTS, AnnonceBase, annonce_depuis_dict
+
+from models import doublons, facettes
+from models.agregats import CompacteurAnalytics, lire_marque
+from models.cache import ABSENT, CacheLRU
+from models.compteurs import CompteursAccumules
+from models.connexions import PROFILS, EcrivainUnique, PoolConnexions
+from models.expiration import PlanificateurExpiration
+from models.instrumentation import Instrumentation
+from models.lignes import AnnonceParesseuse, charger_json, deserialiser_annonce
+from models.medias import VARIANTE_MINIATURE, DepotMedias, miniature_principale
+from models.migrations import appliquer_migrations
+from models.stockage import StockageFroid
+from models.tampon_evenements import COMPTEURS_PAR_EVENEMENT, ConfigTampon, TamponEvenements
+from models.texte import borne_prefixe, expression_fts, normaliser_texte
+
+T = TypeVar('T')
+
+def _copier_annonce(annonce: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie d'une annonce mémorisée, protégeant les champs JSON mutables."""
+    copie = dict(annonce)
+    for champ in ('donnees_specifiques', 'photos', 'videos', 'medias'):
+        valeur = copie.get(champ)
+        if isinstance(valeur, (dict, list)):
+            copie[champ] = valeur.copy()
+    return copie
+
+def _copier_annonces(annonces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [_copier_annonce(annonce) for annonce in annonces]
+
+def _copier_facettes(comptes: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    return {facette: [dict(valeur) for valeur in valeurs] for facette, valeurs in comptes.items()}
+
+# Colonnes stockées retournées pour une annonce (hors colonnes techniques et générées)
+COLONNES_ANNONCE = (
+    'id', 'titre', 'description', 'categorie', 'type_annonce', 'prix', 'devise',
+    'localisation', 'ville', 'quartier', 'contact_nom', 'contact_telephone',
+    'contact_email', 'contact_whatsapp', 'statut', 'date_creation', 'date_modification',
+    'date_expiration', 'vues', 'clics_contact', 'partages', 'donnees_specifiques',
+    'photos', 'videos', 'medias', 'miniature',
+)
+SELECT_ANNONCE = ', '.join(f'annonces.{colonne}' for colonne in COLONNES_ANNONCE)
+
+# Vue « carte » des pages de liste : pas de description ni de JSON à décoder
+COLONNES_CARTE = (
+    'id', 'titre', 'categorie', 'type_annonce', 'prix', 'devise', 'ville',
+    'quartier', 'statut', 'date_creation', 'vues', 'miniature',
+)
+SELECT_CARTE = ', '.join(f'annonces.{colonne}' for colonne in COLONNES_CARTE) + (
+    ", CASE WHEN json_valid(annonces.photos)"
+    " THEN json_extract(annonces.photos, '$[0]') END AS photo_principale"
+)
+
+VUES = {'complete': SELECT_ANNONCE, 'carte': SELECT_CARTE}
+
+# Méthodes publiques laissées hors de l'instrumentation (accès aux connexions et aux métriques)
+METHODES_NON_INSTRUMENTEES = (
+    'connexion', 'get_connection', 'init_database', 'fermer',
+    'statistiques_cache', 'metriques_expiration', 'metriques_instrumentation', 'exposition_prometheus',
+)
+
+# Filtres sur les attributs spécifiques (clé, colonne générée, opérateur), appliqués en
+# SQL et par les bitmaps de facettes ; « = » compare du texte sans tenir compte de la casse
+FILTRES_SPECIFIQUES = (
+    ('type_bien', 'type_bien', '='),
+    ('surface_min', 'surface', '>='),
+    ('surface_max', 'surface', '<='),
+    ('chambres_min', 'nombre_chambres', '>='),
+    ('marque', 'marque', '='),
+    ('annee_min', 'annee', '>='),
+    ('annee_max', 'annee', '<='),
+    ('kilometrage_max', 'kilometrage', '<='),
+    ('carburant', 'carburant', '='),
+    ('transmission', 'transmission', '='),
+    ('type_materiel', 'type_materiel', '='),
+    ('memoire_ram_min', 'memoire_ram', '>='),
+    ('stockage_min', 'stockage', '>='),
+)
+
+# Variante affichée comme miniature par au moins une annonce (épinglée par le quota des médias)
+REQUETE_MINIATURE_REFERENCEE = "SELECT 1 FROM annonces WHERE miniature = ? LIMIT 1"
+
+
+def encoder_curseur(date_creation: str, annonce_id: int) -> str:
+    """Encoder la position ``(date_creation, id)`` en curseur opaque."""
+    brut = json.dumps([date_creation, annonce_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(brut).decode().rstrip('=')
+
+def decoder_curseur(curseur: str) -> Tuple[str, int]:
+    """Décoder un curseur produit par ``encoder_curseur``."""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        date_creation, annonce_id = json.loads(brut)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise ValueError(f"Curseur de pagination invalide : {curseur!r}") from exc
+    if not isinstance(date_creation, str) or not isinstance(annonce_id, int):
+        raise ValueError(f"Curseur de pagination invalide : {curseur!r}")
+    return date_creation, annonce_id
+
+def horodatage_utc(valeur: Union[str, datetime, None]) -> Optional[str]:
+    """Horodatage au format de CURRENT_TIMESTAMP : UTC, « AAAA-MM-JJ HH:MM:SS ».
+
+    Un datetime naïf est une heure locale (``datetime.now()``, valeur par
+    défaut des modèles) ; une chaîne sans fuseau est supposée déjà en UTC,
+    comme celles qu'écrit SQLite. Une chaîne invalide lève ValueError.
+    """
+    if valeur is None or valeur == '':
+        return None
+    if isinstance(valeur, str):
+        valeur = datetime.fromisoformat(valeur)
+        if valeur.tzinfo is None:
+            valeur = valeur.replace(tzinfo=timezone.utc)
+    return valeur.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
 
 class Database:
-    def __init__(self, db_path: str = "data/immo_gabon.db"):
+    def __init__(self, db_path: str = "data/immo_gabon.db", taille_pool: int = 5,
+                 profil: str = 'standard', tampon_analytics: Optional[ConfigTampon] = None,
+                 intervalle_compteurs: Optional[float] = None,
+                 taille_cache: int = 0, ttl_cache: float = 60.0,
+                 intervalle_agregats: Optional[float] = None,
+                 intervalle_expiration: Optional[float] = None,
+                 depot_medias: Optional[DepotMedias] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        ``profil='performance'`` active le mode WAL, des PRAGMA adaptés à la
+        concurrence et un thread écrivain unique par lequel passent toutes
+        les écritures.
+
+        ``tampon_analytics`` active l'ingestion par lots des événements
+        (voir ConfigTampon pour le choix de durabilité).
+
+        ``intervalle_compteurs`` (en secondes) accumule en mémoire les
+        compteurs vues/clics/partages et les écrit par lots à cet intervalle ;
+        les lectures d'annonces incluent les deltas pas encore écrits.
+
+        ``taille_cache`` > 0 active un cache LRU (expiration ``ttl_cache``
+        secondes) des paramètres, des annonces par id et des pages de
+        résultats, invalidé par les écritures de cette instance. Avec un
+        cache, préférer ``intervalle_compteurs`` pour que chaque vue
+        n'invalide pas l'annonce consultée.
+
+        ``intervalle_agregats`` (en secondes) compacte périodiquement les
+        événements analytics dans les agrégats horaires et journaliers lus
+        par les méthodes de tableau de bord ; sans lui, appeler
+        ``compacter_analytics()``.
+
+        ``intervalle_expiration`` (en secondes) passe périodiquement à
+        'expire' les annonces publiées dont ``date_expiration`` est échue ;
+        sans lui, appeler ``expirer_annonces()``.
+
+        ``depot_medias`` active ``ajouter_medias``, ``regenerer_medias`` et
+        ``obtenir_variante`` : fichiers stockés par empreinte et variantes
+        d'images (miniatures) référencées par la colonne ``miniature`` des
+        pages de liste ; ces miniatures ne sont jamais évincées par le quota.
+
+        ``instrumentation`` mesure les méthodes publiques et chaque requête
+        SQL (latences, lignes lues, décodage JSON, requêtes lentes avec leur
+        plan) ; voir ``metriques_instrumentation`` et ``exposition_prometheus``.
+        """
+        if profil not in PROFILS:
+            raise ValueError(f"Profil inconnu : {profil}")
         self.db_path = db_path
+        self.profil = profil
         self._ensure_database_directory()
+        self._stockage = StockageFroid(db_path)
+        self._medias = depot_medias
+        self._instrumentation = instrumentation
+        fabrique = instrumentation.fabrique_connexion if instrumentation is not None else sqlite3.Connection
+        self._charger_json = (
+            instrumentation.chronometrer_json(charger_json) if instrumentation is not None else charger_json
+        )
+        self._pool = PoolConnexions(db_path, taille=taille_pool, pragmas=PROFILS[profil], fabrique=fabrique)
         self.init_database()
+        self._cache = CacheLRU(taille_cache, ttl_cache) if taille_cache else None
+        self._verrou_cache = threading.Lock()
+        self._generation_cache = 0
+        self._version_annonces = 0
+        self._bitmaps = facettes.BitmapsFacettes(FILTRES_SPECIFIQUES)
+        self._ecrivain = (
+            EcrivainUnique(db_path, pragmas=PROFILS[profil], fabrique=fabrique)
+            if profil == 'performance' else None
+        )
+        self._compteurs = None
+        if intervalle_compteurs is not None:
+            self._compteurs = CompteursAccumules(
+                self._ecrire, intervalle=intervalle_compteurs, apres_vidage=self._invalider_annonces
+            )
+        self._tampon = None
+        if tampon_analytics is not None:
+            self._tampon = TamponEvenements(
+                self._ecrire, tampon_analytics, compteurs_externes=self._compteurs is not None,
+                apres_vidage=self._invalider_annonces,
+            )
+        self._agregats = CompacteurAnalytics(self._ecrire, intervalle=intervalle_agregats)
+        self._expiration = PlanificateurExpiration(
+            self._ecrire, apres_transition=self._invalider_annonces, intervalle=intervalle_expiration
+        )
+        self._reprendre_import_interrompu()
+        if self._tampon is not None or self._compteurs is not None or intervalle_agregats:
+            atexit.register(self.fermer)
+        if instrumentation is not None:
+            instrumentation.instrumenter(self, exclure=METHODES_NON_INSTRUMENTEES)
+
+    def __enter__(self) -> "Database":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.fermer()
+
+    def fermer(self) -> None:
+        """Vider les écritures en attente puis fermer les connexions du pool."""
+        if self._pool.ferme:
+            return
+        self._expiration.fermer()
+        if self._tampon is not None:
+            self._tampon.fermer()
+        if self._compteurs is not None:
+            self._compteurs.fermer()
+        self._agregats.fermer()
+        atexit.unregister(self.fermer)
+        if self._ecrivain is not None:
+            self._ecrivain.fermer()
+        if self._medias is not None:
+            self._medias.fermer()
+        self._pool.fermer()
+
+    def vider_tampons(self) -> None:
+        """Forcer l'écriture des événements analytics et compteurs en attente."""
+        if self._tampon is not None:
+            self._tampon.vider()
+        if self._compteurs is not None:
+            self._compteurs.vider()
+
+    def statistiques_cache(self) -> Optional[Dict[str, Any]]:
+        """Succès/échecs/évictions du cache, ou None s'il est désactivé."""
+        return self._cache.statistiques() if self._cache is not None else None
+
+    def metriques_instrumentation(self) -> Optional[Dict[str, Any]]:
+        """Latences, lignes et requêtes lentes par méthode et par requête, ou None sans instrumentation."""
+        return self._instrumentation.instantane() if self._instrumentation is not None else None
+
+    def exposition_prometheus(self) -> Optional[str]:
+        """Mesures de l'instrumentation au format texte Prometheus, ou None sans instrumentation."""
+        return self._instrumentation.exposition_prometheus() if self._instrumentation is not None else None
+
+    def _lecture_cachee(self, cle: Any, charger: Callable[[], T], copier: Callable[[T], T]) -> T:
+        """Lire ``cle`` dans le cache, sinon via ``charger()`` puis mémoriser.
+
+        Une valeur chargée pendant une invalidation concurrente n'est pas
+        mémorisée : elle peut être antérieure à l'écriture.
+        """
+        if self._cache is None:
+            return charger()
+        valeur = self._cache.obtenir(cle)
+        if valeur is ABSENT:
+            generation = self._generation_cache
+            valeur = charger()
+            with self._verrou_cache:
+                if generation == self._generation_cache:
+                    self._cache.definir(cle, valeur)
+        return copier(valeur)
+
+    def _invalider_annonces(self, annonce_ids: List[int] = ()) -> None:
+        """Invalider des annonces et toutes les pages de résultats mémorisées."""
+        if self._cache is None:
+            return
+        with self._verrou_cache:
+            self._generation_cache += 1
+            self._version_annonces += 1
+        for annonce_id in annonce_ids:
+            self._cache.invalider(('annonce', annonce_id))
+
+    def _invalider_setting(self, cle: str) -> None:
+        if self._cache is None:
+            return
+        with self._verrou_cache:
+            self._generation_cache += 1
+        self._cache.invalider(('setting', cle))
+        self._cache.invalider(('settings',))
+
+    def _lire_annonces(self, lire: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Exécuter une lecture d'annonces en y ajoutant les compteurs non écrits."""
+        if self._compteurs is None:
+            return lire()
+        return self._compteurs.lire_avec_deltas(lire)
     
     def _ensure_database_directory(self):
         """S'assurer que le dossier de la base existe."""
@@ -22,327 +310,1075 @@ class Database:
             os.makedirs(dossier, exist_ok=True)
     
     def get_connection(self):
-        """Obtenir une connexion à la base de données"""
+        """Obtenir une connexion dédiée (hors pool), à fermer par l'appelant"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn
+
+    @contextmanager
+    def connexion(self) -> Iterator[sqlite3.Connection]:
+        """Emprunter une connexion du pool le temps d'un bloc ``with``."""
+        with self._pool.connexion() as conn:
+            yield conn
+
+    def _ecrire(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        """Exécuter une écriture transactionnelle et retourner son résultat.
+
+        Avec l'écrivain unique, l'opération est sérialisée sur son thread ;
+        sinon elle s'exécute sur une connexion du pool. Dans les deux cas
+        le verrou d'écriture est pris (BEGIN IMMEDIATE) avant l'opération :
+        ses lectures et ses écritures forment une seule transaction, qu'un
+        autre écrivain ne peut pas entrelacer. ``operation`` ne doit pas
+        appeler ``commit`` elle-même.
+        """
+        if self._ecrivain is not None:
+            return self._ecrivain.executer(operation)
+        with self.connexion() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                resultat = operation(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        return resultat
     
     def init_database(self):
         """Initialiser la base de données avec les tables nécessaires"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Table des annonces principales
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS annonces (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                titre TEXT NOT NULL,
-                description TEXT NOT NULL,
-                categorie TEXT NOT NULL CHECK (categorie IN ('immobilier', 'vehicules', 'informatique')),
-                type_annonce TEXT NOT NULL CHECK (type_annonce IN ('vente', 'location')),
-                prix REAL NOT NULL,
-                devise TEXT DEFAULT 'FCFA',
-                localisation TEXT NOT NULL,
-                ville TEXT NOT NULL,
-                quartier TEXT,
-                contact_nom TEXT NOT NULL,
-                contact_telephone TEXT NOT NULL,
-                contact_email TEXT,
-                contact_whatsapp TEXT,
-                statut TEXT DEFAULT 'brouillon' CHECK (statut IN ('brouillon', 'publie', 'expire', 'archive')),
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                date_modification TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                date_expiration TIMESTAMP,
-                vues INTEGER DEFAULT 0,
-                clics_contact INTEGER DEFAULT 0,
-                partages INTEGER DEFAULT 0,
-                donnees_specifiques TEXT,  -- JSON pour données spécifiques par catégorie
-                photos TEXT,  -- JSON array des chemins photos
-                videos TEXT   -- JSON array des chemins vidéos
-            )
-        ''')
-        
-        # Table des analytics/événements
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                annonce_id INTEGER,
-                type_evenement TEXT NOT NULL CHECK (type_evenement IN ('vue', 'clic_contact', 'partage')),
-                source_utm TEXT,
-                ip_address TEXT,
-                user_agent TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                donnees_supplementaires TEXT,  -- JSON pour données additionnelles
-                FOREIGN KEY (annonce_id) REFERENCES annonces (id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                cle TEXT PRIMARY KEY,
-                valeur TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS utilisateurs_publics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                mot_de_passe_hash TEXT NOT NULL,
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Table des utilisateurs (admin/analyste)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS utilisateurs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                nom TEXT NOT NULL,
-                role TEXT NOT NULL CHECK (role IN ('admin', 'analyste')),
-                actif BOOLEAN DEFAULT 1,
-                date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                derniere_connexion TIMESTAMP
-            )
-        ''')
-        
-        # Index pour optimiser les requêtes
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_categorie ON annonces (categorie)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_statut ON annonces (statut)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_ville ON annonces (ville)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_prix ON annonces (prix)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_annonce ON analytics (annonce_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_type ON analytics (type_evenement)')
-        
-        conn.commit()
-        conn.close()
+        with self.connexion() as conn:
+            cursor = conn.cursor()
+
+            # Table des annonces principales
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS annonces (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    titre TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    categorie TEXT NOT NULL CHECK (categorie IN ('immobilier', 'vehicules', 'informatique')),
+                    type_annonce TEXT NOT NULL CHECK (type_annonce IN ('vente', 'location')),
+                    prix REAL NOT NULL,
+                    devise TEXT DEFAULT 'FCFA',
+                    localisation TEXT NOT NULL,
+                    ville TEXT NOT NULL,
+                    quartier TEXT,
+                    contact_nom TEXT NOT NULL,
+                    contact_telephone TEXT NOT NULL,
+                    contact_email TEXT,
+                    contact_whatsapp TEXT,
+                    statut TEXT DEFAULT 'brouillon' CHECK (statut IN ('brouillon', 'publie', 'expire', 'archive')),
+                    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    date_modification TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    date_expiration TIMESTAMP,
+                    vues INTEGER DEFAULT 0,
+                    clics_contact INTEGER DEFAULT 0,
+                    partages INTEGER DEFAULT 0,
+                    donnees_specifiques TEXT,  -- JSON pour données spécifiques par catégorie
+                    photos TEXT,  -- JSON array des chemins photos
+                    videos TEXT   -- JSON array des chemins vidéos
+                )
+            ''')
+
+            # Table des analytics/événements
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analytics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    annonce_id INTEGER,
+                    type_evenement TEXT NOT NULL CHECK (type_evenement IN ('vue', 'clic_contact', 'partage')),
+                    source_utm TEXT,
+                    ip_address TEXT,
+                    user_agent TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    donnees_supplementaires TEXT,  -- JSON pour données additionnelles
+                    FOREIGN KEY (annonce_id) REFERENCES annonces (id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    cle TEXT PRIMARY KEY,
+                    valeur TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS utilisateurs_publics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nom TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    mot_de_passe_hash TEXT NOT NULL,
+                    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Table des utilisateurs (admin/analyste)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS utilisateurs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT UNIQUE NOT NULL,
+                    nom TEXT NOT NULL,
+                    role TEXT NOT NULL CHECK (role IN ('admin', 'analyste')),
+                    actif BOOLEAN DEFAULT 1,
+                    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    derniere_connexion TIMESTAMP
+                )
+            ''')
+
+            # Index pour optimiser les requêtes
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_categorie ON annonces (categorie)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_prix ON annonces (prix)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_annonces_statut_date ON annonces (statut, date_creation DESC, id DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_annonce ON analytics (annonce_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_type ON analytics (type_evenement)')
+
+            conn.commit()
+            appliquer_migrations(conn)
     
     def _deserialize_annonce_row(self, row: sqlite3.Row) -> Dict[str, Any]:
         """Convertir une ligne SQL en dictionnaire avec désérialisation des champs JSON."""
-        annonce = dict(row)
-        for champ, valeur_par_defaut in (
-            ('donnees_specifiques', {}),
-            ('photos', []),
-            ('videos', []),
-        ):
-            valeur = annonce.get(champ)
-            if valeur:
-                try:
-                    annonce[champ] = json.loads(valeur)
-                except (TypeError, json.JSONDecodeError):
-                    annonce[champ] = valeur_par_defaut
-            elif champ != 'donnees_specifiques':
-                annonce[champ] = valeur_par_defaut
-        return annonce
+        return deserialiser_annonce(row, self._charger_json)
 
     def get_settings(self) -> Dict[str, Optional[str]]:
         """Récupérer l'ensemble des paramètres globaux."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT cle, valeur FROM settings")
-        resultats = {cle: valeur for cle, valeur in cursor.fetchall()}
-        conn.close()
-        return resultats
+        def charger() -> Dict[str, Optional[str]]:
+            with self.connexion() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT cle, valeur FROM settings")
+                return {cle: valeur for cle, valeur in cursor.fetchall()}
+
+        return self._lecture_cachee(('settings',), charger, dict)
 
     def get_setting(self, cle: str, valeur_defaut: Optional[str] = None) -> Optional[str]:
         """Récupérer un paramètre spécifique."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT valeur FROM settings WHERE cle = ?", (cle,))
-        row = cursor.fetchone()
-        conn.close()
-        return row[0] if row and row[0] is not None else valeur_defaut
+        def charger() -> Optional[str]:
+            with self.connexion() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT valeur FROM settings WHERE cle = ?", (cle,))
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        valeur = self._lecture_cachee(('setting', cle), charger, lambda v: v)
+        return valeur if valeur is not None else valeur_defaut
 
     def set_setting(self, cle: str, valeur: Optional[str]) -> None:
         """Créer ou mettre à jour un paramètre."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        if valeur is None:
-            cursor.execute("DELETE FROM settings WHERE cle = ?", (cle,))
-        else:
-            cursor.execute(
-                "INSERT OR REPLACE INTO settings (cle, valeur) VALUES (?, ?)",
-                (cle, valeur),
-            )
-        conn.commit()
-        conn.close()
+        def operation(conn: sqlite3.Connection) -> None:
+            if valeur is None:
+                conn.execute("DELETE FROM settings WHERE cle = ?", (cle,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO settings (cle, valeur) VALUES (?, ?)",
+                    (cle, valeur),
+                )
+
+        self._ecrire(operation)
+        self._invalider_setting(cle)
 
     def creer_utilisateur_public(self, nom: str, email: str, mot_de_passe_hash: str) -> int:
         """Créer un utilisateur public."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
-            INSERT INTO utilisateurs_publics (nom, email, mot_de_passe_hash)
-            VALUES (?, ?, ?)
-            ''',
-            (nom, email, mot_de_passe_hash),
-        )
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return user_id
+        def operation(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute(
+                '''
+                INSERT INTO utilisateurs_publics (nom, email, mot_de_passe_hash)
+                VALUES (?, ?, ?)
+                ''',
+                (nom, email, mot_de_passe_hash),
+            )
+            return cursor.lastrowid
+
+        return self._ecrire(operation)
 
     def obtenir_utilisateur_public_par_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Récupérer un utilisateur public par email."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            '''
-            SELECT id, nom, email, mot_de_passe_hash, date_creation
-            FROM utilisateurs_publics
-            WHERE email = ?
-            ''',
-            (email,),
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self.connexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT id, nom, email, mot_de_passe_hash, date_creation
+                FROM utilisateurs_publics
+                WHERE email = ?
+                ''',
+                (email,),
+            )
+            row = cursor.fetchone()
         return dict(row) if row else None
     
     def ajouter_annonce(self, annonce_data: Dict[str, Any]) -> int:
         """Ajouter une nouvelle annonce"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Préparer les données JSON
         donnees_specifiques = json.dumps(annonce_data.get('donnees_specifiques', {}))
         photos = json.dumps(annonce_data.get('photos', []))
         videos = json.dumps(annonce_data.get('videos', []))
-        
-        cursor.execute('''
+        date_expiration = horodatage_utc(annonce_data.get('date_expiration'))
+        signature = doublons.signature_annonce(annonce_data)
+
+        def operation(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute('''
+                INSERT INTO annonces (
+                    titre, description, categorie, type_annonce, prix, devise,
+                    localisation, ville, quartier, contact_nom, contact_telephone,
+                    contact_email, contact_whatsapp, statut, date_expiration,
+                    donnees_specifiques, photos, videos, ville_normalisee
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                annonce_data['titre'], annonce_data['description'], 
+                annonce_data['categorie'], annonce_data['type_annonce'],
+                annonce_data['prix'], annonce_data.get('devise', 'FCFA'),
+                annonce_data['localisation'], annonce_data['ville'],
+                annonce_data.get('quartier'), annonce_data['contact_nom'],
+                annonce_data['contact_telephone'], annonce_data.get('contact_email'),
+                annonce_data.get('contact_whatsapp'), annonce_data.get('statut', 'brouillon'),
+                date_expiration, donnees_specifiques, photos, videos,
+                normaliser_texte(annonce_data['ville'])
+            ))
+            doublons.indexer(conn, [(cursor.lastrowid, signature)], remplacer=False)
+            return cursor.lastrowid
+
+        annonce_id = self._ecrire(operation)
+        self._invalider_annonces()
+        return annonce_id
+    
+    def ajouter_annonces_bulk(self, annonces: Iterable[Union[AnnonceBase, Dict[str, Any]]],
+                              taille_lot: int = 1000, differer_index: bool = False) -> int:
+        """Importer un flux d'annonces par lots transactionnels.
+
+        Chaque annonce (modèle AnnonceBase ou dictionnaire au format
+        d'``ajouter_annonce``) est validée par le modèle de sa catégorie puis
+        insérée avec ``executemany``, une transaction par lot de
+        ``taille_lot``. ``differer_index`` supprime les index secondaires et
+        la synchronisation plein texte pendant l'import et les reconstruit à
+        la fin (empreintes de doublons comprises, calculées par un pool de
+        processus), ce qui est plus rapide pour de gros volumes.
+
+        Retourne le nombre d'annonces insérées. Une annonce invalide lève
+        ValueError ; les lots précédents restent importés.
+        """
+        lignes = (self._ligne_import(position, annonce, signer=not differer_index)
+                  for position, annonce in enumerate(annonces))
+        requete = '''
             INSERT INTO annonces (
                 titre, description, categorie, type_annonce, prix, devise,
                 localisation, ville, quartier, contact_nom, contact_telephone,
-                contact_email, contact_whatsapp, statut, date_expiration,
-                donnees_specifiques, photos, videos
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            annonce_data['titre'], annonce_data['description'], 
-            annonce_data['categorie'], annonce_data['type_annonce'],
-            annonce_data['prix'], annonce_data.get('devise', 'FCFA'),
-            annonce_data['localisation'], annonce_data['ville'],
-            annonce_data.get('quartier'), annonce_data['contact_nom'],
-            annonce_data['contact_telephone'], annonce_data.get('contact_email'),
-            annonce_data.get('contact_whatsapp'), annonce_data.get('statut', 'brouillon'),
-            annonce_data.get('date_expiration'), donnees_specifiques, photos, videos
-        ))
-        
-        annonce_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return annonce_id
-    
+                contact_email, contact_whatsapp, statut, date_creation, date_expiration,
+                donnees_specifiques, photos, videos, ville_normalisee
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+
+        def inserer(conn: sqlite3.Connection, lot: List[Tuple[Tuple, Any]]) -> None:
+            if differer_index:
+                conn.executemany(requete, [ligne for ligne, _ in lot])
+                return
+            # Sous le verrou d'écriture (BEGIN IMMEDIATE de _ecrire, ou opération
+            # sérialisée par l'écrivain unique) : aucune autre insertion ne s'intercale
+            # entre MAX(id) et executemany, les id au-delà sont ceux du lot, dans l'ordre
+            dernier_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM annonces").fetchone()[0]
+            conn.executemany(requete, [ligne for ligne, _ in lot])
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM annonces WHERE id > ? ORDER BY id", (dernier_id,))]
+            doublons.indexer(conn, zip(ids, (signature for _, signature in lot)), remplacer=False)
+
+        premier_id = self._suspendre_index() if differer_index else None
+        total = 0
+        try:
+            while True:
+                lot = list(islice(lignes, taille_lot))
+                if not lot:
+                    break
+                self._ecrire(lambda conn: inserer(conn, lot))
+                total += len(lot)
+        finally:
+            if premier_id is not None:
+                self._retablir_index()
+                if total:
+                    self._indexer_doublons(premier_id, taille_lot=taille_lot)
+            if total:
+                self._invalider_annonces()
+        return total
+
+    def _ligne_import(self, position: int, annonce: Union[AnnonceBase, Dict[str, Any]],
+                      signer: bool = True) -> Tuple[Tuple, Any]:
+        """Valider une annonce d'import ; retourne sa ligne d'INSERT et son empreinte (ou None)."""
+        try:
+            if isinstance(annonce, AnnonceBase):
+                modele = annonce
+                date_creation, date_expiration = modele.date_creation, modele.date_expiration
+            else:
+                # Dates lues telles que fournies : une chaîne sans fuseau est en UTC
+                modele = annonce_depuis_dict(annonce)
+                date_creation, date_expiration = annonce.get('date_creation'), annonce.get('date_expiration')
+            modele.valider()
+            date_creation = (horodatage_utc(date_creation)
+                             or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+            date_expiration = horodatage_utc(date_expiration)
+        except ValueError as exc:
+            raise ValueError(f"Annonce n°{position} invalide : {exc}") from exc
+
+        donnees = modele.vers_donnees()
+        ligne = (
+            donnees['titre'], donnees['description'], donnees['categorie'],
+            donnees['type_annonce'], donnees['prix'], donnees['devise'],
+            donnees['localisation'], donnees['ville'], donnees['quartier'],
+            donnees['contact_nom'], donnees['contact_telephone'], donnees['contact_email'],
+            donnees['contact_whatsapp'], donnees['statut'], date_creation,
+            date_expiration, json.dumps(donnees['donnees_specifiques']),
+            json.dumps(donnees['photos']), json.dumps(donnees['videos']),
+            normaliser_texte(donnees['ville']),
+        )
+        return ligne, doublons.signature_annonce(donnees) if signer else None
+
+    def _suspendre_index(self) -> int:
+        """Supprimer index secondaires et triggers d'insertion (FTS, facettes) avant un import.
+
+        Leurs définitions sont enregistrées dans ``objets_suspendus`` par la
+        même transaction : un import interrompu (exception, arrêt brutal) les
+        retrouve au démarrage suivant. Retourne le plus grand id existant.
+        """
+        def operation(conn: sqlite3.Connection) -> int:
+            depuis_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM annonces").fetchone()[0]
+            objets = [tuple(row) for row in conn.execute('''
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name = 'annonces' AND sql IS NOT NULL
+                  AND (type = 'index' OR name IN ('annonces_fts_ai', ?, ?))
+            ''', (facettes.TRIGGER_INSERTION, facettes.TRIGGER_JOURNAL))]
+            conn.executemany(
+                "INSERT OR IGNORE INTO objets_suspendus (nom, type, sql, depuis_id) VALUES (?, ?, ?, ?)",
+                [(nom, type_objet, sql, depuis_id) for type_objet, nom, sql in objets],
+            )
+            for type_objet, nom, _ in objets:
+                conn.execute(f"DROP {type_objet.upper()} {nom}")
+            return depuis_id
+
+        return self._ecrire(operation)
+
+    def _retablir_index(self) -> Optional[int]:
+        """Recréer les objets de ``objets_suspendus`` ; resynchroniser recherche et facettes.
+
+        Retourne l'id d'avant l'import interrompu le plus ancien, ou None
+        s'il n'y avait rien à rétablir.
+        """
+        def operation(conn: sqlite3.Connection) -> Optional[int]:
+            objets = conn.execute("SELECT nom, sql, depuis_id FROM objets_suspendus").fetchall()
+            for nom, sql, _ in objets:
+                # init_database a pu recréer les objets de son propre schéma
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (nom,)).fetchone() is None:
+                    conn.execute(sql)
+            noms = {nom for nom, _, _ in objets}
+            if 'annonces_fts_ai' in noms:
+                conn.execute("INSERT INTO annonces_fts (annonces_fts) VALUES ('rebuild')")
+            if facettes.TRIGGER_INSERTION in noms:
+                facettes.reconstruire(conn)
+            if facettes.TRIGGER_JOURNAL in noms:
+                facettes.signaler_reconstruction(conn)
+            conn.execute("DELETE FROM objets_suspendus")
+            return min((depuis_id for _, _, depuis_id in objets), default=None)
+
+        return self._ecrire(operation)
+
+    def _reprendre_import_interrompu(self) -> None:
+        """Rétablir les index d'un import différé interrompu et calculer ses empreintes.
+
+        Une base ouverte pendant qu'un autre processus importe en différé
+        rétablit ses index plus tôt : l'import reste juste, seulement plus lent.
+        """
+        with self.connexion() as conn:
+            en_attente = conn.execute("SELECT 1 FROM objets_suspendus LIMIT 1").fetchone()
+        if en_attente is None:
+            return
+        depuis_id = self._retablir_index()
+        if depuis_id is not None:
+            self._indexer_doublons(depuis_id)
+
+    def iterer_annonces(self, filtres: Dict[str, Any] = None, taille_lot: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Parcourir les annonces par lots, en mémoire constante.
+
+        Sans filtre, toutes les annonces sont parcourues quel que soit leur
+        statut. Les lots suivent l'ordre des id (clé primaire) et la
+        connexion n'est empruntée que le temps de chaque lot.
+        """
+        conditions, params = self._construire_filtres(filtres)
+        conditions.append("id > ?")
+        query = (f"SELECT {SELECT_ANNONCE} FROM annonces WHERE "
+                 + " AND ".join(conditions) + " ORDER BY id LIMIT ?")
+        dernier_id = 0
+        while True:
+            with self.connexion() as conn:
+                rows = conn.execute(query, params + [dernier_id, taille_lot]).fetchall()
+            for row in rows:
+                yield self._deserialize_annonce_row(row)
+            if len(rows) < taille_lot:
+                return
+            dernier_id = rows[-1]['id']
+
+    def exporter_annonces(self, format: str = 'jsonl', filtres: Dict[str, Any] = None,
+                          taille_lot: int = 1000) -> Iterator[str]:
+        """Exporter les annonces en lignes JSONL ou CSV (générateur, mémoire constante).
+
+        En CSV, la première ligne est l'en-tête et les champs JSON sont
+        sérialisés en texte.
+        """
+        if format not in ('jsonl', 'csv'):
+            raise ValueError(f"Format d'export inconnu : {format}")
+        annonces = self.iterer_annonces(filtres, taille_lot)
+        if format == 'jsonl':
+            for annonce in annonces:
+                yield json.dumps(annonce, ensure_ascii=False) + '\n'
+            return
+
+        tampon = io.StringIO()
+        ecrivain = csv.writer(tampon)
+
+        def ligne_csv(valeurs) -> str:
+            tampon.seek(0)
+            tampon.truncate()
+            ecrivain.writerow(valeurs)
+            return tampon.getvalue()
+
+        yield ligne_csv(COLONNES_ANNONCE)
+        for annonce in annonces:
+            yield ligne_csv([
+                json.dumps(annonce[colonne], ensure_ascii=False)
+                if isinstance(annonce[colonne], (dict, list)) else annonce[colonne]
+                for colonne in COLONNES_ANNONCE
+            ])
+
     def mettre_a_jour_annonce(self, annonce_id: int, modifications: Dict[str, Any]) -> bool:
         """Mettre à jour une annonce existante."""
         if not modifications:
             return False
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         champs = []
         params = []
 
         for cle, valeur in modifications.items():
             if cle in {"donnees_specifiques", "photos", "videos"}:
                 valeur = json.dumps(valeur) if valeur is not None else None
+            elif cle == 'date_expiration':
+                valeur = horodatage_utc(valeur)  # comparée en texte par l'expiration planifiée
             champs.append(f"{cle} = ?")
             params.append(valeur)
 
+        if 'ville' in modifications:
+            champs.append("ville_normalisee = ?")
+            params.append(normaliser_texte(modifications['ville']))
+
         champs.append("date_modification = ?")
-        params.append(datetime.now().isoformat())
+        params.append(datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
         params.append(annonce_id)
 
         requete = f"UPDATE annonces SET {', '.join(champs)} WHERE id = ?"
-        cursor.execute(requete, params)
-        conn.commit()
-        conn.close()
+        reindexer = not doublons.CHAMPS_EMPREINTE.isdisjoint(modifications)
+
+        def operation(conn: sqlite3.Connection) -> None:
+            conn.execute(requete, params)
+            if reindexer:
+                ligne = conn.execute(
+                    f"SELECT {', '.join(doublons.COLONNES_SIGNATURE)} FROM annonces WHERE id = ?", (annonce_id,)
+                ).fetchone()
+                if ligne is not None:
+                    doublons.indexer(conn, doublons.signer_lignes([tuple(ligne)]))
+
+        self._ecrire(operation)
+        self._invalider_annonces([annonce_id])
         return True
     
-    def obtenir_annonces(self, filtres: Dict[str, Any] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
-        """Obtenir les annonces avec filtres optionnels"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM annonces WHERE 1=1"
-        params = []
+    def _construire_filtres(self, filtres: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any]]:
+        """Traduire les filtres d'annonces en conditions SQL et paramètres."""
+        conditions: List[str] = []
+        params: List[Any] = []
         
         if filtres:
             if filtres.get('id'):
-                query += " AND id = ?"
+                conditions.append("id = ?")
                 params.append(filtres['id'])
             
-            if filtres.get('categorie'):
-                query += " AND categorie = ?"
+            if filtres.get('categorie') in CATEGORIES:
+                # Littéral, comme pour statut, pour les index partiels par catégorie
+                conditions.append(f"categorie = '{filtres['categorie']}'")
+            elif filtres.get('categorie'):
+                conditions.append("categorie = ?")
                 params.append(filtres['categorie'])
             
             if filtres.get('type_annonce'):
-                query += " AND type_annonce = ?"
+                conditions.append("type_annonce = ?")
                 params.append(filtres['type_annonce'])
             
-            if filtres.get('ville'):
-                query += " AND ville LIKE ?"
-                params.append(f"%{filtres['ville']}%")
+            ville = normaliser_texte(filtres.get('ville'))
+            if ville:
+                # Recherche exacte ou par préfixe, insensible à la casse et aux accents
+                if filtres.get('ville_exacte'):
+                    conditions.append("ville_normalisee = ?")
+                    params.append(ville)
+                else:
+                    conditions.append("ville_normalisee >= ? AND ville_normalisee < ?")
+                    params.extend([ville, borne_prefixe(ville)])
             
             if filtres.get('prix_min'):
-                query += " AND prix >= ?"
+                conditions.append("prix >= ?")
                 params.append(filtres['prix_min'])
             
             if filtres.get('prix_max'):
-                query += " AND prix <= ?"
+                conditions.append("prix <= ?")
                 params.append(filtres['prix_max'])
             
-            if filtres.get('statut'):
-                query += " AND statut = ?"
+            if filtres.get('tranche_prix') not in (None, ''):
+                condition, valeurs = facettes.condition_tranche(filtres['tranche_prix'])
+                conditions.append(condition)
+                params.extend(valeurs)
+            
+            for cle, colonne, operateur in FILTRES_SPECIFIQUES:
+                if filtres.get(cle) not in (None, ''):
+                    conditions.append(f"{colonne} {operateur} ?" + (" COLLATE NOCASE" if operateur == '=' else ""))
+                    params.append(filtres[cle])
+            
+            if filtres.get('statut') in STATUTS:
+                # Valeur littérale pour que SQLite puisse choisir les index partiels
+                conditions.append(f"statut = '{filtres['statut']}'")
+            elif filtres.get('statut'):
+                conditions.append("statut = ?")
                 params.append(filtres['statut'])
             elif not filtres.get('id'):
-                query += " AND statut = 'publie'"  # Par défaut, seulement les annonces publiées
+                conditions.append("statut = 'publie'")  # Par défaut, seulement les annonces publiées
         
-        query += " ORDER BY date_creation DESC LIMIT ? OFFSET ?"
+        return conditions, params
+
+    def _selectionner_annonces(self, conditions: List[str], params: List[Any], suffixe: str,
+                               vue: str = 'complete',
+                               decodage_paresseux: bool = False) -> List[Dict[str, Any]]:
+        """Exécuter un SELECT sur annonces et désérialiser les lignes.
+
+        ``vue='carte'`` ne lit que les colonnes d'une carte de liste (avec
+        ``photo_principale``) ; ``decodage_paresseux`` retourne des
+        AnnonceParesseuse qui ne décodent le JSON qu'au premier accès.
+        """
+        if vue not in VUES:
+            raise ValueError(f"Vue inconnue : {vue}")
+        query = (f"SELECT {VUES[vue]} FROM annonces WHERE "
+                 + (" AND ".join(conditions) or "1=1") + suffixe)
+        if decodage_paresseux:
+            def convertir(row: sqlite3.Row) -> Dict[str, Any]:
+                return AnnonceParesseuse(row, self._charger_json)
+        else:
+            convertir = self._deserialize_annonce_row
+
+        def charger() -> List[Dict[str, Any]]:
+            with self.connexion() as conn:
+                rows = conn.execute(query, params).fetchall()
+            return [convertir(row) for row in rows]
+
+        if decodage_paresseux:
+            return self._lire_annonces(charger)
+
+        # Requête SQL et paramètres forment la clé normalisée des filtres
+        def lire() -> List[Dict[str, Any]]:
+            cle = ('requete', self._version_annonces, query, tuple(params))
+            return self._lecture_cachee(cle, charger, _copier_annonces)
+
+        return self._lire_annonces(lire)
+
+    def obtenir_annonces(self, filtres: Dict[str, Any] = None, limit: int = 50, offset: int = 0,
+                         vue: str = 'complete', decodage_paresseux: bool = False) -> List[Dict]:
+        """Obtenir les annonces avec filtres optionnels"""
+        conditions, params = self._construire_filtres(filtres)
         params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        results = [self._deserialize_annonce_row(row) for row in rows]
-        
-        conn.close()
-        return results
+        return self._selectionner_annonces(
+            conditions, params, " ORDER BY date_creation DESC, id DESC LIMIT ? OFFSET ?",
+            vue, decodage_paresseux,
+        )
+
+    def compter_facettes(self, filtres: Dict[str, Any] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Nombre d'annonces par valeur de chaque facette, pour les filtres d'``obtenir_annonces``.
+
+        Facettes : categorie, type_annonce, ville et tranche_prix (chaque
+        tranche porte ``prix_min``/``prix_max`` ; sa valeur s'utilise comme
+        filtre ``tranche_prix``). Les comptes d'une facette appliquent tous
+        les filtres sauf les siens : choisir une ville laisse les autres
+        villes proposées, avec leur nombre d'annonces. Le statut (publiées
+        par défaut) s'applique à toutes les facettes.
+
+        Les filtres de statut, catégorie, type, ville, ``tranche_prix`` et
+        ``prix_min`` aligné sur une tranche sont servis par la table de
+        comptes ``facettes_annonces`` ; les autres (attributs spécifiques,
+        ``prix_max``) par les bitmaps en mémoire de facettes.BitmapsFacettes,
+        construits au premier filtre de ce genre. Un filtre ``id``, ou une
+        borne qui n'est pas un nombre, impose un regroupement sur les
+        annonces elles-mêmes.
+        """
+        filtres = dict(filtres or {})
+        if not filtres.get('statut') and not filtres.get('id'):
+            filtres['statut'] = 'publie'  # même défaut qu'obtenir_annonces
+        ville = normaliser_texte(filtres.get('ville'))
+        conditions = None
+        if not filtres.get('id') and all(filtres.get(cle) in (None, '') for cle, _, _ in FILTRES_SPECIFIQUES):
+            conditions = facettes.conditions_facettes(filtres, ville)
+
+        def charger() -> Dict[str, List[Dict[str, Any]]]:
+            with self.connexion() as conn:
+                if conditions is not None:
+                    return facettes.formater(facettes.compter(conn, conditions))
+                if not filtres.get('id'):
+                    comptes = self._bitmaps.compter(conn, filtres, ville)
+                    if comptes is not None:
+                        return facettes.formater(comptes)
+                restants = {cle: valeur for cle, valeur in filtres.items() if cle not in facettes.CLES_FACETTES}
+                groupes = []
+                for categorie in CATEGORIES:
+                    # Catégorie littérale : SQLite peut choisir les index partiels par catégorie
+                    clauses, params = self._construire_filtres({**restants, 'categorie': categorie})
+                    groupes.extend(facettes.regrouper_annonces(conn, clauses, params, filtres))
+                return facettes.formater(facettes.compter_groupes(groupes, filtres, ville))
+
+        cle = ('facettes', self._version_annonces, tuple(sorted(filtres.items())))
+        return self._lecture_cachee(cle, charger, _copier_facettes)
+
+    def expliquer_requete(self, filtres: Dict[str, Any] = None) -> List[str]:
+        """Plan d'exécution (EXPLAIN QUERY PLAN) d'une page d'obtenir_annonces."""
+        conditions, params = self._construire_filtres(filtres)
+        query = (f"EXPLAIN QUERY PLAN SELECT {SELECT_ANNONCE} FROM annonces WHERE "
+                 + (" AND ".join(conditions) or "1=1")
+                 + " ORDER BY date_creation DESC, id DESC LIMIT ? OFFSET ?")
+        with self.connexion() as conn:
+            rows = conn.execute(query, params + [50, 0]).fetchall()
+        return [row['detail'] for row in rows]
+
+    def obtenir_annonces_par_curseur(self, filtres: Dict[str, Any] = None, limit: int = 50,
+                                     curseur: Optional[str] = None, vue: str = 'complete',
+                                     decodage_paresseux: bool = False) -> Tuple[List[Dict], Optional[str]]:
+        """Obtenir une page d'annonces par pagination à curseur (keyset).
+
+        Retourne ``(annonces, curseur_suivant)`` ; ``curseur_suivant`` vaut
+        None sur la dernière page. Le coût d'une page ne dépend pas de sa
+        profondeur, contrairement à ``OFFSET``. ``limit`` doit valoir au
+        moins 1.
+        """
+        if limit < 1:
+            raise ValueError(f"Taille de page invalide : {limit}")
+        conditions, params = self._construire_filtres(filtres)
+        if curseur:
+            date_creation, annonce_id = decoder_curseur(curseur)
+            conditions.append("(date_creation, id) < (?, ?)")
+            params.extend([date_creation, annonce_id])
+        params.append(limit)
+
+        annonces = self._selectionner_annonces(
+            conditions, params, " ORDER BY date_creation DESC, id DESC LIMIT ?",
+            vue, decodage_paresseux,
+        )
+        suivant = None
+        if len(annonces) == limit:
+            dernier = annonces[-1]
+            suivant = encoder_curseur(dernier['date_creation'], dernier['id'])
+        return annonces, suivant
+    
+    def rechercher_annonces(self, query: str, filtres: Dict[str, Any] = None,
+                            limit: int = 20) -> List[Dict]:
+        """Recherche plein texte sur titre et description, classée par bm25.
+
+        Accepte les mêmes filtres qu'``obtenir_annonces`` (annonces publiées
+        par défaut). Chaque résultat porte en plus ``titre_surligne``,
+        ``extrait`` (passage de la description, termes entre <mark>) et
+        ``score`` (plus petit = plus pertinent).
+        """
+        expression = expression_fts(query)
+        if expression is None:
+            return []
+
+        conditions, params = self._construire_filtres({'statut': 'publie', **(filtres or {})})
+        conditions.insert(0, "annonces_fts MATCH ?")
+        params.insert(0, expression)
+        params.append(limit)
+        # Le titre pèse dix fois plus que la description dans le classement
+        requete = f'''
+            SELECT {SELECT_ANNONCE},
+                   highlight(annonces_fts, 0, '<mark>', '</mark>') AS titre_surligne,
+                   snippet(annonces_fts, 1, '<mark>', '</mark>', '…', 16) AS extrait,
+                   bm25(annonces_fts, 10.0, 1.0) AS score
+            FROM annonces_fts
+            JOIN annonces ON annonces.id = annonces_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY score
+            LIMIT ?
+        '''
+
+        def lire() -> List[Dict[str, Any]]:
+            with self.connexion() as conn:
+                rows = conn.execute(requete, params).fetchall()
+            return [self._deserialize_annonce_row(row) for row in rows]
+
+        return self._lire_annonces(lire)
     
     def obtenir_annonce_par_id(self, annonce_id: int) -> Optional[Dict]:
         """Obtenir une annonce spécifique par son ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM annonces WHERE id = ?", (annonce_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return self._deserialize_annonce_row(row) if row else None
+        def charger() -> List[Dict[str, Any]]:
+            with self.connexion() as conn:
+                row = conn.execute(
+                    f"SELECT {SELECT_ANNONCE} FROM annonces WHERE id = ?", (annonce_id,)
+                ).fetchone()
+            return [self._deserialize_annonce_row(row)] if row else []
+
+        def lire() -> List[Dict[str, Any]]:
+            return self._lecture_cachee(('annonce', annonce_id), charger, _copier_annonces)
+
+        annonces = self._lire_annonces(lire)
+        if not annonces:
+            return None
+        if self._medias is not None:
+            self._medias.marquer_utilisees(
+                variante['chemin'] for entree in annonces[0]['medias'].values()
+                for variante in entree.get('variantes', {}).values()
+            )
+        return annonces[0]
     
     def incrementer_vues(self, annonce_id: int):
         """Incrémenter le compteur de vues d'une annonce"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE annonces SET vues = vues + 1 WHERE id = ?", (annonce_id,))
-        conn.commit()
-        conn.close()
+        if self._compteurs is not None:
+            self._compteurs.incrementer(annonce_id, 'vues')
+            return
+        self._ecrire(
+            lambda conn: conn.execute("UPDATE annonces SET vues = vues + 1 WHERE id = ?", (annonce_id,))
+        )
+        self._invalider_annonces([annonce_id])
     
     def enregistrer_evenement(self, annonce_id: int, type_evenement: str, 
                             source_utm: str = None, ip_address: str = None, 
                             user_agent: str = None, donnees_supplementaires: Dict = None):
         """Enregistrer un événement analytics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         donnees_json = json.dumps(donnees_supplementaires) if donnees_supplementaires else None
-        
-        cursor.execute('''
-            INSERT INTO analytics (annonce_id, type_evenement, source_utm, ip_address, user_agent, donnees_supplementaires)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (annonce_id, type_evenement, source_utm, ip_address, user_agent, donnees_json))
-        
-        # Mettre à jour les compteurs dans la table annonces
-        if type_evenement == 'clic_contact':
-            cursor.execute("UPDATE annonces SET clics_contact = clics_contact + 1 WHERE id = ?", (annonce_id,))
-        elif type_evenement == 'partage':
-            cursor.execute("UPDATE annonces SET partages = partages + 1 WHERE id = ?", (annonce_id,))
-        
-        conn.commit()
-        conn.close()
+
+        colonne_compteur = COMPTEURS_PAR_EVENEMENT.get(type_evenement)
+        if self._compteurs is not None and colonne_compteur:
+            self._compteurs.incrementer(annonce_id, colonne_compteur)
+            colonne_compteur = None
+
+        if self._tampon is not None:
+            self._tampon.ajouter(annonce_id, type_evenement, source_utm,
+                                 ip_address, user_agent, donnees_json)
+            return
+
+        def operation(conn: sqlite3.Connection) -> None:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO analytics (annonce_id, type_evenement, source_utm, ip_address, user_agent, donnees_supplementaires)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (annonce_id, type_evenement, source_utm, ip_address, user_agent, donnees_json))
+
+            # Mettre à jour les compteurs dans la table annonces
+            if colonne_compteur:
+                cursor.execute(
+                    f"UPDATE annonces SET {colonne_compteur} = {colonne_compteur} + 1 WHERE id = ?",
+                    (annonce_id,),
+                )
+
+        self._ecrire(operation)
+        if colonne_compteur:
+            self._invalider_annonces([annonce_id])
+
+
+    def obtenir_statistiques_annonce(self, annonce_id: int) -> Dict[str, int]:
+        """Nombre d'événements analytics enregistrés pour une annonce, par type d'événement
+
+        Somme des agrégats journaliers et des événements bruts pas encore
+        compactés ; reste exact après la purge des événements bruts.
+        """
+        with self.connexion() as conn:
+            rows = conn.execute('''
+                SELECT type_evenement, SUM(total) AS total FROM (
+                    SELECT type_evenement, total FROM analytics_journalier WHERE annonce_id = ?
+                    UNION ALL
+                    SELECT type_evenement, 1 FROM analytics WHERE annonce_id = ? AND id > ?
+                ) GROUP BY type_evenement
+            ''', (annonce_id, annonce_id, lire_marque(conn))).fetchall()
+        return {row['type_evenement']: row['total'] for row in rows}
+
+    def compacter_analytics(self) -> int:
+        """Reporter les nouveaux événements analytics dans les agrégats horaires et journaliers"""
+        return self._agregats.compacter()
+
+    def purger_analytics(self, jours_bruts: int = 90, jours_horaires: Optional[int] = None,
+                         archive: Optional[str] = None) -> Dict[str, int]:
+        """Appliquer la politique de rétention des analytics (voir CompacteurAnalytics.purger)"""
+        return self._agregats.purger(jours_bruts, jours_horaires, archive)
+
+    def statistiques_par_jour(self, jours: int = 90, type_evenement: str = 'vue',
+                              categorie: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Événements par jour et par catégorie, lus dans les agrégats journaliers"""
+        conditions = ["j.jour >= date('now', ?)", "j.type_evenement = ?"]
+        params: List[Any] = [f'-{int(jours)} days', type_evenement]
+        if categorie:
+            conditions.append("a.categorie = ?")
+            params.append(categorie)
+        with self.connexion() as conn:
+            rows = conn.execute(f'''
+                SELECT j.jour, a.categorie, SUM(j.total) AS total
+                FROM analytics_journalier j JOIN annonces a ON a.id = j.annonce_id
+                WHERE {" AND ".join(conditions)}
+                GROUP BY j.jour, a.categorie ORDER BY j.jour, a.categorie
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def top_sources_utm(self, jours: int = 30, limite: int = 10,
+                        type_evenement: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sources UTM les plus fréquentes, lues dans les agrégats journaliers"""
+        conditions = ["jour >= date('now', ?)", "source_utm != ''"]
+        params: List[Any] = [f'-{int(jours)} days']
+        if type_evenement:
+            conditions.append("type_evenement = ?")
+            params.append(type_evenement)
+        with self.connexion() as conn:
+            rows = conn.execute(f'''
+                SELECT source_utm, SUM(total) AS total FROM analytics_journalier
+                WHERE {" AND ".join(conditions)}
+                GROUP BY source_utm ORDER BY total DESC LIMIT ?
+            ''', params + [limite]).fetchall()
+        return [dict(row) for row in rows]
+
+    def statistiques_horaires(self, annonce_id: int, heures: int = 48) -> List[Dict[str, Any]]:
+        """Événements d'une annonce heure par heure, lus dans les agrégats horaires"""
+        with self.connexion() as conn:
+            rows = conn.execute('''
+                SELECT heure, type_evenement, SUM(total) AS total FROM analytics_horaire
+                WHERE annonce_id = ? AND heure >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+                GROUP BY heure, type_evenement ORDER BY heure
+            ''', (annonce_id, f'-{int(heures)} hours')).fetchall()
+        return [dict(row) for row in rows]
+
+    def maintenir_stockage(self, mois_conservation: Optional[int] = None, jours_archivage: int = 30,
+                           vacuum: bool = True) -> Dict[str, Any]:
+        """Rotation du stockage froid (voir StockageFroid.maintenir)
+
+        Les événements sont d'abord agrégés : seuls les événements compactés
+        quittent la base principale.
+        """
+        self.vider_tampons()
+        self._agregats.compacter()
+        bilan = self._stockage.maintenir(mois_conservation, jours_archivage, vacuum)
+        if bilan['annonces_archivees']:
+            self._invalider_annonces(bilan['annonces_archivees'])
+        return bilan
+
+    def obtenir_evenements(self, debut: str, fin: str, annonce_id: Optional[int] = None,
+                           type_evenement: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Événements analytics d'horodatage dans [debut, fin[, partitions mensuelles comprises"""
+        conditions, params = [], []
+        if annonce_id is not None:
+            conditions.append("annonce_id = ?")
+            params.append(annonce_id)
+        if type_evenement:
+            conditions.append("type_evenement = ?")
+            params.append(type_evenement)
+        with self.connexion() as conn:
+            return self._stockage.lire_evenements(conn, debut, fin, conditions, params)
+
+    def obtenir_annonce_archivee(self, annonce_id: int) -> Optional[Dict[str, Any]]:
+        """Obtenir une annonce déplacée dans l'archive froide"""
+        row = self._stockage.lire_annonce_archivee(annonce_id)
+        return self._deserialize_annonce_row(row) if row else None
+
+    def expirer_annonces(self) -> int:
+        """Passer à 'expire' les annonces publiées dont la date d'expiration est échue"""
+        return self._expiration.executer()
+
+    def metriques_expiration(self) -> Dict[str, Any]:
+        """Taille des lots et retard de l'expiration planifiée (voir PlanificateurExpiration)"""
+        return self._expiration.metriques()
+
+    def _depot_medias(self) -> DepotMedias:
+        if self._medias is None:
+            raise RuntimeError("Aucun dépôt de médias configuré (paramètre depot_medias)")
+        return self._medias
+
+    def ajouter_medias(self, annonce_id: int, photos: Iterable[Union[str, Tuple[bytes, str]]] = (),
+                       videos: Iterable[Union[str, Tuple[bytes, str]]] = ()) -> bool:
+        """Ajouter des photos/vidéos à une annonce
+
+        Chaque fichier (chemin, ou couple ``(contenu, extension)``) est
+        stocké par empreinte, sans doublon ; les variantes des photos sont
+        produites avant l'écriture, hors du chemin des requêtes de lecture.
+        Retourne False si l'annonce n'existe pas.
+        """
+        depot = self._depot_medias()
+
+        def enregistrer(source):
+            return depot.enregistrer(*source) if isinstance(source, tuple) else depot.enregistrer(source)
+
+        nouvelles_photos = [enregistrer(source) for source in photos]
+        nouvelles_videos = [enregistrer(source) for source in videos]
+        variantes = depot.generer_variantes(nouvelles_photos)
+        entrees = {chemin: {'empreinte': empreinte, 'variantes': variantes.get(chemin, {})}
+                   for chemin, empreinte in nouvelles_photos}
+        entrees.update({chemin: {'empreinte': empreinte} for chemin, empreinte in nouvelles_videos})
+        modifiee = self._enregistrer_medias(
+            annonce_id, entrees,
+            ajouts={'photos': [chemin for chemin, _ in nouvelles_photos],
+                    'videos': [chemin for chemin, _ in nouvelles_videos]},
+        )
+        depot.appliquer_quota(self._miniature_referencee)
+        return modifiee
+
+    def regenerer_medias(self, annonce_id: int) -> bool:
+        """Produire les variantes manquantes des photos d'une annonce
+
+        Les photos enregistrées avant le dépôt (simples chemins, par exemple
+        ``public/images/prado_1.jpg``) y sont importées et leur chemin est
+        remplacé par celui du dépôt. Retourne False si l'annonce n'existe pas.
+        """
+        depot = self._depot_medias()
+        annonce = self.obtenir_annonce_par_id(annonce_id)
+        if annonce is None:
+            return False
+        medias = annonce['medias']
+        attendues = depot.noms_variantes()
+        remplacements: Dict[str, str] = {}
+        a_produire = []
+        for chemin in annonce['photos']:
+            entree = medias.get(chemin)
+            if entree is None:
+                if not os.path.isfile(chemin):
+                    continue
+                nouveau, empreinte = depot.enregistrer(chemin)
+                remplacements[chemin] = nouveau
+                a_produire.append((nouveau, empreinte))
+            elif not attendues <= set(entree.get('variantes', {})):
+                a_produire.append((chemin, entree['empreinte']))
+        variantes = depot.generer_variantes(a_produire)
+        entrees = {chemin: {'empreinte': empreinte, 'variantes': variantes.get(chemin, {})}
+                   for chemin, empreinte in a_produire}
+        modifiee = self._enregistrer_medias(annonce_id, entrees, remplacements=remplacements)
+        depot.appliquer_quota(self._miniature_referencee)
+        return modifiee
+
+    def obtenir_variante(self, annonce_id: int, photo: str, nom: str = VARIANTE_MINIATURE) -> Optional[str]:
+        """Chemin de la variante ``nom`` d'une photo de l'annonce, reproduite si le quota l'a évincée
+
+        Retourne None si la photo n'est pas dans le dépôt ou sans Pillow.
+        """
+        depot = self._depot_medias()
+        annonce = self.obtenir_annonce_par_id(annonce_id)
+        entree = (annonce or {}).get('medias', {}).get(photo)
+        if entree is None or photo not in annonce['photos']:
+            return None
+        return depot.variante(photo, entree['empreinte'], nom)
+
+    def _miniature_referencee(self, chemin: str) -> bool:
+        """Vrai si une annonce affiche cette variante comme miniature (index idx_annonces_miniature)."""
+        with self.connexion() as conn:
+            return conn.execute(REQUETE_MINIATURE_REFERENCEE, (chemin,)).fetchone() is not None
+
+    def _enregistrer_medias(self, annonce_id: int, entrees: Dict[str, Dict[str, Any]],
+                            ajouts: Optional[Dict[str, List[str]]] = None,
+                            remplacements: Optional[Dict[str, str]] = None) -> bool:
+        """Fusionner des métadonnées de médias et mettre à jour listes et miniature."""
+        def charger(valeur: Any, defaut: Any) -> Any:
+            try:
+                return self._charger_json(valeur) if valeur else defaut
+            except (TypeError, ValueError):
+                return defaut
+
+        def operation(conn: sqlite3.Connection) -> bool:
+            row = conn.execute(
+                "SELECT photos, videos, medias FROM annonces WHERE id = ?", (annonce_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            listes = {'photos': charger(row['photos'], []), 'videos': charger(row['videos'], [])}
+            medias = charger(row['medias'], {})
+            for champ, chemins in (ajouts or {}).items():
+                listes[champ].extend(chemin for chemin in chemins if chemin not in listes[champ])
+            for ancien, nouveau in (remplacements or {}).items():
+                listes['photos'] = [nouveau if chemin == ancien else chemin for chemin in listes['photos']]
+            for chemin, entree in entrees.items():
+                existante = medias.setdefault(chemin, {})
+                existante['empreinte'] = entree['empreinte']
+                if 'variantes' in entree:
+                    existante.setdefault('variantes', {}).update(entree['variantes'])
+            conn.execute(
+                "UPDATE annonces SET photos = ?, videos = ?, medias = ?, miniature = ? WHERE id = ?",
+                (json.dumps(listes['photos']), json.dumps(listes['videos']), json.dumps(medias),
+                 miniature_principale(listes['photos'], medias), annonce_id),
+            )
+            return True
+
+        modifiee = self._ecrire(operation)
+        if modifiee:
+            self._invalider_annonces([annonce_id])
+        return modifiee
+
+    def rechercher_doublons(self, annonce: Union[int, Dict[str, Any]],
+                            seuil: float = doublons.SEUIL_SIMILARITE, limite: int = 20) -> List[Dict[str, Any]]:
+        """Annonces quasi identiques à ``annonce`` (id enregistré ou données d'une nouvelle annonce).
+
+        Retourne ``[{'annonce_id': …, 'similarite': …}]``, la similarité
+        étant l'indice de Jaccard estimé par MinHash (1.0 : identiques).
+        """
+        with self.connexion() as conn:
+            if isinstance(annonce, int):
+                signature, exclure = doublons.lire_signature(conn, annonce), annonce
+                if signature is None:
+                    return []
+            else:
+                signature, exclure = doublons.signature_annonce(annonce), None
+            return doublons.voisins(conn, signature, seuil, exclure=exclure, limite=limite)
+
+    def dedupliquer_annonces(self, processus: Optional[int] = None, taille_lot: int = 1000,
+                             seuil: float = doublons.SEUIL_SIMILARITE, recalculer: bool = True,
+                             archiver: bool = False) -> List[List[int]]:
+        """Regrouper les quasi-doublons de toute la table.
+
+        ``recalculer`` recalcule d'abord toutes les empreintes avec
+        ``processus`` processus (par défaut, un par cœur), par exemple
+        après un changement des règles de signature. Seules les annonces
+        qui partagent une bande sont ensuite comparées. Retourne les groupes
+        d'id (triés, l'annonce la plus ancienne en tête). ``archiver`` passe
+        à 'archive' toutes les annonces de chaque groupe sauf la première.
+        """
+        if recalculer:
+            def vider(conn: sqlite3.Connection) -> None:
+                conn.execute("DELETE FROM annonces_bandes")
+                conn.execute("DELETE FROM annonces_signatures")
+
+            self._ecrire(vider)
+            self._indexer_doublons(0, processus, taille_lot)
+
+        with self.connexion() as conn:
+            seaux = list(doublons.seaux_partages(conn))
+            signatures = doublons.lire_signatures(
+                conn, {annonce_id for membres in seaux for annonce_id in membres})
+        groupes = doublons.regrouper(seaux, signatures, seuil)
+
+        if archiver:
+            a_archiver = [annonce_id for groupe in groupes for annonce_id in groupe[1:]]
+            for debut in range(0, len(a_archiver), taille_lot):
+                ids = a_archiver[debut:debut + taille_lot]
+                self._ecrire(lambda conn, ids=ids: conn.execute(
+                    "UPDATE annonces SET statut = 'archive', date_modification = ? "
+                    f"WHERE id IN ({', '.join('?' * len(ids))})",
+                    [datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'), *ids],
+                ))
+                self._invalider_annonces(ids)
+        return groupes
+
+    def _indexer_doublons(self, depuis_id: int, processus: Optional[int] = None, taille_lot: int = 1000) -> int:
+        """Calculer en parallèle et enregistrer les empreintes des annonces d'id > ``depuis_id``."""
+        colonnes = ', '.join(doublons.COLONNES_SIGNATURE)
+
+        def lots() -> Iterator[List[Tuple]]:
+            dernier_id = depuis_id
+            while True:
+                with self.connexion() as conn:
+                    lignes = [tuple(row) for row in conn.execute(
+                        f"SELECT {colonnes} FROM annonces WHERE id > ? ORDER BY id LIMIT ?",
+                        (dernier_id, taille_lot))]
+                if lignes:
+                    yield lignes
+                if len(lignes) < taille_lot:
+                    return
+                dernier_id = lignes[-1][0]
+
+        total = 0
+        lot: List[Tuple[int, Any]] = []
+        for signature in doublons.signer_en_parallele(lots(), processus):
+            lot.append(signature)
+            if len(lot) >= taille_lot:
+                self._ecrire(lambda conn, lot=lot: doublons.indexer(conn, lot))
+                total += len(lot)
+                lot = []
+        if lot:
+            self._ecrire(lambda conn: doublons.indexer(conn, lot))
+            total += len(lot)
+        return total
@@ -0,0 +1,285 @@
+"""
+Détection des annonces en double ou quasi identiques
+Empreintes MinHash et tables de bandes LSH indexées
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from models.texte import normaliser_texte
+
+# 64 minima découpés en BANDES de LIGNES_PAR_BANDE : deux annonces de
+# similarité de Jaccard s partagent au moins une bande avec une probabilité
+# 1 - (1 - s⁴)¹⁶ (0,998 pour s = 0,8 ; 0,12 pour s = 0,3). Les candidates
+# sont ensuite vérifiées sur les 64 minima.
+NOMBRE_HASHES = 64
+BANDES = 16
+LIGNES_PAR_BANDE = NOMBRE_HASHES // BANDES
+SEUIL_SIMILARITE = 0.8
+
+# Les NOMBRE_HASHES fonctions de hachage sont les tranches de 32 bits d'un
+# seul condensé SHAKE-128 de l'élément, réduites à 31 bits. Les empreintes
+# enregistrées en dépendent ; changer ce schéma impose de tout recalculer
+# (Database.dedupliquer_annonces).
+#
+# Les minima sont tenus dans un seul entier, une valeur par tranche : le
+# bit 31 de chaque tranche sert de garde pour comparer toutes les tranches
+# en une soustraction, sans boucle Python par valeur.
+_OCTETS_CONDENSE = NOMBRE_HASHES * 4
+_VALEURS = sum(0x7FFFFFFF << (32 * rang) for rang in range(NOMBRE_HASHES))
+_GARDES = sum(1 << (32 * rang + 31) for rang in range(NOMBRE_HASHES))
+_DECODAGE = struct.Struct(f'<{NOMBRE_HASHES}I')
+
+# Attributs de donnees_specifiques qui distinguent deux biens
+CHAMPS_SIGNATURE = (
+    'type_bien', 'nombre_chambres', 'surface',
+    'marque', 'modele', 'annee', 'kilometrage', 'carburant', 'transmission',
+    'type_materiel', 'processeur', 'memoire_ram', 'stockage',
+)
+# Valeurs numériques comparées par tranches d'environ 10 %, selon deux
+# découpages décalés : une retouche qui franchit une limite n'en change qu'un
+CHAMPS_PAR_TRANCHE = ('prix', 'surface', 'kilometrage')
+
+# Colonnes lues pour calculer l'empreinte d'une annonce enregistrée
+COLONNES_SIGNATURE = ('id', 'titre', 'description', 'categorie', 'prix', 'ville', 'donnees_specifiques')
+# Modifier l'un de ces champs oblige à recalculer l'empreinte
+CHAMPS_EMPREINTE = frozenset(COLONNES_SIGNATURE) - {'id'}
+
+_MOTS = re.compile(r'\w+')
+
+
+def _tranches(valeur: Any) -> Tuple[int, ...]:
+    try:
+        echelle = math.log1p(max(float(valeur), 0.0)) / math.log(1.1)
+    except (TypeError, ValueError):
+        return ()
+    return math.floor(echelle), math.floor(echelle + 0.5)
+
+
+def elements_annonce(annonce: Dict[str, Any]) -> Set[str]:
+    """Ensemble comparé : mots du titre, triplets de mots de la description, attributs."""
+    elements = {"t:" + mot for mot in _MOTS.findall(normaliser_texte(annonce.get('titre')) or '')}
+    mots = _MOTS.findall(normaliser_texte(annonce.get('description')) or '')
+    # Une description de moins de trois mots forme un seul triplet
+    triplets = zip(mots, mots[1:], mots[2:]) if len(mots) > 2 else [mots] if mots else []
+    elements.update("d:" + ' '.join(triplet) for triplet in triplets)
+
+    specifiques = annonce.get('donnees_specifiques') or {}
+    if isinstance(specifiques, str):
+        try:
+            specifiques = json.loads(specifiques)
+        except ValueError:
+            specifiques = {}
+    attributs = {'categorie': annonce.get('categorie'), 'ville': annonce.get('ville'),
+                 'prix': annonce.get('prix')}
+    attributs.update((champ, specifiques.get(champ)) for champ in CHAMPS_SIGNATURE)
+    for champ, valeur in attributs.items():
+        if valeur is None or valeur == '':
+            continue
+        if champ in CHAMPS_PAR_TRANCHE:
+            elements.update(f"{champ}:{decoupage}:{tranche}"
+                            for decoupage, tranche in enumerate(_tranches(valeur)))
+        else:
+            elements.add(f"{champ}:{normaliser_texte(valeur) if isinstance(valeur, str) else valeur}")
+    return elements
+
+
+def _minimum_par_tranche(a: int, b: int) -> int:
+    """Minimum tranche par tranche de deux vecteurs de valeurs (garde à zéro)."""
+    # Le bit de garde survit à la soustraction dans les tranches où a >= b
+    superieures = (((a | _GARDES) - b) & _GARDES) >> 31
+    return a ^ ((a ^ b) & (superieures * 0x7FFFFFFF))
+
+
+def signature_annonce(annonce: Dict[str, Any]) -> array:
+    """Empreinte MinHash d'une annonce au format base : NOMBRE_HASHES entiers de 31 bits."""
+    minima = None
+    for element in elements_annonce(annonce) or ('',):
+        valeurs = int.from_bytes(hashlib.shake_128(element.encode()).digest(_OCTETS_CONDENSE), 'little') & _VALEURS
+        minima = valeurs if minima is None else _minimum_par_tranche(minima, valeurs)
+    return array('I', _DECODAGE.unpack(minima.to_bytes(_OCTETS_CONDENSE, 'little')))
+
+
+def similarite(a: Sequence[int], b: Sequence[int]) -> float:
+    """Similarité de Jaccard estimée : part des minima égaux."""
+    return sum(x == y for x, y in zip(a, b)) / NOMBRE_HASHES
+
+
+_OCTETS_BANDE = LIGNES_PAR_BANDE * 4
+
+
+def bandes(signature: array) -> List[Tuple[int, int]]:
+    """(numéro, clé 64 bits signée) de chaque bande de l'empreinte.
+
+    Les 128 bits d'une bande (valeurs de hachage, donc uniformes) sont
+    repliés par XOR en une clé qui tient dans un INTEGER SQLite.
+    """
+    octets = signature.tobytes()
+    return [
+        (numero, int.from_bytes(octets[debut:debut + 8], 'little', signed=True)
+         ^ int.from_bytes(octets[debut + 8:debut + _OCTETS_BANDE], 'little', signed=True))
+        for numero, debut in enumerate(range(0, BANDES * _OCTETS_BANDE, _OCTETS_BANDE))
+    ]
+
+
+def _depuis_blob(blob: bytes) -> array:
+    signature = array('I')
+    signature.frombytes(blob)
+    return signature
+
+
+def lire_signature(conn: sqlite3.Connection, annonce_id: int) -> Optional[array]:
+    """Empreinte enregistrée d'une annonce, ou None."""
+    row = conn.execute("SELECT minhash FROM annonces_signatures WHERE annonce_id = ?", (annonce_id,)).fetchone()
+    return _depuis_blob(row[0]) if row else None
+
+
+def indexer(conn: sqlite3.Connection, signatures: Iterable[Tuple[int, array]], remplacer: bool = True) -> None:
+    """Enregistrer les empreintes ``(annonce_id, signature)``.
+
+    À appeler dans la transaction qui écrit les annonces. ``remplacer=False``
+    (annonces qui viennent d'être insérées) évite de chercher une ancienne
+    empreinte.
+    """
+    signatures = list(signatures)
+    if not signatures:
+        return
+    if remplacer:
+        oublier(conn, [annonce_id for annonce_id, _ in signatures])
+    conn.executemany(
+        "INSERT INTO annonces_signatures (annonce_id, minhash) VALUES (?, ?)",
+        [(annonce_id, signature.tobytes()) for annonce_id, signature in signatures],
+    )
+    # Insertion dans l'ordre de la clé primaire : pages du B-tree visitées une fois
+    conn.executemany(
+        "INSERT INTO annonces_bandes (bande, valeur, annonce_id) VALUES (?, ?, ?)",
+        sorted((numero, valeur, annonce_id)
+               for annonce_id, signature in signatures for numero, valeur in bandes(signature)),
+    )
+
+
+def oublier(conn: sqlite3.Connection, annonce_ids: Sequence[int]) -> None:
+    """Supprimer les empreintes des annonces ``annonce_ids`` et leurs bandes.
+
+    Les bandes sont retrouvées par leur clé primaire, recalculée depuis
+    l'empreinte enregistrée : ``annonces_bandes`` n'a pas d'index secondaire.
+    """
+    anciennes = lire_signatures(conn, annonce_ids)
+    conn.executemany(
+        "DELETE FROM annonces_bandes WHERE bande = ? AND valeur = ? AND annonce_id = ?",
+        [(numero, valeur, annonce_id)
+         for annonce_id, signature in anciennes.items() for numero, valeur in bandes(signature)],
+    )
+    conn.executemany("DELETE FROM annonces_signatures WHERE annonce_id = ?",
+                     [(annonce_id,) for annonce_id in anciennes])
+
+
+def voisins(conn: sqlite3.Connection, signature: array, seuil: float = SEUIL_SIMILARITE,
+            exclure: Optional[int] = None, limite: int = 20) -> List[Dict[str, Any]]:
+    """Annonces de similarité estimée au moins ``seuil``, les plus proches d'abord.
+
+    Une recherche par bande sur la clé primaire de ``annonces_bandes`` :
+    aucun parcours de la table des annonces. Les bandes orphelines (annonce
+    supprimée hors de ``oublier``) sont écartées par la jointure.
+    """
+    conditions = ' OR '.join(['(b.bande = ? AND b.valeur = ?)'] * BANDES)
+    params = [element for bande in bandes(signature) for element in bande]
+    rows = conn.execute(f"""
+        SELECT DISTINCT s.annonce_id, s.minhash
+        FROM annonces_bandes b
+        JOIN annonces_signatures s ON s.annonce_id = b.annonce_id
+        WHERE {conditions}
+    """, params).fetchall()
+    resultats = []
+    for annonce_id, minhash in rows:
+        if annonce_id == exclure:
+            continue
+        valeur = similarite(signature, _depuis_blob(minhash))
+        if valeur >= seuil:
+            resultats.append({'annonce_id': annonce_id, 'similarite': valeur})
+    resultats.sort(key=lambda voisin: (-voisin['similarite'], voisin['annonce_id']))
+    return resultats[:limite]
+
+
+def signer_lignes(lignes: List[Tuple]) -> List[Tuple[int, array]]:
+    """(annonce_id, signature) de lignes lues dans l'ordre de COLONNES_SIGNATURE.
+
+    Exécutée dans un processus du pool : ne dépend que de ses arguments.
+    """
+    return [(ligne[0], signature_annonce(dict(zip(COLONNES_SIGNATURE, ligne)))) for ligne in lignes]
+
+
+def signer_en_parallele(lots: Iterable[List[Tuple]], processus: Optional[int] = None) -> Iterator[Tuple[int, array]]:
+    """Signer des lots de lignes dans un pool de ``processus`` processus (générateur).
+
+    Avec un seul processus (ou un seul cœur), les lots sont signés sur
+    place, sans coût de transfert entre processus.
+    """
+    if (processus or os.cpu_count() or 1) <= 1:
+        for lignes in lots:
+            yield from signer_lignes(lignes)
+        return
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        for signatures in pool.map(signer_lignes, lots):
+            yield from signatures
+
+
+def lire_signatures(conn: sqlite3.Connection, annonce_ids: Iterable[int], taille_lot: int = 500) -> Dict[int, array]:
+    """Empreintes enregistrées des annonces ``annonce_ids``."""
+    annonce_ids = list(annonce_ids)
+    signatures = {}
+    for debut in range(0, len(annonce_ids), taille_lot):
+        lot = annonce_ids[debut:debut + taille_lot]
+        signatures.update(
+            (annonce_id, _depuis_blob(minhash)) for annonce_id, minhash in conn.execute(
+                f"SELECT annonce_id, minhash FROM annonces_signatures "
+                f"WHERE annonce_id IN ({', '.join('?' * len(lot))})", lot)
+        )
+    return signatures
+
+
+def seaux_partages(conn: sqlite3.Connection) -> Iterator[List[int]]:
+    """Annonces qui partagent une bande, seau par seau (parcours de la clé primaire, sans tri)."""
+    for (ids,) in conn.execute("""
+        SELECT group_concat(annonce_id) FROM annonces_bandes
+        GROUP BY bande, valeur HAVING COUNT(*) > 1
+    """):
+        yield [int(annonce_id) for annonce_id in ids.split(',')]
+
+
+def regrouper(seaux: Iterable[List[int]], signatures: Dict[int, array],
+              seuil: float = SEUIL_SIMILARITE) -> List[List[int]]:
+    """Groupes d'annonces quasi identiques (composantes connexes), chacun trié par id.
+
+    Seules les paires d'un même seau (voir ``seaux_partages``) sont
+    comparées, jamais toutes les paires.
+    """
+    parents: Dict[int, int] = {}
+
+    def racine(annonce_id: int) -> int:
+        parents.setdefault(annonce_id, annonce_id)
+        while parents[annonce_id] != annonce_id:
+            parents[annonce_id] = parents[parents[annonce_id]]
+            annonce_id = parents[annonce_id]
+        return annonce_id
+
+    for membres in seaux:
+        membres = [annonce_id for annonce_id in membres if annonce_id in signatures]
+        for position, annonce_id in enumerate(membres):
+            for autre in membres[position + 1:]:
+                if racine(annonce_id) != racine(autre) and \
+                        similarite(signatures[annonce_id], signatures[autre]) >= seuil:
+                    parents[racine(autre)] = racine(annonce_id)
+
+    groupes: Dict[int, List[int]] = {}
+    for annonce_id in parents:
+        groupes.setdefault(racine(annonce_id), []).append(annonce_id)
+    return sorted((sorted(groupe) for groupe in groupes.values() if len(groupe) > 1), key=lambda g: g[0])
@@ -0,0 +1,128 @@
+"""
+Expiration planifiée des annonces
+Passe de 'publie' à 'expire' les annonces dont date_expiration est échue
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.taches import TachePeriodique
+
+# Servie par idx_annonces_statut_expiration : ne parcourt que les annonces échues
+REQUETE_ECHUES = """
+    SELECT id, date_expiration FROM annonces
+    WHERE statut = 'publie' AND date_expiration <= ?
+    ORDER BY date_expiration LIMIT ?
+"""
+
+
+def _maintenant() -> str:
+    """Horodatage UTC au format de CURRENT_TIMESTAMP."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _retard(date_expiration: Any, maintenant: str) -> Optional[float]:
+    """Secondes écoulées depuis l'échéance, ou None si la date est illisible."""
+    try:
+        echeance = datetime.fromisoformat(str(date_expiration))
+    except ValueError:
+        return None
+    return (datetime.fromisoformat(maintenant) - echeance.replace(tzinfo=None)).total_seconds()
+
+
+class PlanificateurExpiration:
+    """Expirer par lots les annonces publiées arrivées à échéance.
+
+    Chaque lot sélectionne au plus ``taille_lot`` annonces échues par
+    l'index ``(statut, date_expiration)`` et les passe à 'expire' dans une
+    seule écriture : le coût d'un passage est proportionnel au nombre
+    d'annonces échues, pas à la taille de la table. ``apres_transition(ids)``
+    est appelé après chaque lot (invalidation des caches, facettes…).
+
+    ``date_expiration`` est comparée comme texte au format
+    ``AAAA-MM-JJ HH:MM:SS`` (UTC, comme ``CURRENT_TIMESTAMP``).
+    """
+
+    def __init__(self, ecrire: Callable[[Callable[[sqlite3.Connection], Any]], Any],
+                 apres_transition: Optional[Callable[[List[int]], None]] = None,
+                 intervalle: Optional[float] = None, taille_lot: int = 500):
+        self._ecrire = ecrire
+        self._apres_transition = apres_transition
+        self.taille_lot = taille_lot
+        self._verrou = threading.Lock()
+        self._metriques: Dict[str, Any] = {
+            'passages': 0,
+            'lots': 0,
+            'annonces_expirees': 0,
+            'dernier_lot': 0,
+            'plus_grand_lot': 0,
+            'retard_dernier_s': None,
+            'retard_max_s': None,
+            'duree_dernier_passage_ms': None,
+            'dernier_passage': None,
+        }
+        self._tache = (
+            TachePeriodique(self.executer, intervalle, nom='expiration-annonces') if intervalle else None
+        )
+
+    def _expirer_lot(self, maintenant: str) -> Tuple[List[int], Optional[str]]:
+        def operation(conn: sqlite3.Connection) -> Tuple[List[int], Optional[str]]:
+            rows = conn.execute(REQUETE_ECHUES, (maintenant, self.taille_lot)).fetchall()
+            if not rows:
+                return [], None
+            ids = [row[0] for row in rows]
+            conn.execute(
+                "UPDATE annonces SET statut = 'expire', date_modification = ? "
+                f"WHERE id IN ({', '.join('?' * len(ids))})",
+                [maintenant, *ids],
+            )
+            # Lignes triées par échéance : la première est la plus en retard
+            return ids, rows[0][1]
+
+        return self._ecrire(operation)
+
+    def executer(self) -> int:
+        """Expirer toutes les annonces échues ; retourne le nombre d'annonces expirées."""
+        with self._verrou:
+            debut = time.perf_counter()
+            maintenant = _maintenant()
+            total = 0
+            while True:
+                ids, plus_ancienne = self._expirer_lot(maintenant)
+                if not ids:
+                    break
+                if self._apres_transition is not None:
+                    self._apres_transition(ids)
+                total += len(ids)
+                self._enregistrer_lot(len(ids), _retard(plus_ancienne, maintenant))
+                if len(ids) < self.taille_lot:
+                    break
+            self._metriques['passages'] += 1
+            self._metriques['duree_dernier_passage_ms'] = (time.perf_counter() - debut) * 1000
+            self._metriques['dernier_passage'] = maintenant
+            if not total:
+                self._metriques['dernier_lot'] = 0
+            return total
+
+    def _enregistrer_lot(self, taille: int, retard: Optional[float]) -> None:
+        metriques = self._metriques
+        metriques['lots'] += 1
+        metriques['annonces_expirees'] += taille
+        metriques['dernier_lot'] = taille
+        metriques['plus_grand_lot'] = max(metriques['plus_grand_lot'], taille)
+        if retard is not None:
+            metriques['retard_dernier_s'] = retard
+            metriques['retard_max_s'] = max(metriques['retard_max_s'] or 0.0, retard)
+
+    def metriques(self) -> Dict[str, Any]:
+        """Compteurs de passages et de lots, taille des lots et retard d'expiration (secondes)."""
+        return dict(self._metriques)
+
+    def fermer(self) -> None:
+        """Arrêter les passages périodiques."""
+        if self._tache is not None:
+            self._tache.arreter()
+            self._tache = None
@@ -0,0 +1,712 @@
+"""
+Comptes par facette du catalogue : catégorie, type, ville, tranche de prix
+Table de comptes par statut tenue à jour par triggers, interrogée sans parcourir les annonces ;
+bitmaps en mémoire pour les filtres de prix et d'attributs qu'elle ne sait pas servir
+"""
+
+import math
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from models.texte import borne_prefixe
+
+# Limites des tranches de prix (FCFA) : la tranche n couvre
+# [BORNES_PRIX[n - 1], BORNES_PRIX[n]), la première commence à 0 et la
+# dernière n'a pas de maximum. Les triggers et les comptes enregistrés en
+# dépendent ; changer ces bornes impose une migration qui recrée les
+# triggers et appelle ``reconstruire``.
+BORNES_PRIX = (
+    50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000,
+    5_000_000, 10_000_000, 25_000_000, 50_000_000, 100_000_000,
+)
+
+
+def expression_tranche(colonne: str = 'prix') -> str:
+    """Expression SQL du rang de tranche de prix de ``colonne``."""
+    cas = ' '.join(f"WHEN {colonne} < {borne} THEN {rang}" for rang, borne in enumerate(BORNES_PRIX))
+    return f"CASE {cas} ELSE {len(BORNES_PRIX)} END"
+
+
+# Facette -> (colonne de facettes_annonces, clés de filtre qui la restreignent)
+FACETTES = {
+    'categorie': ('categorie', ('categorie',)),
+    'type_annonce': ('type_annonce', ('type_annonce',)),
+    'ville': ('ville_normalisee', ('ville', 'ville_exacte')),
+    'tranche_prix': ('tranche_prix', ('tranche_prix', 'prix_min', 'prix_max')),
+}
+CLES_FACETTES = frozenset(cle for _, cles in FACETTES.values() for cle in cles)
+# Libellé affiché d'une valeur de facette, quand il diffère de la valeur regroupée
+LIBELLES = {'ville': 'MIN(ville)'}
+
+# Trigger d'insertion, suspendu pendant les imports en masse (voir reconstruire)
+TRIGGER_INSERTION = 'facettes_annonces_ai'
+# Trigger d'insertion du journal des bitmaps, suspendu de même (voir signaler_reconstruction)
+TRIGGER_JOURNAL = 'facettes_journal_ai'
+
+# Entrées gardées dans facettes_journal, élagué toutes les ELAGAGE_JOURNAL
+# insertions : un processus plus en retard reconstruit ses bitmaps
+GARDE_JOURNAL = 100_000
+ELAGAGE_JOURNAL = 10_000
+# Seuils d'une colonne numérique (voir Seuils) ; au-delà de ce nombre de
+# valeurs distinctes, les seuils deviennent des quantiles
+SEUILS_MAX = 64
+
+
+def bornes_tranche(rang: Any) -> Tuple[Optional[int], Optional[int]]:
+    """Prix minimal (inclus) et maximal (exclu) d'une tranche ; None pour une borne ouverte."""
+    try:
+        rang = int(rang)
+    except (TypeError, ValueError):
+        raise ValueError(f"Tranche de prix inconnue : {rang!r}") from None
+    if not 0 <= rang <= len(BORNES_PRIX):
+        raise ValueError(f"Tranche de prix inconnue : {rang!r}")
+    return (BORNES_PRIX[rang - 1] if rang else None,
+            BORNES_PRIX[rang] if rang < len(BORNES_PRIX) else None)
+
+
+def condition_tranche(rang: Any) -> Tuple[str, List[Any]]:
+    """Condition SQL sur ``annonces.prix`` du filtre ``tranche_prix``."""
+    minimum, maximum = bornes_tranche(rang)
+    conditions, params = [], []
+    if minimum is not None:
+        conditions.append("prix >= ?")
+        params.append(minimum)
+    if maximum is not None:
+        conditions.append("prix < ?")
+        params.append(maximum)
+    return " AND ".join(conditions), params
+
+
+def creer_schema(conn: sqlite3.Connection) -> None:
+    """Table des comptes et triggers qui la suivent à chaque écriture sur annonces."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS facettes_annonces (
+            statut TEXT NOT NULL,
+            categorie TEXT NOT NULL,
+            type_annonce TEXT NOT NULL,
+            ville_normalisee TEXT NOT NULL,
+            tranche_prix INTEGER NOT NULL,
+            ville TEXT,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (statut, categorie, type_annonce, ville_normalisee, tranche_prix)
+        ) WITHOUT ROWID
+    """)
+
+    def cle(ligne: str) -> str:
+        return (f"COALESCE({ligne}.statut, ''), {ligne}.categorie, {ligne}.type_annonce, "
+                f"COALESCE({ligne}.ville_normalisee, ''), {expression_tranche(f'{ligne}.prix')}")
+
+    ajouter = f"""
+        INSERT INTO facettes_annonces (statut, categorie, type_annonce, ville_normalisee, tranche_prix, ville, total)
+        VALUES ({cle('new')}, new.ville, 1)
+        ON CONFLICT DO UPDATE SET total = total + 1;
+    """
+    retirer = f"""
+        UPDATE facettes_annonces SET total = total - 1
+        WHERE (statut, categorie, type_annonce, ville_normalisee, tranche_prix) = ({cle('old')});
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {TRIGGER_INSERTION} AFTER INSERT ON annonces BEGIN {ajouter} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS facettes_annonces_ad AFTER DELETE ON annonces BEGIN {retirer} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS facettes_annonces_au
+        AFTER UPDATE OF statut, categorie, type_annonce, ville_normalisee, prix ON annonces
+        WHEN old.statut IS NOT new.statut OR old.categorie IS NOT new.categorie
+          OR old.type_annonce IS NOT new.type_annonce OR old.ville_normalisee IS NOT new.ville_normalisee
+          OR {expression_tranche('old.prix')} != {expression_tranche('new.prix')}
+        BEGIN {retirer} {ajouter} END
+    """)
+
+
+def reconstruire(conn: sqlite3.Connection) -> None:
+    """Recompter toutes les facettes depuis annonces (après un import sans trigger d'insertion)."""
+    conn.execute("DELETE FROM facettes_annonces")
+    conn.execute(f"""
+        INSERT INTO facettes_annonces (statut, categorie, type_annonce, ville_normalisee, tranche_prix, ville, total)
+        SELECT COALESCE(statut, ''), categorie, type_annonce, COALESCE(ville_normalisee, ''),
+               {expression_tranche()}, MIN(ville), COUNT(*)
+        FROM annonces GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def conditions_facettes(filtres: Dict[str, Any],
+                        ville: Optional[str]) -> Optional[Dict[str, Tuple[List[str], List[Any]]]]:
+    """Conditions sur facettes_annonces de chaque facette filtrée, et du statut.
+
+    ``ville`` est le filtre de ville déjà normalisé. Retourne None si un
+    filtre de prix ne suit pas les tranches : la table ne peut alors pas
+    répondre exactement.
+    """
+    conditions: Dict[str, Tuple[List[str], List[Any]]] = {}
+    for facette in ('statut', 'categorie', 'type_annonce'):
+        if filtres.get(facette):
+            conditions[facette] = ([f"{facette} = ?"], [filtres[facette]])
+    if ville:
+        if filtres.get('ville_exacte'):
+            conditions['ville'] = (["ville_normalisee = ?"], [ville])
+        else:
+            conditions['ville'] = (["ville_normalisee >= ? AND ville_normalisee < ?"],
+                                   [ville, borne_prefixe(ville)])
+
+    prix: Tuple[List[str], List[Any]] = ([], [])
+    if filtres.get('prix_max'):
+        return None
+    if filtres.get('prix_min'):
+        if filtres['prix_min'] not in BORNES_PRIX:
+            return None
+        prix[0].append("tranche_prix > ?")
+        prix[1].append(BORNES_PRIX.index(filtres['prix_min']))
+    if filtres.get('tranche_prix') not in (None, ''):
+        bornes_tranche(filtres['tranche_prix'])
+        prix[0].append("tranche_prix = ?")
+        prix[1].append(int(filtres['tranche_prix']))
+    if prix[0]:
+        conditions['tranche_prix'] = prix
+    return conditions
+
+
+def compter(conn: sqlite3.Connection, conditions: Dict[str, Tuple[List[str], List[Any]]]) -> Dict[str, List[tuple]]:
+    """Lignes (valeur, libellé, total) de chaque facette, hors de son propre filtre.
+
+    Le statut n'est pas une facette : sa condition s'applique à toutes.
+    """
+    comptes = {}
+    for facette, (colonne, _) in FACETTES.items():
+        clauses, params = ["1=1"], []
+        for autre, (conditions_autre, params_autre) in conditions.items():
+            if autre != facette:
+                clauses.extend(conditions_autre)
+                params.extend(params_autre)
+        comptes[facette] = conn.execute(f"""
+            SELECT {colonne}, {LIBELLES.get(facette, 'NULL')}, SUM(total) FROM facettes_annonces
+            WHERE {' AND '.join(clauses)} GROUP BY 1 HAVING SUM(total) > 0
+        """, params).fetchall()
+    return comptes
+
+
+def regrouper_annonces(conn: sqlite3.Connection, clauses: List[str], params: List[Any],
+                       filtres: Dict[str, Any]) -> List[tuple]:
+    """Regrouper les annonces retenues par ``clauses`` (filtres hors facettes).
+
+    Chaque groupe est (catégorie, type, ville normalisée, tranche, respect
+    de prix_min/prix_max, libellé de ville, total).
+    """
+    prix, params_prix = [], []
+    if filtres.get('prix_min'):
+        prix.append("prix >= ?")
+        params_prix.append(filtres['prix_min'])
+    if filtres.get('prix_max'):
+        prix.append("prix <= ?")
+        params_prix.append(filtres['prix_max'])
+    return conn.execute(f"""
+        SELECT categorie, type_annonce, COALESCE(ville_normalisee, ''), {expression_tranche()},
+               {' AND '.join(prix) or '1'}, MIN(ville), COUNT(*)
+        FROM annonces WHERE {' AND '.join(clauses) or '1=1'} GROUP BY 1, 2, 3, 4, 5
+    """, params_prix + params).fetchall()
+
+
+def compter_groupes(lignes: List[tuple], filtres: Dict[str, Any], ville: Optional[str]) -> Dict[str, List[tuple]]:
+    """Comme ``compter``, à partir des groupes de ``regrouper_annonces``.
+
+    Les filtres de facette sont appliqués aux groupes : un groupe qui
+    n'échoue qu'au filtre d'une facette compte pour cette seule facette,
+    un groupe qui les respecte tous compte pour chacune.
+    """
+    tranche = None
+    if filtres.get('tranche_prix') not in (None, ''):
+        bornes_tranche(filtres['tranche_prix'])
+        tranche = int(filtres['tranche_prix'])
+    borne_ville = borne_prefixe(ville) if ville and not filtres.get('ville_exacte') else None
+
+    comptes: Dict[str, Dict[Any, List[Any]]] = {facette: {} for facette in FACETTES}
+    for categorie, type_annonce, ville_normalisee, rang, dans_prix, libelle, total in lignes:
+        echecs = [facette for facette, retenue in (
+            ('categorie', not filtres.get('categorie') or categorie == filtres['categorie']),
+            ('type_annonce', not filtres.get('type_annonce') or type_annonce == filtres['type_annonce']),
+            ('ville', not ville or (ville <= ville_normalisee < borne_ville if borne_ville
+                                    else ville_normalisee == ville)),
+            ('tranche_prix', dans_prix and (tranche is None or rang == tranche)),
+        ) if not retenue]
+        if len(echecs) > 1:
+            continue
+        valeurs = {'categorie': categorie, 'type_annonce': type_annonce,
+                   'ville': ville_normalisee, 'tranche_prix': rang}
+        for facette in echecs or FACETTES:
+            entree = comptes[facette].setdefault(valeurs[facette], [None, 0])
+            if facette in LIBELLES and (entree[0] is None or libelle < entree[0]):
+                entree[0] = libelle
+            entree[1] += total
+    return {facette: [(valeur, libelle, total) for valeur, (libelle, total) in valeurs.items()]
+            for facette, valeurs in comptes.items()}
+
+
+def formater(comptes: Dict[str, List[tuple]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Valeurs de chaque facette, les plus fréquentes d'abord (tranches de prix dans l'ordre)."""
+    resultat = {}
+    for facette, lignes in comptes.items():
+        valeurs = []
+        for valeur, libelle, total in lignes:
+            entree = {'valeur': libelle if libelle is not None else valeur, 'total': total}
+            if facette == 'tranche_prix':
+                entree['prix_min'], entree['prix_max'] = bornes_tranche(valeur)
+            valeurs.append(entree)
+        if facette == 'tranche_prix':
+            valeurs.sort(key=lambda entree: entree['valeur'])
+        else:
+            valeurs.sort(key=lambda entree: (-entree['total'], str(entree['valeur'])))
+        resultat[facette] = valeurs
+    return resultat
+
+
+def creer_journal(conn: sqlite3.Connection) -> None:
+    """Journal des annonces modifiées, lu par BitmapsFacettes de chaque processus.
+
+    Une ligne par insertion, suppression ou modification d'une colonne
+    filtrée ; ``annonce_id`` NULL demande une reconstruction complète.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS facettes_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            annonce_id INTEGER
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {TRIGGER_JOURNAL} AFTER INSERT ON annonces
+        BEGIN INSERT INTO facettes_journal (annonce_id) VALUES (new.id); END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS facettes_journal_ad AFTER DELETE ON annonces
+        BEGIN INSERT INTO facettes_journal (annonce_id) VALUES (old.id); END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS facettes_journal_au
+        AFTER UPDATE OF statut, categorie, type_annonce, ville, ville_normalisee, prix, donnees_specifiques
+        ON annonces
+        BEGIN INSERT INTO facettes_journal (annonce_id) VALUES (new.id); END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS facettes_journal_elaguer AFTER INSERT ON facettes_journal
+        WHEN new.id % {ELAGAGE_JOURNAL} = 0
+        BEGIN DELETE FROM facettes_journal WHERE id <= new.id - {GARDE_JOURNAL}; END
+    """)
+
+
+def signaler_reconstruction(conn: sqlite3.Connection) -> None:
+    """Demander aux bitmaps de tout relire (après un import sans trigger de journal)."""
+    conn.execute("INSERT INTO facettes_journal (annonce_id) VALUES (NULL)")
+
+
+def _bitmap(ids: Sequence[int]) -> int:
+    """Bitmap (bit n : annonce d'id n) des ``ids``."""
+    if len(ids) <= 16:
+        bits = 0
+        for i in ids:
+            bits |= 1 << i
+        return bits
+    octets = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        octets[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(octets, 'little')
+
+
+def _positions(bitmap: int) -> Iterator[int]:
+    """Ids présents dans ``bitmap``."""
+    chiffres = bin(bitmap)
+    dernier = len(chiffres) - 1
+    i = chiffres.find('1', 2)
+    while i != -1:
+        yield dernier - i
+        i = chiffres.find('1', i + 1)
+
+
+def _nombre(valeur: Any) -> Optional[float]:
+    """Borne numérique d'un filtre, ou None si SQLite pourrait la comparer autrement."""
+    if isinstance(valeur, (int, float)) and not (isinstance(valeur, float) and math.isnan(valeur)):
+        return valeur
+    return None
+
+
+class Seuils:
+    """Bitmaps « valeur >= seuil » d'une colonne numérique.
+
+    Quand la colonne a au plus SEUILS_MAX valeurs distinctes, chacune est
+    un seuil : toute comparaison est un bitmap déjà calculé. Sinon les
+    seuils sont des quantiles ; chaque seau (lignes entre deux seuils)
+    garde ses valeurs triées et leurs ids, pour départager par bisection
+    les lignes du seul seau qui contient la borne, et ``valeurs`` garde la
+    valeur de chaque id (NaN si absente) pour les retrouver à la mise à
+    jour. Les valeurs texte, supérieures à tout nombre pour SQLite, sont
+    gardées à part.
+    """
+
+    __slots__ = ('seuils', 'suffixes', 'nombres', 'textes', 'valeurs', 'seaux')
+
+    def __init__(self, seuils: List[float], suffixes: List[int], nombres: int, textes: int,
+                 valeurs: Optional[array] = None, seaux: Optional[List[Tuple[array, array]]] = None):
+        self.seuils = seuils
+        self.suffixes = suffixes
+        self.nombres = nombres
+        self.textes = textes
+        self.valeurs = valeurs
+        self.seaux = seaux  # seaux[k] : lignes sous seuils[k] et, si k > 0, au moins à seuils[k - 1]
+
+    @classmethod
+    def construire(cls, par_valeur: Optional[Dict[float, int]], valeurs: array, textes: int) -> 'Seuils':
+        """Seuils d'une colonne : bitmaps par valeur si elles sont peu nombreuses, sinon seaux triés."""
+        if par_valeur is not None:
+            seuils = sorted(par_valeur)
+            suffixes, cumul = [], 0
+            for seuil in reversed(seuils):
+                cumul |= par_valeur[seuil]
+                suffixes.append(cumul)
+            suffixes.reverse()
+            return cls(seuils, suffixes, cumul, textes)
+
+        ordre = sorted((i for i, valeur in enumerate(valeurs) if valeur == valeur), key=valeurs.__getitem__)
+        triees = [valeurs[i] for i in ordre]
+        seuils = sorted({triees[k * len(triees) // SEUILS_MAX] for k in range(SEUILS_MAX)})
+        bornes = [0] + [bisect_left(triees, seuil) for seuil in seuils] + [len(triees)]
+        seaux = [(array('d', triees[bornes[k]:bornes[k + 1]]), array('q', ordre[bornes[k]:bornes[k + 1]]))
+                 for k in range(len(seuils) + 1)]
+        octets = bytearray((len(valeurs) >> 3) + 1)
+        suffixes = []
+        for _, ids in reversed(seaux):
+            for i in ids:
+                octets[i >> 3] |= 1 << (i & 7)
+            suffixes.append(int.from_bytes(octets, 'little'))
+        nombres = suffixes.pop()
+        suffixes.reverse()
+        return cls(seuils, suffixes, nombres, textes, valeurs, seaux)
+
+    def superieurs(self, borne: float, strict: bool) -> int:
+        """Lignes de valeur supérieure (ou égale, si non ``strict``) à ``borne``."""
+        k = bisect_right(self.seuils, borne) if strict else bisect_left(self.seuils, borne)
+        resultat = self.suffixes[k] if k < len(self.seuils) else 0
+        if self.seaux is not None:
+            valeurs, ids = self.seaux[k]
+            position = bisect_right(valeurs, borne) if strict else bisect_left(valeurs, borne)
+            if len(ids) - position <= position:
+                resultat |= _bitmap(ids[position:])
+            elif position:
+                seau = (self.suffixes[k - 1] if k else self.nombres) & ~resultat
+                resultat |= seau & ~_bitmap(ids[:position])
+            else:
+                resultat |= _bitmap(ids)
+        return resultat | self.textes
+
+    def comparer(self, operateur: str, borne: float) -> int:
+        """Lignes vérifiant ``colonne <operateur> borne`` (NULL exclus, comme en SQL)."""
+        if operateur == '>=':
+            return self.superieurs(borne, False)
+        if operateur == '>':
+            return self.superieurs(borne, True)
+        if operateur == '<=':
+            return self.nombres & ~self.superieurs(borne, True)
+        if operateur == '<':
+            return self.nombres & ~self.superieurs(borne, False)
+        raise ValueError(f"Opérateur inconnu : {operateur}")
+
+    def mettre_a_jour(self, masque: int, lignes: Dict[int, Any]) -> bool:
+        """Remplacer les lignes effacées par ``masque`` par leurs nouvelles valeurs.
+
+        Retourne False si la colonne doit être reconstruite (trop de
+        valeurs distinctes pour garder une valeur par seuil).
+        """
+        nombres = {i: valeur for i, valeur in lignes.items() if _nombre(valeur) is not None}
+        self.textes = (self.textes & masque) | _bitmap(
+            [i for i, valeur in lignes.items() if isinstance(valeur, (str, bytes))])
+        self.nombres = (self.nombres & masque) | _bitmap(list(nombres))
+        suffixes = [suffixe & masque for suffixe in self.suffixes]
+        if self.seaux is None:
+            nouvelles = set(nombres.values()).difference(self.seuils)
+            if len(self.seuils) + len(nouvelles) > SEUILS_MAX:
+                return False
+            for valeur in sorted(nouvelles):
+                # Aucune autre ligne n'a de valeur entre ce seuil et le suivant
+                k = bisect_left(self.seuils, valeur)
+                self.seuils.insert(k, valeur)
+                suffixes.insert(k, suffixes[k] if k < len(suffixes) else 0)
+        else:
+            valeurs = self.valeurs
+            if lignes and max(lignes) >= len(valeurs):
+                valeurs.extend(array('d', [math.nan]) * (max(lignes) + 1 - len(valeurs)))
+            for i in lignes:
+                ancienne = valeurs[i]
+                if ancienne == ancienne:
+                    valeurs_seau, ids = self.seaux[bisect_right(self.seuils, ancienne)]
+                    position = ids.index(i, bisect_left(valeurs_seau, ancienne))
+                    del valeurs_seau[position], ids[position]
+                valeurs[i] = nombres.get(i, math.nan)
+                if i in nombres:
+                    valeurs_seau, ids = self.seaux[bisect_right(self.seuils, nombres[i])]
+                    position = bisect_right(valeurs_seau, nombres[i])
+                    valeurs_seau.insert(position, nombres[i])
+                    ids.insert(position, i)
+        for k, seuil in enumerate(self.seuils):
+            suffixes[k] |= _bitmap([i for i, valeur in nombres.items() if valeur >= seuil])
+        self.suffixes = suffixes
+        return True
+
+
+class BitmapsFacettes:
+    """Comptes par facette sous n'importe quels filtres, par bitmaps en mémoire.
+
+    Un bitmap (entier Python, bit n : annonce d'id n) par valeur du
+    statut, de chaque facette et de chaque attribut texte filtré ; des
+    Seuils pour le prix et les attributs numériques. Le compte d'une valeur
+    est le nombre de bits de l'intersection de son bitmap avec ceux des
+    filtres. Les bitmaps sont construits au premier appel, puis tenus à
+    jour depuis facettes_journal, que les triggers remplissent pour toutes
+    les connexions et tous les processus.
+
+    ``filtres_attributs`` : (clé de filtre, colonne, opérateur) ; « = »
+    compare du texte sans casse, les autres opérateurs des nombres.
+    """
+
+    def __init__(self, filtres_attributs: Sequence[Tuple[str, str, str]]):
+        self._attributs = {cle: (colonne, operateur) for cle, colonne, operateur in filtres_attributs}
+        textes = sorted({colonne for colonne, operateur in self._attributs.values() if operateur == '='})
+        self._numeriques = ['prix'] + sorted(
+            {colonne for colonne, operateur in self._attributs.values() if operateur != '='})
+        # Groupe de bitmaps -> expression lue dans annonces (texte sans casse : lower, comme NOCASE)
+        self._groupes_sql = [
+            ('statut', "COALESCE(statut, '')"), ('categorie', 'categorie'), ('type_annonce', 'type_annonce'),
+            ('ville', "COALESCE(ville_normalisee, '')"), ('ville_brute', 'ville'),
+            ('tranche_prix', expression_tranche()),
+        ] + [(colonne, f'lower({colonne})') for colonne in textes]
+        self._verrou = threading.Lock()
+        self._position: Optional[int] = None  # dernier id de facettes_journal appliqué
+        self._groupes: Dict[str, Dict[Any, int]] = {}
+        self._seuils: Dict[str, Seuils] = {}
+        self._graphies: Dict[str, Set[str]] = {}  # ville normalisée -> villes saisies
+        self._lignes = 0
+
+    def _requete(self, condition: str) -> str:
+        colonnes = [expression for _, expression in self._groupes_sql] + self._numeriques
+        return f"SELECT id, {', '.join(colonnes)} FROM annonces {condition}"
+
+    def _construire(self, conn: sqlite3.Connection) -> None:
+        position = conn.execute("SELECT COALESCE(MAX(id), 0) FROM facettes_journal").fetchone()[0]
+        dernier_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM annonces").fetchone()[0]
+        taille = (dernier_id >> 3) + 1
+        nb_groupes = len(self._groupes_sql)
+        tampons: List[Dict[Any, bytearray]] = [{} for _ in range(nb_groupes)]
+        valeurs = [array('d', [math.nan]) * (dernier_id + 1) for _ in self._numeriques]
+        par_valeur: List[Optional[Dict[float, bytearray]]] = [{} for _ in self._numeriques]
+        textes = [bytearray(taille) for _ in self._numeriques]
+        graphies: Set[Tuple[str, str]] = set()
+
+        fin_groupes = nb_groupes + 1
+        for row in conn.execute(self._requete('')):
+            i = row[0]
+            octet, bit = i >> 3, 1 << (i & 7)
+            for valeur, groupe in zip(row[1:fin_groupes], tampons):
+                if valeur is not None:
+                    tampon = groupe.get(valeur)
+                    if tampon is None:
+                        tampon = groupe[valeur] = bytearray(taille)
+                    tampon[octet] |= bit
+            graphies.add((row[4], row[5]))
+            for rang, valeur in enumerate(row[fin_groupes:]):
+                if valeur is None:
+                    continue
+                if not isinstance(valeur, (int, float)):  # SQLite ne rend jamais NaN
+                    textes[rang][octet] |= bit
+                    continue
+                valeurs[rang][i] = valeur
+                distinctes = par_valeur[rang]
+                if distinctes is not None:
+                    tampon = distinctes.get(valeur)
+                    if tampon is None:
+                        if len(distinctes) == SEUILS_MAX:
+                            par_valeur[rang] = None
+                            continue
+                        tampon = distinctes[valeur] = bytearray(taille)
+                    tampon[octet] |= bit
+
+        self._groupes = {
+            nom: {valeur: int.from_bytes(tampon, 'little') for valeur, tampon in tampons[rang].items()}
+            for rang, (nom, _) in enumerate(self._groupes_sql)
+        }
+        self._seuils = {}
+        for rang, colonne in enumerate(self._numeriques):
+            distinctes = par_valeur[rang]
+            if distinctes is not None:
+                distinctes = {valeur: int.from_bytes(tampon, 'little') for valeur, tampon in distinctes.items()}
+            self._seuils[colonne] = Seuils.construire(
+                distinctes, valeurs[rang], int.from_bytes(textes[rang], 'little'))
+        self._graphies = {}
+        for normalisee, ville in graphies:
+            if ville is not None:
+                self._graphies.setdefault(normalisee, set()).add(ville)
+        self._lignes = sum(bitmap.bit_count() for bitmap in self._groupes['statut'].values())
+        self._position = position
+
+    def _appliquer(self, conn: sqlite3.Connection, ids: List[int]) -> bool:
+        """Relire les annonces ``ids`` ; False si une colonne doit être reconstruite."""
+        masque = ~_bitmap(ids)
+        rows = []
+        for debut in range(0, len(ids), 500):
+            lot = ids[debut:debut + 500]
+            rows.extend(conn.execute(
+                self._requete(f"WHERE id IN ({', '.join('?' * len(lot))})"), lot).fetchall())
+
+        nb_groupes = len(self._groupes_sql)
+        for rang, (nom, _) in enumerate(self._groupes_sql):
+            groupe = self._groupes[nom]
+            for valeur in list(groupe):
+                bitmap = groupe[valeur] & masque
+                if bitmap:
+                    groupe[valeur] = bitmap
+                else:
+                    del groupe[valeur]
+            nouveaux: Dict[Any, List[int]] = {}
+            for row in rows:
+                if row[rang + 1] is not None:
+                    nouveaux.setdefault(row[rang + 1], []).append(row[0])
+            for valeur, lot in nouveaux.items():
+                groupe[valeur] = groupe.get(valeur, 0) | _bitmap(lot)
+        for row in rows:
+            if row[5] is not None:
+                self._graphies.setdefault(row[4], set()).add(row[5])
+        for rang, colonne in enumerate(self._numeriques):
+            lignes = {row[0]: row[nb_groupes + 1 + rang] for row in rows}
+            if not self._seuils[colonne].mettre_a_jour(masque, lignes):
+                return False
+        self._lignes = sum(bitmap.bit_count() for bitmap in self._groupes['statut'].values())
+        return True
+
+    def _synchroniser(self, conn: sqlite3.Connection) -> None:
+        # Une transaction de lecture : journal et annonces relus au même état
+        conn.execute("BEGIN")
+        try:
+            if self._position is None:
+                self._construire(conn)
+                return
+            premier, dernier = conn.execute("SELECT MIN(id), MAX(id) FROM facettes_journal").fetchone()
+            if dernier is None or dernier <= self._position:
+                return
+            if premier > self._position + 1:  # entrées élaguées avant d'avoir été lues
+                self._construire(conn)
+                return
+            ids: Set[int] = set()
+            for (annonce_id,) in conn.execute(
+                    "SELECT annonce_id FROM facettes_journal WHERE id > ? AND id <= ?", (self._position, dernier)):
+                if annonce_id is None:
+                    self._construire(conn)
+                    return
+                ids.add(annonce_id)
+            if len(ids) > max(1000, self._lignes // 20) or not self._appliquer(conn, sorted(ids)):
+                self._construire(conn)
+                return
+            self._position = dernier
+        finally:
+            conn.rollback()
+
+    def _conditions(self, filtres: Dict[str, Any],
+                    ville: Optional[str]) -> Optional[Tuple[int, Dict[str, Optional[int]]]]:
+        """Bitmap des filtres communs à toutes les facettes, et de ceux de chaque facette.
+
+        Retourne None si une valeur de filtre n'a pas le type de sa colonne :
+        SQLite la convertirait, le calcul SQL doit alors répondre.
+        """
+        communs: List[int] = []
+        propres: Dict[str, List[int]] = {facette: [] for facette in FACETTES}
+        for cle in ('statut', 'categorie', 'type_annonce'):
+            if filtres.get(cle):
+                if not isinstance(filtres[cle], str):
+                    return None
+                bitmap = self._groupes[cle].get(filtres[cle], 0)
+                (communs if cle == 'statut' else propres[cle]).append(bitmap)
+        if ville:
+            groupe = self._groupes['ville']
+            if filtres.get('ville_exacte'):
+                propres['ville'].append(groupe.get(ville, 0))
+            else:
+                borne, bitmap = borne_prefixe(ville), 0
+                for valeur, bitmap_ville in groupe.items():
+                    if ville <= valeur < borne:
+                        bitmap |= bitmap_ville
+                propres['ville'].append(bitmap)
+
+        prix = self._seuils['prix']
+        bornes = []
+        for cle, operateur in (('prix_min', '>='), ('prix_max', '<=')):
+            if filtres.get(cle):
+                bornes.append((operateur, _nombre(filtres[cle])))
+        if filtres.get('tranche_prix') not in (None, ''):
+            minimum, maximum = bornes_tranche(filtres['tranche_prix'])
+            bornes.extend(borne for borne in (('>=', minimum), ('<', maximum)) if borne[1] is not None)
+        for operateur, borne in bornes:
+            if borne is None:
+                return None
+            propres['tranche_prix'].append(prix.comparer(operateur, borne))
+
+        for cle, (colonne, operateur) in self._attributs.items():
+            valeur = filtres.get(cle)
+            if valeur in (None, ''):
+                continue
+            if operateur == '=':
+                if not isinstance(valeur, str):
+                    return None
+                communs.append(self._groupes[colonne].get(_minuscules_ascii(valeur), 0))
+            else:
+                if _nombre(valeur) is None:
+                    return None
+                communs.append(self._seuils[colonne].comparer(operateur, valeur))
+
+        base = -1  # tous les bits
+        for bitmap in communs:
+            base &= bitmap
+        intersections: Dict[str, Optional[int]] = {}
+        for facette, bitmaps in propres.items():
+            intersection = None
+            for bitmap in bitmaps:
+                intersection = bitmap if intersection is None else intersection & bitmap
+            intersections[facette] = intersection
+        return base, intersections
+
+    def compter(self, conn: sqlite3.Connection, filtres: Dict[str, Any],
+                ville: Optional[str]) -> Optional[Dict[str, List[tuple]]]:
+        """Lignes (valeur, libellé, total) de chaque facette, comme ``compter``.
+
+        ``filtres`` porte le statut voulu ; ``ville`` est déjà normalisée.
+        Retourne None si les filtres ne peuvent être évalués sur les bitmaps.
+        """
+        with self._verrou:
+            self._synchroniser(conn)
+            conditions = self._conditions(filtres, ville)
+            if conditions is None:
+                return None
+            base, propres = conditions
+            comptes = {}
+            for facette in FACETTES:
+                retenues = base
+                for autre, bitmap in propres.items():
+                    if autre != facette and bitmap is not None:
+                        retenues &= bitmap
+                lignes = []
+                if retenues:
+                    for valeur, bitmap in self._groupes[facette].items():
+                        total = (retenues & bitmap).bit_count()
+                        if total:
+                            lignes.append((valeur, self._libelle(facette, valeur, retenues), total))
+                comptes[facette] = lignes
+            return comptes
+
+    def _libelle(self, facette: str, valeur: Any, retenues: int) -> Optional[str]:
+        if facette != 'ville':
+            return None
+        # MIN(ville) des annonces retenues de cette ville normalisée
+        villes = self._groupes['ville_brute']
+        return min((ville for ville in self._graphies.get(valeur, ())
+                    if villes.get(ville, 0) & retenues), default=None)
+
+
+def _minuscules_ascii(texte: str) -> str:
+    """Minuscules des seules lettres ASCII, comme lower() et COLLATE NOCASE de SQLite."""
+    if texte.isascii():
+        return texte.lower()
+    return ''.join(c.lower() if c.isascii() else c for c in texte)
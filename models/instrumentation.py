@@ -0,0 +1,471 @@
+"""
+Instrumentation opt-in de Database : latences par méthode et par requête SQL
+Histogrammes (p50/p95/p99), lignes lues, décodage JSON, journal des requêtes lentes
+"""
+
+import bisect
+import functools
+import inspect
+import logging
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures des intervalles d'histogramme, en secondes : série de
+# Renard R10 (10 paliers par décade, écart d'environ 25 %) de 10 µs à 100 s.
+# Les quantiles sont interpolés dans ces intervalles.
+_PALIERS = (1.0, 1.25, 1.6, 2.0, 2.5, 3.15, 4.0, 5.0, 6.3, 8.0)
+BORNES = tuple(round(palier * 10.0 ** exposant, 10) for exposant in range(-5, 2) for palier in _PALIERS) + (100.0,)
+# Sous-ensemble exposé au format Prometheus (compteurs cumulés exacts)
+BORNES_PROMETHEUS = tuple(round(palier * 10.0 ** exposant, 10)
+                          for exposant in range(-4, 1) for palier in (1.0, 2.5, 5.0)) + (10.0,)
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIXE_PROMETHEUS = 'immo_gabon_db'
+
+# Requêtes dont le plan peut être demandé par EXPLAIN QUERY PLAN
+_EXPLICABLES = re.compile(r'\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_LISTES = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACES = re.compile(r'\s+')
+
+_normalisees: Dict[str, str] = {}
+_TAILLE_MAX_NORMALISEES = 4096
+
+
+def normaliser_sql(sql: str) -> str:
+    """Forme normalisée d'une requête : littéraux et listes de paramètres remplacés.
+
+    ``WHERE id IN (?, ?, ?) LIMIT 50`` devient ``WHERE id IN (?…) LIMIT ?`` :
+    les variantes d'une même requête partagent leurs statistiques.
+    """
+    normalisee = _normalisees.get(sql)
+    if normalisee is None:
+        normalisee = _CHAINES.sub('?', sql)
+        normalisee = _NOMBRES.sub('?', normalisee)
+        normalisee = _LISTES.sub('(?…)', normalisee)
+        normalisee = _ESPACES.sub(' ', normalisee).strip()
+        if len(_normalisees) >= _TAILLE_MAX_NORMALISEES:
+            _normalisees.clear()
+        _normalisees[sql] = normalisee
+    return normalisee
+
+
+def expliquer(conn: sqlite3.Connection, sql: str, parametres: Any = None) -> List[str]:
+    """Lignes ``detail`` de EXPLAIN QUERY PLAN ; liste vide si le plan n'est pas disponible."""
+    if not _EXPLICABLES.match(sql):
+        return []
+    try:
+        # Appel de la classe de base : le plan n'est pas lui-même mesuré
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}",
+                                          () if parametres is None else parametres).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    return [row[3] for row in rows]
+
+
+class StatistiquesAppels:
+    """Compteurs et histogramme de latence d'une méthode ou d'une requête normalisée."""
+
+    __slots__ = ('appels', 'erreurs', 'duree_totale', 'duree_max', 'lignes', 'duree_json', 'intervalles')
+
+    def __init__(self):
+        self.appels = 0
+        self.erreurs = 0
+        self.duree_totale = 0.0
+        self.duree_max = 0.0
+        self.lignes = 0
+        self.duree_json = 0.0
+        self.intervalles = [0] * (len(BORNES) + 1)  # le dernier au-delà de 100 s
+
+    def ajouter(self, duree: float, lignes: int = 0, duree_json: float = 0.0, erreur: bool = False) -> None:
+        self.appels += 1
+        self.erreurs += erreur
+        self.duree_totale += duree
+        if duree > self.duree_max:
+            self.duree_max = duree
+        self.lignes += lignes
+        self.duree_json += duree_json
+        self.intervalles[bisect.bisect_left(BORNES, duree)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Durée sous laquelle tombent ``q`` des appels, interpolée dans son intervalle."""
+        if not self.appels:
+            return 0.0
+        cible = q * self.appels
+        cumul = 0
+        for rang, effectif in enumerate(self.intervalles):
+            if effectif and cumul + effectif >= cible:
+                bas = BORNES[rang - 1] if rang else 0.0
+                haut = BORNES[rang] if rang < len(BORNES) else self.duree_max
+                return min(bas + (haut - bas) * (cible - cumul) / effectif, self.duree_max)
+            cumul += effectif
+        return self.duree_max
+
+    def resume(self) -> Dict[str, Any]:
+        """Compteurs et quantiles (durées en secondes)."""
+        resume = {
+            'appels': self.appels,
+            'erreurs': self.erreurs,
+            'duree_totale': self.duree_totale,
+            'duree_moyenne': self.duree_totale / self.appels if self.appels else 0.0,
+            'duree_max': self.duree_max,
+            'lignes': self.lignes,
+            'duree_json': self.duree_json,
+        }
+        for q in QUANTILES:
+            resume[f'p{round(q * 100)}'] = self.quantile(q)
+        return resume
+
+    def cumuls(self, bornes: Iterable[float]) -> List[int]:
+        """Appels de durée inférieure ou égale à chaque borne (histogramme cumulé)."""
+        resultat, cumul, rang = [], 0, 0
+        for borne in bornes:
+            while rang < len(BORNES) and BORNES[rang] <= borne:
+                cumul += self.intervalles[rang]
+                rang += 1
+            resultat.append(cumul)
+        return resultat
+
+
+class _Contexte:
+    """Lignes lues et temps de décodage JSON pendant un appel de méthode."""
+
+    __slots__ = ('lignes', 'duree_json')
+
+    def __init__(self):
+        self.lignes = 0
+        self.duree_json = 0.0
+
+
+class Instrumentation:
+    """Mesures des appels d'une Database et de ses requêtes SQL.
+
+    Activée par ``Database(instrumentation=Instrumentation())`` : les
+    méthodes publiques sont enveloppées et les connexions du pool et de
+    l'écrivain mesurent chaque requête, de l'exécution à la dernière ligne
+    lue. Sans instrumentation, aucun de ces chemins n'existe. ``actif``
+    suspend les mesures sans reconstruire la base.
+
+    Une requête d'au moins ``seuil_requete_lente`` secondes est journalisée
+    avec son plan (EXPLAIN QUERY PLAN, calculé une fois par requête
+    normalisée) ; les ``taille_journal`` dernières restent dans
+    ``instantane()['requetes_lentes']``.
+
+    Les lignes et le temps JSON d'une méthode sont ceux de son thread :
+    les écritures exécutées par l'écrivain unique ne lui sont pas
+    attribuées, et les méthodes génératrices ne sont pas enveloppées
+    (leurs requêtes restent mesurées). Le JSON décodé hors de toute
+    méthode (annonces paresseuses lues après le retour) est compté à part,
+    dans ``json_differe``.
+    """
+
+    def __init__(self, seuil_requete_lente: float = 0.1, taille_journal: int = 100, actif: bool = True):
+        self.seuil_requete_lente = seuil_requete_lente
+        self.actif = actif
+        self._methodes: Dict[str, StatistiquesAppels] = {}
+        self._requetes: Dict[str, StatistiquesAppels] = {}
+        self._lentes: Deque[Dict[str, Any]] = deque(maxlen=taille_journal)
+        self._plans: Dict[str, List[str]] = {}
+        self._requetes_lentes = 0
+        self._json_differe = StatistiquesAppels()
+        self._verrou = threading.Lock()
+        self._local = threading.local()
+        # Fabrique passée à sqlite3.connect(factory=...) par le pool et l'écrivain
+        self.fabrique_connexion = functools.partial(ConnexionInstrumentee, instrumentation=self)
+
+    def _pile(self) -> List[_Contexte]:
+        pile = getattr(self._local, 'pile', None)
+        if pile is None:
+            pile = self._local.pile = []
+        return pile
+
+    def _statistiques(self, table: Dict[str, StatistiquesAppels], cle: str) -> StatistiquesAppels:
+        statistiques = table.get(cle)
+        if statistiques is None:
+            statistiques = table[cle] = StatistiquesAppels()
+        return statistiques
+
+    # -- Méthodes ---------------------------------------------------------
+
+    def mesurer(self, nom: str, methode: Callable[..., Any]) -> Callable[..., Any]:
+        """Envelopper ``methode`` pour mesurer ses appels sous le nom ``nom``."""
+
+        @functools.wraps(methode)
+        def appel(*args: Any, **kwargs: Any) -> Any:
+            if not self.actif:
+                return methode(*args, **kwargs)
+            pile = self._pile()
+            contexte = _Contexte()
+            pile.append(contexte)
+            erreur = True
+            debut = perf_counter()
+            try:
+                resultat = methode(*args, **kwargs)
+                erreur = False
+                return resultat
+            finally:
+                duree = perf_counter() - debut
+                pile.pop()
+                if pile:  # appel imbriqué : compté aussi dans la méthode appelante
+                    pile[-1].lignes += contexte.lignes
+                    pile[-1].duree_json += contexte.duree_json
+                with self._verrou:
+                    self._statistiques(self._methodes, nom).ajouter(
+                        duree, contexte.lignes, contexte.duree_json, erreur)
+
+        return appel
+
+    def instrumenter(self, objet: Any, exclure: Iterable[str] = ()) -> None:
+        """Remplacer sur ``objet`` ses méthodes publiques par des versions mesurées."""
+        exclure = set(exclure)
+        for nom, fonction in inspect.getmembers(type(objet), inspect.isfunction):
+            if nom.startswith('_') or nom in exclure or inspect.isgeneratorfunction(fonction):
+                continue
+            setattr(objet, nom, self.mesurer(nom, getattr(objet, nom)))
+
+    def chronometrer_json(self, charger: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        """Décodeur JSON dont le temps est ajouté à la méthode en cours (ou à ``json_differe``)."""
+
+        @functools.wraps(charger)
+        def charger_mesure(valeur: Any) -> Any:
+            if not self.actif:
+                return charger(valeur)
+            pile = getattr(self._local, 'pile', None)
+            debut = perf_counter()
+            try:
+                return charger(valeur)
+            finally:
+                duree = perf_counter() - debut
+                if pile:
+                    pile[-1].duree_json += duree
+                else:
+                    with self._verrou:
+                        self._json_differe.ajouter(duree, duree_json=duree)
+
+        return charger_mesure
+
+    # -- Requêtes ---------------------------------------------------------
+
+    def enregistrer_requete(self, conn: sqlite3.Connection, sql: str, parametres: Any,
+                            duree: float, lignes: int, erreur: bool = False) -> None:
+        """Compter une exécution de ``sql`` ; journaliser son plan si elle est lente."""
+        cle = normaliser_sql(sql)
+        with self._verrou:
+            self._statistiques(self._requetes, cle).ajouter(duree, lignes, erreur=erreur)
+        pile = getattr(self._local, 'pile', None)
+        if pile:
+            pile[-1].lignes += lignes
+        if not erreur and duree >= self.seuil_requete_lente:
+            self._signaler_requete_lente(conn, cle, sql, parametres, duree)
+
+    def _signaler_requete_lente(self, conn: sqlite3.Connection, cle: str, sql: str,
+                                parametres: Any, duree: float) -> None:
+        plan = self._plans.get(cle)
+        if plan is None:
+            plan = self._plans[cle] = expliquer(conn, sql, parametres)
+        with self._verrou:
+            self._requetes_lentes += 1
+            self._lentes.append({
+                'requete': cle,
+                'duree': duree,
+                'plan': plan,
+                'date': datetime.now().isoformat(),
+            })
+        logger.warning("Requête lente (%.1f ms) : %s%s", duree * 1000, cle,
+                       ''.join(f"\n    {ligne}" for ligne in plan))
+
+    # -- Exposition -------------------------------------------------------
+
+    def instantane(self) -> Dict[str, Any]:
+        """Statistiques par méthode et par requête normalisée, et dernières requêtes lentes."""
+        with self._verrou:
+            return {
+                'methodes': {nom: stats.resume() for nom, stats in sorted(self._methodes.items())},
+                'requetes': {sql: stats.resume() for sql, stats in sorted(self._requetes.items())},
+                'requetes_lentes': list(self._lentes),
+                'total_requetes_lentes': self._requetes_lentes,
+                'json_differe': self._json_differe.resume(),
+            }
+
+    def reinitialiser(self) -> None:
+        """Remettre toutes les mesures à zéro (les plans mémorisés sont conservés)."""
+        with self._verrou:
+            self._methodes.clear()
+            self._requetes.clear()
+            self._lentes.clear()
+            self._requetes_lentes = 0
+            self._json_differe = StatistiquesAppels()
+
+    def exposition_prometheus(self) -> str:
+        """Mesures au format texte d'exposition Prometheus."""
+        with self._verrou:
+            methodes = sorted(self._methodes.items())
+            requetes = sorted(self._requetes.items())
+            lignes = _histogrammes('methode_duree_secondes', "Durée des appels de méthodes Database",
+                                   'methode', methodes)
+            lignes += _compteurs('methode_erreurs_total', "Appels terminés par une exception",
+                                 'methode', [(nom, stats.erreurs) for nom, stats in methodes])
+            lignes += _compteurs('methode_lignes_total', "Lignes lues par les requêtes des méthodes",
+                                 'methode', [(nom, stats.lignes) for nom, stats in methodes])
+            lignes += _compteurs('methode_json_secondes_total', "Temps de décodage JSON des méthodes",
+                                 'methode', [(nom, stats.duree_json) for nom, stats in methodes])
+            lignes += _histogrammes('requete_duree_secondes', "Durée des requêtes SQL normalisées",
+                                    'requete', requetes)
+            lignes += _compteurs('requete_lignes_total', "Lignes lues par requête SQL normalisée",
+                                 'requete', [(sql, stats.lignes) for sql, stats in requetes])
+            lignes += [f"# HELP {PREFIXE_PROMETHEUS}_requetes_lentes_total Requêtes au-delà du seuil de lenteur",
+                       f"# TYPE {PREFIXE_PROMETHEUS}_requetes_lentes_total counter",
+                       f"{PREFIXE_PROMETHEUS}_requetes_lentes_total {self._requetes_lentes}",
+                       f"# HELP {PREFIXE_PROMETHEUS}_json_differe_secondes_total "
+                       "Temps de décodage JSON hors des méthodes (annonces paresseuses)",
+                       f"# TYPE {PREFIXE_PROMETHEUS}_json_differe_secondes_total counter",
+                       f"{PREFIXE_PROMETHEUS}_json_differe_secondes_total {self._json_differe.duree_json!r}"]
+        return '\n'.join(lignes) + '\n'
+
+
+def _etiquette(valeur: str) -> str:
+    return valeur.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogrammes(nom: str, aide: str, etiquette: str, series) -> List[str]:
+    nom = f"{PREFIXE_PROMETHEUS}_{nom}"
+    lignes = [f"# HELP {nom} {aide}", f"# TYPE {nom} histogram"]
+    for cle, stats in series:
+        libelle = f'{etiquette}="{_etiquette(cle)}"'
+        for borne, cumul in zip(BORNES_PROMETHEUS, stats.cumuls(BORNES_PROMETHEUS)):
+            lignes.append(f'{nom}_bucket{{{libelle},le="{borne:g}"}} {cumul}')
+        lignes.append(f'{nom}_bucket{{{libelle},le="+Inf"}} {stats.appels}')
+        lignes.append(f'{nom}_sum{{{libelle}}} {stats.duree_totale!r}')
+        lignes.append(f'{nom}_count{{{libelle}}} {stats.appels}')
+    return lignes
+
+
+def _compteurs(nom: str, aide: str, etiquette: str, valeurs) -> List[str]:
+    nom = f"{PREFIXE_PROMETHEUS}_{nom}"
+    lignes = [f"# HELP {nom} {aide}", f"# TYPE {nom} counter"]
+    lignes += [f'{nom}{{{etiquette}="{_etiquette(cle)}"}} {valeur!r}' for cle, valeur in valeurs]
+    return lignes
+
+
+class CurseurInstrumente(sqlite3.Cursor):
+    """Curseur qui mesure chaque requête, de l'exécution à la dernière ligne lue.
+
+    Une mesure est close quand le résultat est épuisé, à l'exécution
+    suivante, à la fermeture ou à la destruction du curseur. Seul le temps
+    passé dans SQLite compte, pas celui de l'appelant entre deux lignes.
+    """
+
+    _mesure: Optional[list] = None  # [sql, paramètres du plan, durée, lignes]
+
+    def _lancer(self, executer: Callable[[str, Any], Any], sql: str, parametres: Any, parametres_plan: Any):
+        if self._mesure is not None:
+            self._terminer()
+        instrumentation = self.connection.instrumentation
+        if not instrumentation.actif:
+            return executer(sql, parametres)
+        debut = perf_counter()
+        try:
+            executer(sql, parametres)
+        except BaseException:
+            instrumentation.enregistrer_requete(self.connection, sql, None, perf_counter() - debut, 0, erreur=True)
+            raise
+        self._mesure = [sql, parametres_plan, perf_counter() - debut, 0]
+        if self.description is None:  # aucune ligne à lire (INSERT, UPDATE, PRAGMA…)
+            self._terminer()
+        return self
+
+    def execute(self, sql: str, parametres: Any = ()):
+        return self._lancer(super().execute, sql, parametres, parametres)
+
+    def executemany(self, sql: str, parametres: Any):
+        # Le plan est demandé avec le premier jeu de paramètres s'il est connu d'avance
+        premiers = parametres[0] if isinstance(parametres, (list, tuple)) and parametres else None
+        return self._lancer(super().executemany, sql, parametres, premiers)
+
+    def _lues(self, duree: float, lignes: int, fin: bool = False) -> None:
+        self._mesure[2] += duree
+        self._mesure[3] += lignes
+        if fin:
+            self._terminer()
+
+    def _terminer(self) -> None:
+        sql, parametres, duree, lignes = self._mesure
+        self._mesure = None
+        self.connection.instrumentation.enregistrer_requete(self.connection, sql, parametres, duree, lignes)
+
+    def fetchone(self):
+        if self._mesure is None:
+            return super().fetchone()
+        debut = perf_counter()
+        ligne = super().fetchone()
+        self._lues(perf_counter() - debut, ligne is not None, fin=ligne is None)
+        return ligne
+
+    def fetchmany(self, size: Optional[int] = None):
+        if size is None:
+            size = self.arraysize
+        if self._mesure is None:
+            return super().fetchmany(size)
+        debut = perf_counter()
+        lignes = super().fetchmany(size)
+        self._lues(perf_counter() - debut, len(lignes), fin=len(lignes) < size)
+        return lignes
+
+    def fetchall(self):
+        if self._mesure is None:
+            return super().fetchall()
+        debut = perf_counter()
+        lignes = super().fetchall()
+        self._lues(perf_counter() - debut, len(lignes), fin=True)
+        return lignes
+
+    def __next__(self):
+        if self._mesure is None:
+            return super().__next__()
+        debut = perf_counter()
+        try:
+            ligne = super().__next__()
+        except StopIteration:
+            self._lues(perf_counter() - debut, 0, fin=True)
+            raise
+        self._lues(perf_counter() - debut, 1)
+        return ligne
+
+    def close(self) -> None:
+        if self._mesure is not None:
+            self._terminer()
+        super().close()
+
+    def __del__(self) -> None:
+        if self._mesure is not None:
+            try:
+                self._terminer()
+            except Exception:  # pragma: no cover - connexion déjà fermée
+                pass
+
+
+class ConnexionInstrumentee(sqlite3.Connection):
+    """Connexion SQLite dont les curseurs sont des CurseurInstrumente."""
+
+    def __init__(self, *args: Any, instrumentation: Instrumentation, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.instrumentation = instrumentation
+
+    def cursor(self, factory: Optional[type] = None) -> sqlite3.Cursor:
+        return super().cursor(factory or CurseurInstrumente)
+
+    # Les raccourcis de sqlite3.Connection exécutent la requête sans passer
+    # par Cursor.execute : ils sont redirigés vers le curseur instrumenté
+    def execute(self, sql: str, parametres: Any = ()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parametres)
+
+    def executemany(self, sql: str, parametres: Any) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, parametres)
@@ -0,0 +1,93 @@
+"""
+Désérialisation des lignes d'annonces
+Décodage JSON rapide (orjson si installé) et paresseux à la demande
+"""
+
+import json
+import sqlite3
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator
+
+try:  # Backend JSON optionnel, nettement plus rapide que json
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+
+charger_json: Callable[[Any], Any] = orjson.loads if orjson is not None else json.loads
+BACKEND_JSON = 'orjson' if orjson is not None else 'json'
+
+# Champs JSON d'une annonce et valeur retournée s'ils sont vides ou invalides
+CHAMPS_JSON = (
+    ('donnees_specifiques', {}),
+    ('photos', []),
+    ('videos', []),
+    ('medias', {}),
+)
+_DEFAUTS_JSON = dict(CHAMPS_JSON)
+
+
+def _decoder(champ: str, valeur: Any, charger: Callable[[Any], Any]) -> Any:
+    if valeur:
+        try:
+            return charger(valeur)
+        except (TypeError, ValueError):
+            return type(_DEFAUTS_JSON[champ])()
+    if champ == 'donnees_specifiques':
+        return valeur
+    return type(_DEFAUTS_JSON[champ])()
+
+
+def deserialiser_annonce(row: sqlite3.Row, charger: Callable[[Any], Any] = None) -> Dict[str, Any]:
+    """Convertir une ligne en dictionnaire en décodant immédiatement les champs JSON."""
+    charger = charger or charger_json
+    annonce = dict(row)
+    for champ, _ in CHAMPS_JSON:
+        if champ in annonce:
+            annonce[champ] = _decoder(champ, annonce[champ], charger)
+    return annonce
+
+
+class AnnonceParesseuse(MutableMapping):
+    """Annonce dont les champs JSON ne sont décodés qu'au premier accès.
+
+    Se manipule comme un dictionnaire ; ``vers_dict()`` retourne un vrai
+    ``dict`` (par exemple pour ``json.dumps``). ``charger`` est le décodeur
+    utilisé (celui de la Database, mesuré si elle est instrumentée).
+    """
+
+    __slots__ = ('_valeurs', '_a_decoder', '_charger')
+
+    def __init__(self, row: sqlite3.Row, charger: Callable[[Any], Any] = None):
+        self._valeurs = dict(row)
+        self._a_decoder = {champ for champ, _ in CHAMPS_JSON if champ in self._valeurs}
+        self._charger = charger or charger_json
+
+    def __getitem__(self, cle: str) -> Any:
+        if cle in self._a_decoder:
+            self._valeurs[cle] = _decoder(cle, self._valeurs[cle], self._charger)
+            self._a_decoder.discard(cle)
+        return self._valeurs[cle]
+
+    def __setitem__(self, cle: str, valeur: Any) -> None:
+        self._a_decoder.discard(cle)
+        self._valeurs[cle] = valeur
+
+    def __delitem__(self, cle: str) -> None:
+        self._a_decoder.discard(cle)
+        del self._valeurs[cle]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._valeurs)
+
+    def __len__(self) -> int:
+        return len(self._valeurs)
+
+    def __contains__(self, cle: object) -> bool:
+        return cle in self._valeurs
+
+    def vers_dict(self) -> Dict[str, Any]:
+        """Dictionnaire complet, champs JSON décodés."""
+        return {cle: self[cle] for cle in self._valeurs}
+
+    def __repr__(self) -> str:
+        return f"AnnonceParesseuse({self._valeurs!r})"
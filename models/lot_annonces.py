@@ -0,0 +1,201 @@
+"""
+Lot d'annonces en colonnes (un tableau par champ)
+Validation vectorisée des prix, années, kilométrages et énumérations
+"""
+
+from array import array
+from dataclasses import MISSING, fields
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+
+from models.annonce_models import (
+    ANNEE_MIN_VEHICULE, CARBURANTS, CATEGORIES, CHAMPS_BASE, CLASSES_PAR_CATEGORIE, STATUTS,
+    TRANSMISSIONS, TYPES_ANNONCE, AnnonceBase, annonce_depuis_dict,
+)
+from models.texte import normaliser_texte
+
+# Champs propres à chaque catégorie, dans l'ordre des modèles
+CHAMPS_SPECIFIQUES = {
+    categorie: tuple(champ.name for champ in fields(classe) if champ.name not in CHAMPS_BASE)
+    for categorie, classe in CLASSES_PAR_CATEGORIE.items()
+}
+
+# Valeur d'une colonne quand l'annonce ne la fournit pas, comme pour les modèles
+DEFAUTS_LOT = {
+    champ.name: champ.default
+    for classe in CLASSES_PAR_CATEGORIE.values() for champ in fields(classe)
+    if champ.default is not MISSING
+}
+
+# Colonnes numériques stockées en array('d') ; NaN marque une valeur absente
+COLONNES_NUMERIQUES = ('prix', 'annee', 'kilometrage')
+
+# Énumérations obligatoires (valeur exacte) et facultatives (comparées normalisées)
+ENUMERATIONS = {'categorie': CATEGORIES, 'type_annonce': TYPES_ANNONCE, 'statut': STATUTS}
+ENUMERATIONS_LIBRES = {'carburant': CARBURANTS, 'transmission': TRANSMISSIONS}
+
+_ABSENT = float('nan')
+
+
+def _depuis_colonne(nom: str, valeur: float) -> Any:
+    """Valeur d'une colonne numérique : None si absente, entier pour année et kilométrage."""
+    if valeur != valeur:
+        return None
+    if nom != 'prix' and valeur.is_integer():
+        return int(valeur)
+    return valeur
+
+
+def _indices(condition: Iterable[bool]) -> List[int]:
+    return [indice for indice, invalide in enumerate(condition) if invalide]
+
+
+class LotAnnonces:
+    """Annonces de toutes catégories rangées par colonnes.
+
+    Chaque champ des modèles présents devient une colonne (valeur par
+    défaut quand il ne s'applique pas à la catégorie) ; prix, année et
+    kilométrage sont des ``array('d')`` compacts. ``valider`` contrôle chaque règle colonne par
+    colonne, avec un test global (min, max, inclusion d'ensembles) avant de
+    chercher les lignes fautives.
+    """
+
+    def __init__(self, colonnes: Dict[str, Sequence[Any]]):
+        longueurs = {len(valeurs) for valeurs in colonnes.values()}
+        if len(longueurs) > 1:
+            raise ValueError("Toutes les colonnes d'un lot doivent avoir la même longueur")
+        self.colonnes = colonnes
+        self._taille = longueurs.pop() if longueurs else 0
+        self._non_numeriques: Dict[str, List[int]] = {}
+
+    @classmethod
+    def depuis_annonces(cls, annonces: Iterable[Union[AnnonceBase, Dict[str, Any]]]) -> "LotAnnonces":
+        """Construire un lot depuis des modèles ou des dictionnaires au format base."""
+        colonnes: Dict[str, Any] = {nom: [] for nom in CHAMPS_BASE}
+        colonnes['prix'] = array('d')
+        non_numeriques: Dict[str, List[int]] = {nom: [] for nom in COLONNES_NUMERIQUES}
+        ajouts = {nom: valeurs.append for nom, valeurs in colonnes.items()}
+        categories_vues = set()
+
+        for indice, annonce in enumerate(annonces):
+            if isinstance(annonce, AnnonceBase):
+                valeurs = dict(zip(CHAMPS_BASE, (getattr(annonce, nom) for nom in CHAMPS_BASE)))
+                valeurs.update(annonce.to_dict())
+            else:
+                valeurs = dict(annonce)
+                specifiques = valeurs.pop('donnees_specifiques', None) or {}
+                valeurs.update((cle, valeur) for cle, valeur in specifiques.items() if valeur is not None)
+
+            categorie = valeurs.get('categorie')
+            if categorie not in categories_vues:
+                # Colonnes propres créées à la première annonce de la catégorie
+                categories_vues.add(categorie)
+                for nom in CHAMPS_SPECIFIQUES.get(categorie, ()):
+                    if nom not in colonnes:
+                        colonnes[nom] = (array('d', [_ABSENT]) * indice if nom in COLONNES_NUMERIQUES
+                                         else [DEFAUTS_LOT.get(nom)] * indice)
+                        ajouts[nom] = colonnes[nom].append
+
+            for nom, ajouter in ajouts.items():
+                valeur = valeurs.get(nom)
+                if valeur is None:
+                    valeur = DEFAUTS_LOT.get(nom)
+                if nom in non_numeriques:
+                    if valeur is None:
+                        valeur = _ABSENT
+                    elif isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+                        non_numeriques[nom].append(indice)
+                        valeur = _ABSENT
+                ajouter(valeur)
+
+        lot = cls(colonnes)
+        lot._non_numeriques = {nom: indices for nom, indices in non_numeriques.items() if indices}
+        return lot
+
+    def __len__(self) -> int:
+        return self._taille
+
+    def valider(self) -> Dict[int, List[str]]:
+        """Erreurs par indice de ligne ; un dictionnaire vide si tout le lot est valide."""
+        erreurs: Dict[int, List[str]] = {}
+
+        def signaler(indices: Iterable[int], message: str) -> None:
+            for indice in indices:
+                erreurs.setdefault(indice, []).append(message)
+
+        colonnes = self.colonnes
+        if not (all(colonnes['titre']) and all(colonnes['description'])):
+            signaler(_indices(not titre or not description
+                              for titre, description in zip(colonnes['titre'], colonnes['description'])),
+                     "Le titre et la description sont obligatoires")
+
+        for nom, autorisees in ENUMERATIONS.items():
+            if not set(colonnes[nom]) <= set(autorisees):
+                signaler(_indices(valeur not in autorisees for valeur in colonnes[nom]), f"{nom} invalide")
+        for nom, autorisees in ENUMERATIONS_LIBRES.items():
+            valeurs = colonnes.get(nom, ())
+            distinctes = {valeur for valeur in set(valeurs) if valeur}
+            invalides = {valeur for valeur in distinctes
+                         if not isinstance(valeur, str) or normaliser_texte(valeur) not in autorisees}
+            if invalides:
+                signaler(_indices(valeur in invalides for valeur in valeurs), f"{nom} invalide")
+
+        for nom, indices in self._non_numeriques.items():
+            signaler(indices, f"{nom} non numérique")
+
+        # Prix obligatoire : une somme NaN révèle un prix absent
+        prix = colonnes['prix']
+        somme = sum(prix)
+        if somme != somme or (prix and min(prix) < 0):
+            signaler(_indices(not valeur >= 0 for valeur in prix), "Prix invalide")
+
+        annee_max = datetime.now().year + 1
+        annees = [valeur for valeur in colonnes.get('annee', ()) if valeur == valeur]
+        if annees and (min(annees) < ANNEE_MIN_VEHICULE or max(annees) > annee_max
+                       or any(valeur % 1 for valeur in annees)):
+            signaler(_indices(valeur == valeur and (not ANNEE_MIN_VEHICULE <= valeur <= annee_max or valeur % 1)
+                              for valeur in colonnes['annee']), "Année invalide")
+
+        kilometrages = colonnes.get('kilometrage', ())
+        if kilometrages and min((valeur for valeur in kilometrages if valeur == valeur), default=0) < 0:
+            signaler(_indices(valeur < 0 for valeur in kilometrages), "Kilométrage invalide")
+
+        return erreurs
+
+    def selectionner(self, indices: Sequence[int]) -> "LotAnnonces":
+        """Sous-lot des lignes ``indices`` (par exemple les lignes valides)."""
+        colonnes: Dict[str, Any] = {}
+        for nom, valeurs in self.colonnes.items():
+            extraites = [valeurs[indice] for indice in indices]
+            colonnes[nom] = array('d', extraites) if isinstance(valeurs, array) else extraites
+        lot = LotAnnonces(colonnes)
+        positions = {indice: position for position, indice in enumerate(indices)}
+        for nom, invalides in self._non_numeriques.items():
+            retenus = [positions[indice] for indice in invalides if indice in positions]
+            if retenus:
+                lot._non_numeriques[nom] = retenus
+        return lot
+
+    def valides(self) -> "LotAnnonces":
+        """Sous-lot des lignes sans erreur de validation."""
+        erreurs = self.valider()
+        return self.selectionner([indice for indice in range(self._taille) if indice not in erreurs])
+
+    def vers_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Lignes au format d'``ajouter_annonce`` (champs propres dans ``donnees_specifiques``)."""
+        colonnes = self.colonnes
+        for indice in range(self._taille):
+            donnees = {nom: colonnes[nom][indice] for nom in CHAMPS_BASE}
+            specifiques = {nom: colonnes[nom][indice]
+                           for nom in CHAMPS_SPECIFIQUES.get(donnees['categorie'], ())}
+            for valeurs in (donnees, specifiques):
+                for nom in COLONNES_NUMERIQUES:
+                    if nom in valeurs:
+                        valeurs[nom] = _depuis_colonne(nom, valeurs[nom])
+            donnees['donnees_specifiques'] = specifiques
+            yield donnees
+
+    def vers_modeles(self) -> Iterator[AnnonceBase]:
+        """Modèles de catégorie reconstruits ligne par ligne."""
+        for donnees in self.vers_dicts():
+            yield annonce_depuis_dict(donnees)
@@ -0,0 +1,289 @@
+"""
+Médias des annonces : stockage adressé par contenu et variantes d'images
+Miniatures WebP/JPEG produites dans un pool de processus, cache disque borné (LRU)
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+try:  # Dépendance optionnelle : sans Pillow, les médias sont stockés sans variantes
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+PILLOW_DISPONIBLE = Image is not None
+
+# (nom, côté maximal en pixels) des variantes produites pour chaque photo
+TAILLES_VARIANTES = (('miniature', 320), ('moyenne', 960))
+FORMATS_VARIANTES = ('webp', 'jpeg')
+QUALITE = {'webp': 80, 'jpeg': 82}
+
+# Variante référencée par les pages de liste (colonne annonces.miniature)
+VARIANTE_MINIATURE = 'miniature.webp'
+
+EXTENSIONS_IMAGES = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp'}
+
+Source = Union[bytes, str]
+
+
+def _ecrire_atomique(destination: str, ecrire) -> None:
+    """Écrire via un fichier temporaire renommé : un lecteur ne voit jamais de fichier partiel."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(destination), suffix='.tmp')
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            ecrire(fichier)
+        os.replace(temporaire, destination)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+
+
+def produire_variante(source: str, destination: str, cote: int, format_image: str) -> Dict[str, Any]:
+    """Redimensionner ``source`` (côté maximal ``cote``) vers ``destination``.
+
+    Exécutée dans un processus du pool : ne dépend que de ses arguments.
+    """
+    with Image.open(source) as originale:
+        image = ImageOps.exif_transpose(originale)
+        if format_image == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if format_image == 'jpeg' or 'A' not in image.getbands() else 'RGBA')
+        image.thumbnail((cote, cote))
+        options = ({'quality': QUALITE['jpeg'], 'optimize': True, 'progressive': True}
+                   if format_image == 'jpeg' else {'quality': QUALITE['webp'], 'method': 4})
+        _ecrire_atomique(destination, lambda fichier: image.save(fichier, format=format_image.upper(), **options))
+        largeur, hauteur = image.size
+    return {
+        'largeur': largeur,
+        'hauteur': hauteur,
+        'format': format_image,
+        'octets': os.path.getsize(destination),
+    }
+
+
+def decrire_variante(destination: str, format_image: str) -> Dict[str, Any]:
+    """Métadonnées d'une variante existante (lecture de l'en-tête seulement)."""
+    with Image.open(destination) as image:
+        largeur, hauteur = image.size
+    return {
+        'largeur': largeur,
+        'hauteur': hauteur,
+        'format': format_image,
+        'octets': os.path.getsize(destination),
+    }
+
+
+class DepotMedias:
+    """Fichiers des annonces rangés par empreinte SHA-256 sous ``racine``.
+
+    ``originaux/ab/abcd….jpg`` : un même fichier envoyé deux fois n'est
+    stocké qu'une fois. ``variantes/ab/abcd…_miniature.webp`` : variantes
+    redimensionnées, produites par un pool de ``travailleurs`` processus et
+    supprimées des moins récemment utilisées au-delà de ``quota_octets``
+    (``appliquer_quota``). Une variante supprimée est reproduite à la
+    demande par ``variante``.
+
+    Tailles et ordre d'utilisation des variantes sont tenus en mémoire :
+    le dossier n'est parcouru qu'une fois, l'ordre initial suit la date de
+    modification des fichiers. Les variantes écrites par un autre processus
+    n'y entrent qu'à leur première utilisation ici.
+    """
+
+    def __init__(self, racine: str = 'uploads', quota_octets: int = 512 * 1024 * 1024,
+                 travailleurs: Optional[int] = None):
+        self.racine = racine
+        self.quota_octets = quota_octets
+        self.travailleurs = travailleurs
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._verrou = threading.Lock()
+        # chemin -> octets, de la moins à la plus récemment utilisée
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._octets = 0
+        self._verrou_index = threading.Lock()
+
+    def _chemin(self, dossier: str, nom: str) -> str:
+        return os.path.join(self.racine, dossier, nom[:2], nom)
+
+    def enregistrer(self, source: Source, extension: str = '') -> Tuple[str, str]:
+        """Stocker un fichier (contenu ou chemin) ; retourne (chemin stocké, empreinte).
+
+        Si le même contenu est déjà présent, rien n'est écrit.
+        """
+        empreinte = hashlib.sha256()
+        if isinstance(source, (bytes, bytearray)):
+            empreinte.update(source)
+        else:
+            extension = extension or os.path.splitext(source)[1]
+            with open(source, 'rb') as fichier:
+                for bloc in iter(lambda: fichier.read(1 << 20), b''):
+                    empreinte.update(bloc)
+        hexa = empreinte.hexdigest()
+        chemin = self._chemin('originaux', hexa + extension.lower())
+        if not os.path.exists(chemin):
+            if isinstance(source, (bytes, bytearray)):
+                _ecrire_atomique(chemin, lambda fichier: fichier.write(source))
+            else:
+                with open(source, 'rb') as original:
+                    _ecrire_atomique(chemin, lambda fichier: shutil.copyfileobj(original, fichier))
+        return chemin, hexa
+
+    @staticmethod
+    def noms_variantes() -> set:
+        """Noms des variantes produites pour chaque photo ('miniature.webp', …)."""
+        return {f"{nom}.{format_image}" for nom, _ in TAILLES_VARIANTES for format_image in FORMATS_VARIANTES}
+
+    def chemin_variante(self, empreinte: str, nom: str) -> str:
+        """Emplacement de la variante ``nom`` (par exemple 'miniature.webp')."""
+        base, format_image = nom.rsplit('.', 1)
+        return self._chemin('variantes', f"{empreinte}_{base}.{format_image}")
+
+    def _pool_processus(self) -> ProcessPoolExecutor:
+        with self._verrou:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.travailleurs)
+            return self._pool
+
+    def _indexer(self) -> "OrderedDict[str, int]":
+        """Index des variantes, construit au premier appel (sous ``_verrou_index``)."""
+        if self._index is None:
+            fichiers = []
+            for dossier, _, noms in os.walk(os.path.join(self.racine, 'variantes')):
+                for nom in noms:
+                    chemin = os.path.join(dossier, nom)
+                    try:
+                        etat = os.stat(chemin)
+                    except FileNotFoundError:
+                        continue
+                    fichiers.append((etat.st_mtime, chemin, etat.st_size))
+            self._index = OrderedDict((chemin, taille) for _, chemin, taille in sorted(fichiers))
+            self._octets = sum(self._index.values())
+        return self._index
+
+    def _utiliser(self, chemin: str, octets: int) -> None:
+        """Enregistrer une variante écrite ou réutilisée comme la plus récemment utilisée."""
+        with self._verrou_index:
+            index = self._indexer()
+            self._octets += octets - index.get(chemin, 0)
+            index[chemin] = octets
+            index.move_to_end(chemin)
+
+    def marquer_utilisees(self, chemins: Iterable[str]) -> None:
+        """Signaler l'affichage de variantes : elles passent en fin de file d'éviction (sans accès disque)."""
+        with self._verrou_index:
+            index = self._indexer()
+            for chemin in chemins:
+                if chemin in index:
+                    index.move_to_end(chemin)
+
+    def generer_variantes(self, images: Iterable[Tuple[str, str]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Produire les variantes de ``(chemin, empreinte)`` en parallèle.
+
+        Retourne ``{chemin: {nom_variante: métadonnées}}``, les métadonnées
+        comprenant le chemin, les dimensions, le format et la taille de la
+        variante. Sans Pillow, retourne un dictionnaire vide. Une image
+        illisible est journalisée et n'a pas de variantes. Le quota n'est
+        pas appliqué ici : appeler ``appliquer_quota`` une fois les
+        nouvelles variantes référencées.
+        """
+        if not PILLOW_DISPONIBLE:
+            logger.warning("Pillow n'est pas installé : aucune variante d'image produite")
+            return {}
+        pool = self._pool_processus()
+        travaux = []
+        for chemin, empreinte in images:
+            extension = os.path.splitext(chemin)[1].lower()
+            if extension and extension not in EXTENSIONS_IMAGES:
+                continue
+            for nom_taille, cote in TAILLES_VARIANTES:
+                for format_image in FORMATS_VARIANTES:
+                    nom = f"{nom_taille}.{format_image}"
+                    destination = self.chemin_variante(empreinte, nom)
+                    if os.path.exists(destination):
+                        # Même contenu déjà traité : la variante est réutilisée telle quelle
+                        os.utime(destination)
+                        travail = pool.submit(decrire_variante, destination, format_image)
+                    else:
+                        travail = pool.submit(produire_variante, chemin, destination, cote, format_image)
+                    travaux.append((chemin, nom, destination, travail))
+
+        resultats: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for chemin, nom, destination, futur in travaux:
+            try:
+                metadonnees = futur.result()
+            except Exception:
+                logger.exception("Variante %s impossible pour %s", nom, chemin)
+                continue
+            resultats.setdefault(chemin, {})[nom] = {'chemin': destination, **metadonnees}
+            self._utiliser(destination, metadonnees['octets'])
+        return resultats
+
+    def variante(self, chemin: str, empreinte: str, nom: str) -> Optional[str]:
+        """Chemin d'une variante, reproduite si elle a été évincée ; None sans Pillow."""
+        destination = self.chemin_variante(empreinte, nom)
+        with self._verrou_index:
+            index = self._indexer()
+            if destination in index:
+                index.move_to_end(destination)
+                return destination
+        if os.path.exists(destination):
+            self._utiliser(destination, os.path.getsize(destination))
+            return destination
+        if not PILLOW_DISPONIBLE:
+            return None
+        base, format_image = nom.rsplit('.', 1)
+        cote = dict(TAILLES_VARIANTES)[base]
+        metadonnees = self._pool_processus().submit(
+            produire_variante, chemin, destination, cote, format_image).result()
+        self._utiliser(destination, metadonnees['octets'])
+        return destination
+
+    def appliquer_quota(self, epinglee: Optional[Callable[[str], bool]] = None) -> int:
+        """Supprimer les variantes les moins récemment utilisées au-delà du quota ; retourne les octets libérés.
+
+        Une variante pour laquelle ``epinglee(chemin)`` est vrai (miniature
+        encore affichée par les listes, par exemple) est conservée et
+        repasse en fin de file.
+        """
+        liberes = 0
+        with self._verrou_index:
+            index = self._indexer()
+            a_examiner = len(index)
+            while self._octets > self.quota_octets and a_examiner:
+                a_examiner -= 1
+                chemin, taille = next(iter(index.items()))
+                if epinglee is not None and epinglee(chemin):
+                    index.move_to_end(chemin)
+                    continue
+                del index[chemin]
+                self._octets -= taille
+                try:
+                    os.remove(chemin)
+                except FileNotFoundError:
+                    continue
+                liberes += taille
+        return liberes
+
+    def fermer(self) -> None:
+        """Arrêter le pool de processus."""
+        with self._verrou:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def miniature_principale(photos: List[str], medias: Dict[str, Any]) -> Optional[str]:
+    """Miniature de la première photo si elle a été produite."""
+    if not photos:
+        return None
+    variante = (medias.get(photos[0]) or {}).get('variantes', {}).get(VARIANTE_MINIATURE)
+    return variante['chemin'] if variante else None
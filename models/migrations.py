@@ -0,0 +1,282 @@
+"""
+Migrations du schéma SQLite
+Versionnées par PRAGMA user_version et appliquées au démarrage
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from models import doublons, facettes
+from models.texte import normaliser_texte
+
+
+def _index_annonces_publiees(conn: sqlite3.Connection) -> None:
+    """Index composites/partiels pour le catalogue publié et ville normalisée."""
+    colonnes = {row[1] for row in conn.execute("PRAGMA table_info(annonces)")}
+    if 'ville_normalisee' not in colonnes:
+        conn.execute("ALTER TABLE annonces ADD COLUMN ville_normalisee TEXT")
+    conn.create_function('normaliser_texte', 1, normaliser_texte, deterministic=True)
+    conn.execute("UPDATE annonces SET ville_normalisee = normaliser_texte(ville)")
+
+    # Remplacés par idx_annonces_statut_date et la ville normalisée
+    conn.execute("DROP INDEX IF EXISTS idx_annonces_statut")
+    conn.execute("DROP INDEX IF EXISTS idx_annonces_ville")
+
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_categorie_date
+                    ON annonces (categorie, date_creation DESC, id DESC) WHERE statut = 'publie'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_categorie_type_date
+                    ON annonces (categorie, type_annonce, date_creation DESC, id DESC)
+                    WHERE statut = 'publie'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_type_date
+                    ON annonces (type_annonce, date_creation DESC, id DESC) WHERE statut = 'publie'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_categorie_prix
+                    ON annonces (categorie, prix) WHERE statut = 'publie'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_ville_date
+                    ON annonces (ville_normalisee, date_creation DESC, id DESC) WHERE statut = 'publie'""")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_annonces_ville_normalisee ON annonces (ville_normalisee)')
+
+
+def _recherche_plein_texte(conn: sqlite3.Connection) -> None:
+    """Index FTS5 sur titre/description, synchronisé par triggers.
+
+    Le tokenizer unicode61 avec remove_diacritics 2 ignore casse et accents
+    (« lambarene » trouve « Lambaréné »).
+    """
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS annonces_fts USING fts5(
+            titre, description,
+            content='annonces', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS annonces_fts_ai AFTER INSERT ON annonces BEGIN
+            INSERT INTO annonces_fts (rowid, titre, description)
+            VALUES (new.id, new.titre, new.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS annonces_fts_ad AFTER DELETE ON annonces BEGIN
+            INSERT INTO annonces_fts (annonces_fts, rowid, titre, description)
+            VALUES ('delete', old.id, old.titre, old.description);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS annonces_fts_au AFTER UPDATE OF titre, description ON annonces BEGIN
+            INSERT INTO annonces_fts (annonces_fts, rowid, titre, description)
+            VALUES ('delete', old.id, old.titre, old.description);
+            INSERT INTO annonces_fts (rowid, titre, description)
+            VALUES (new.id, new.titre, new.description);
+        END
+    """)
+    conn.execute("INSERT INTO annonces_fts (annonces_fts) VALUES ('rebuild')")
+
+
+# Attributs de donnees_specifiques exposés en colonnes générées (virtuelles)
+COLONNES_SPECIFIQUES = {
+    # immobilier
+    'type_bien': 'TEXT',
+    'surface': 'REAL',
+    'nombre_chambres': 'INTEGER',
+    # véhicules (marque est partagée avec l'informatique)
+    'marque': 'TEXT',
+    'annee': 'INTEGER',
+    'kilometrage': 'INTEGER',
+    'carburant': 'TEXT',
+    'transmission': 'TEXT',
+    # informatique
+    'type_materiel': 'TEXT',
+    'memoire_ram': 'INTEGER',
+    'stockage': 'INTEGER',
+}
+
+
+def _colonnes_specifiques(conn: sqlite3.Connection) -> None:
+    """Colonnes générées indexables pour les attributs filtrés de donnees_specifiques."""
+    existantes = {row[1] for row in conn.execute("PRAGMA table_xinfo(annonces)")}
+    for colonne, type_sql in COLONNES_SPECIFIQUES.items():
+        if colonne in existantes:
+            continue
+        # json_valid protège des anciennes valeurs qui ne seraient pas du JSON
+        conn.execute(f"""
+            ALTER TABLE annonces ADD COLUMN {colonne} {type_sql}
+            GENERATED ALWAYS AS (
+                CASE WHEN json_valid(donnees_specifiques)
+                     THEN json_extract(donnees_specifiques, '$.{colonne}') END
+            ) VIRTUAL
+        """)
+
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_immobilier
+                    ON annonces (type_bien COLLATE NOCASE, nombre_chambres, prix)
+                    WHERE statut = 'publie' AND categorie = 'immobilier'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_vehicules
+                    ON annonces (marque COLLATE NOCASE, annee, kilometrage)
+                    WHERE statut = 'publie' AND categorie = 'vehicules'""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_publie_informatique
+                    ON annonces (type_materiel COLLATE NOCASE, memoire_ram, prix)
+                    WHERE statut = 'publie' AND categorie = 'informatique'""")
+
+
+def _agregats_analytics(conn: sqlite3.Connection) -> None:
+    """Tables d'agrégats horaires/journaliers des événements et leur marque de progression.
+
+    ``source_utm`` vaut '' quand l'événement n'a pas de source, pour rester
+    dans la clé primaire.
+    """
+    for table, periode in (('analytics_horaire', 'heure'), ('analytics_journalier', 'jour')):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {periode} TEXT NOT NULL,
+                annonce_id INTEGER NOT NULL,
+                type_evenement TEXT NOT NULL,
+                source_utm TEXT NOT NULL DEFAULT '',
+                total INTEGER NOT NULL,
+                PRIMARY KEY ({periode}, annonce_id, type_evenement, source_utm)
+            ) WITHOUT ROWID
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_horaire_annonce "
+                 "ON analytics_horaire (annonce_id, heure)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_journalier_annonce "
+                 "ON analytics_journalier (annonce_id, jour)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_etat (
+            cle TEXT PRIMARY KEY,
+            valeur INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO analytics_etat (cle, valeur) VALUES ('dernier_id_agrege', 0)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON analytics (timestamp)")
+
+
+def _index_expiration(conn: sqlite3.Connection) -> None:
+    """Index des échéances, pour que l'expiration ne parcoure que les annonces échues."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annonces_statut_expiration "
+                 "ON annonces (statut, date_expiration)")
+
+
+def _colonnes_medias(conn: sqlite3.Connection) -> None:
+    """Métadonnées des médias (JSON) et miniature de la première photo pour les listes."""
+    colonnes = {row[1] for row in conn.execute("PRAGMA table_info(annonces)")}
+    if 'medias' not in colonnes:
+        conn.execute("ALTER TABLE annonces ADD COLUMN medias TEXT")
+    if 'miniature' not in colonnes:
+        conn.execute("ALTER TABLE annonces ADD COLUMN miniature TEXT")
+
+
+def _signatures_doublons(conn: sqlite3.Connection) -> None:
+    """Empreintes MinHash des annonces et leurs bandes LSH, remplies pour les annonces existantes.
+
+    Insertions, modifications et archivage tiennent les deux tables à jour
+    (models.doublons) ; le trigger retire l'empreinte d'une annonce
+    supprimée autrement, ses bandes orphelines étant ignorées à la lecture.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS annonces_signatures (
+            annonce_id INTEGER PRIMARY KEY,
+            minhash BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS annonces_bandes (
+            bande INTEGER NOT NULL,
+            valeur INTEGER NOT NULL,
+            annonce_id INTEGER NOT NULL,
+            PRIMARY KEY (bande, valeur, annonce_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS annonces_signatures_ad AFTER DELETE ON annonces BEGIN
+            DELETE FROM annonces_signatures WHERE annonce_id = old.id;
+        END
+    """)
+
+    colonnes = ', '.join(doublons.COLONNES_SIGNATURE)
+    curseur = conn.execute(f"SELECT {colonnes} FROM annonces ORDER BY id")
+    while True:
+        lignes = curseur.fetchmany(1000)
+        if not lignes:
+            break
+        doublons.indexer(conn, doublons.signer_lignes([tuple(ligne) for ligne in lignes]), remplacer=False)
+
+
+def _facettes_annonces(conn: sqlite3.Connection) -> None:
+    """Comptes par facette du catalogue, tenus à jour par triggers (models.facettes)."""
+    facettes.creer_schema(conn)
+    facettes.reconstruire(conn)
+
+
+def _objets_suspendus(conn: sqlite3.Connection) -> None:
+    """Définitions des index et triggers supprimés le temps d'un import différé.
+
+    Database les recrée au démarrage si un import s'est interrompu avant
+    de les rétablir.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS objets_suspendus (
+            nom TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            sql TEXT NOT NULL,
+            depuis_id INTEGER NOT NULL
+        )
+    """)
+
+
+def _date_modification_utc(conn: sqlite3.Connection) -> None:
+    """Convertir en UTC les date_modification écrites en heure locale ISO (séparateur 'T').
+
+    Les écritures suivent désormais CURRENT_TIMESTAMP ; les anciennes valeurs
+    sont supposées dans le fuseau de la machine qui applique la migration.
+    """
+    conn.execute("""
+        UPDATE annonces SET date_modification = datetime(date_modification, 'utc')
+        WHERE date_modification LIKE '%T%' AND datetime(date_modification, 'utc') IS NOT NULL
+    """)
+
+
+def _index_miniature(conn: sqlite3.Connection) -> None:
+    """Retrouver sans parcours les annonces qui affichent une miniature (quota des médias)."""
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_annonces_miniature
+                    ON annonces (miniature) WHERE miniature IS NOT NULL""")
+
+
+def _journal_facettes(conn: sqlite3.Connection) -> None:
+    """Annonces modifiées, relues par les bitmaps de facettes de chaque processus (models.facettes)."""
+    facettes.creer_journal(conn)
+
+
+# (version, description, fonction) dans l'ordre d'application
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "index du catalogue publié et ville normalisée", _index_annonces_publiees),
+    (2, "recherche plein texte FTS5 sur titre et description", _recherche_plein_texte),
+    (3, "colonnes générées pour les attributs spécifiques", _colonnes_specifiques),
+    (4, "agrégats horaires et journaliers des analytics", _agregats_analytics),
+    (5, "index des dates d'expiration", _index_expiration),
+    (6, "métadonnées des médias et miniature", _colonnes_medias),
+    (7, "empreintes de détection des doublons", _signatures_doublons),
+    (8, "comptes par facette du catalogue", _facettes_annonces),
+    (9, "index et triggers suspendus pendant un import différé", _objets_suspendus),
+    (10, "date_modification en UTC", _date_modification_utc),
+    (11, "index des miniatures affichées", _index_miniature),
+    (12, "journal des annonces modifiées pour les bitmaps de facettes", _journal_facettes),
+]
+
+
+def appliquer_migrations(conn: sqlite3.Connection) -> int:
+    """Appliquer les migrations manquantes, chacune dans sa transaction.
+
+    Retourne la version du schéma après migration.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for numero, _, migration in MIGRATIONS:
+        if numero <= version:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        version = numero
+    return version
@@ -0,0 +1,317 @@
+"""
+Stockage froid : partitions mensuelles des analytics et archive des annonces
+Garde la base principale petite ; les partitions sont attachées (ATTACH) à la demande
+
+Maintenance : python -m models.stockage [chemin_base] [--mois-conservation 24] [--jours-archivage 30]
+"""
+
+import glob
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models import doublons
+from models.agregats import lire_marque
+
+# Nombre de bases attachées à la fois (SQLite en autorise 10 par défaut)
+LIMITE_ATTACH = 8
+
+COLONNES_ANALYTICS = (
+    'id', 'annonce_id', 'type_evenement', 'source_utm', 'ip_address',
+    'user_agent', 'timestamp', 'donnees_supplementaires',
+)
+_LISTE_ANALYTICS = ', '.join(COLONNES_ANALYTICS)
+
+# Statuts dont les annonces partent dans l'archive froide
+STATUTS_ARCHIVES = ('expire', 'archive')
+
+_MOTIF_PARTITION = re.compile(r'analytics_(\d{4})_(\d{2})\.db$')
+
+
+def _debut_mois(mois: str) -> str:
+    return f"{mois}-01 00:00:00"
+
+
+def _mois_suivant(mois: str) -> str:
+    annee, numero = map(int, mois.split('-'))
+    annee, numero = (annee + 1, 1) if numero == 12 else (annee, numero + 1)
+    return f"{annee:04d}-{numero:02d}"
+
+
+class StockageFroid:
+    """Partitions mensuelles ``analytics_AAAA_MM.db`` et archive ``annonces_archive.db``.
+
+    Les événements sont toujours écrits dans la table ``analytics`` de la
+    base principale ; ``pivoter_analytics`` déplace ensuite les mois
+    révolus, déjà agrégés, dans leur partition. Les partitions gardent les
+    id d'origine : un déplacement interrompu puis rejoué ne duplique rien.
+    """
+
+    def __init__(self, db_path: str, dossier: Optional[str] = None):
+        self.db_path = db_path
+        self.dossier = dossier or os.path.splitext(os.path.abspath(db_path))[0] + '_archives'
+
+    def chemin_partition(self, mois: str) -> str:
+        """Fichier de la partition du mois ``AAAA-MM``."""
+        return os.path.join(self.dossier, f"analytics_{mois.replace('-', '_')}.db")
+
+    @property
+    def chemin_archive(self) -> str:
+        return os.path.join(self.dossier, 'annonces_archive.db')
+
+    def partitions(self) -> List[str]:
+        """Mois (``AAAA-MM``) disposant d'une partition, du plus ancien au plus récent."""
+        mois = []
+        for chemin in glob.glob(os.path.join(self.dossier, 'analytics_*.db')):
+            correspondance = _MOTIF_PARTITION.search(chemin)
+            if correspondance:
+                mois.append(f"{correspondance.group(1)}-{correspondance.group(2)}")
+        return sorted(mois)
+
+    def _connecter(self) -> sqlite3.Connection:
+        """Connexion de maintenance en mode autocommit (transactions explicites)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _attacher(self, conn: sqlite3.Connection, chemins: Dict[str, str]) -> Iterator[None]:
+        """Attacher ``{schema: fichier}`` le temps d'un bloc (hors transaction)."""
+        attaches = []
+        try:
+            for schema, chemin in chemins.items():
+                conn.execute("ATTACH DATABASE ? AS " + schema, (chemin,))
+                attaches.append(schema)
+            yield
+        finally:
+            for schema in reversed(attaches):
+                conn.execute("DETACH DATABASE " + schema)
+
+    def pivoter_analytics(self, taille_lot: int = 10_000) -> Dict[str, int]:
+        """Déplacer les événements des mois révolus dans leurs partitions.
+
+        Seuls les événements déjà agrégés (id sous la marque du compacteur)
+        quittent la base principale, par tranches de ``taille_lot`` id
+        consécutifs : une transaction courte par tranche, pour que les
+        écritures concurrentes n'attendent pas la fin d'un mois entier.
+        Retourne le nombre déplacé par mois.
+        """
+        os.makedirs(self.dossier, exist_ok=True)
+        mois_courant = datetime.now(timezone.utc).strftime('%Y-%m')
+        deplaces: Dict[str, int] = {}
+        conn = self._connecter()
+        try:
+            mois_a_pivoter = [row[0] for row in conn.execute(
+                "SELECT DISTINCT strftime('%Y-%m', timestamp) FROM analytics WHERE timestamp < ?",
+                (_debut_mois(mois_courant),),
+            ) if row[0]]
+            # La marque ne fait qu'avancer : les id en dessous restent agrégés
+            marque = lire_marque(conn)
+            for mois in mois_a_pivoter:
+                with self._attacher(conn, {'partition_mois': self.chemin_partition(mois)}):
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS partition_mois.analytics (
+                            id INTEGER PRIMARY KEY, annonce_id INTEGER, type_evenement TEXT NOT NULL,
+                            source_utm TEXT, ip_address TEXT, user_agent TEXT,
+                            timestamp TIMESTAMP, donnees_supplementaires TEXT
+                        )
+                    """)
+                    conn.execute("CREATE INDEX IF NOT EXISTS partition_mois.idx_analytics_timestamp "
+                                 "ON analytics (timestamp)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS partition_mois.idx_analytics_annonce "
+                                 "ON analytics (annonce_id, timestamp)")
+                    deplaces[mois] = 0
+                    debut = 0
+                    while True:
+                        total, debut = self._deplacer_tranche(conn, mois, debut, marque, taille_lot)
+                        if debut is None:
+                            break
+                        deplaces[mois] += total
+        finally:
+            conn.close()
+        return deplaces
+
+    def _deplacer_tranche(self, conn: sqlite3.Connection, mois: str, debut: int, marque: int,
+                          taille_lot: int) -> Tuple[int, Optional[int]]:
+        """Déplacer les événements du mois d'id dans ]``debut``, ``debut`` + ``taille_lot``] au plus.
+
+        Retourne le nombre déplacé et le dernier id examiné (None s'il ne
+        reste rien à déplacer).
+        """
+        bornes = (_debut_mois(mois), _debut_mois(_mois_suivant(mois)))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fin = conn.execute("""
+                SELECT MAX(id) FROM (
+                    SELECT id FROM main.analytics WHERE id > ? AND id <= ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY id LIMIT ?
+                )
+            """, (debut, marque, *bornes, taille_lot)).fetchone()[0]
+            total = 0
+            if fin is not None:
+                condition = "id > ? AND id <= ? AND timestamp >= ? AND timestamp < ?"
+                parametres = (debut, fin, *bornes)
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO partition_mois.analytics ({_LISTE_ANALYTICS})
+                    SELECT {_LISTE_ANALYTICS} FROM main.analytics WHERE {condition}
+                """, parametres)
+                total = conn.execute(f"DELETE FROM main.analytics WHERE {condition}", parametres).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return total, fin
+
+    def archiver_annonces(self, jours: int = 30) -> List[int]:
+        """Déplacer dans l'archive les annonces expirées/archivées non modifiées depuis ``jours`` jours.
+
+        Retourne les id déplacés. Les événements et agrégats analytics de
+        ces annonces restent en place.
+        """
+        os.makedirs(self.dossier, exist_ok=True)
+        conn = self._connecter()
+        try:
+            # table_info omet les colonnes générées, recalculées par la base principale
+            colonnes = [(row['name'], row['type']) for row in conn.execute("PRAGMA main.table_info(annonces)")]
+            liste = ', '.join(nom for nom, _ in colonnes)
+            statuts = ', '.join(f"'{statut}'" for statut in STATUTS_ARCHIVES)
+            # datetime() ramène les variantes ISO (séparateur 'T', fractions) au format de la limite
+            condition = f"statut IN ({statuts}) AND datetime(date_modification) < ?"
+            with self._attacher(conn, {'archive': self.chemin_archive}):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    definitions = ', '.join(
+                        f"{nom} {type_sql}" + (" PRIMARY KEY" if nom == 'id' else '')
+                        for nom, type_sql in colonnes
+                    )
+                    conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS archive.annonces (
+                            {definitions}, date_archivage TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                    """)
+                    # Archive créée avant une migration : colonnes ajoutées depuis
+                    existantes = {row['name'] for row in conn.execute("PRAGMA archive.table_info(annonces)")}
+                    for nom, type_sql in colonnes:
+                        if nom not in existantes:
+                            conn.execute(f"ALTER TABLE archive.annonces ADD COLUMN {nom} {type_sql}")
+                    # Limite calculée une fois : copie et suppression portent sur les mêmes lignes
+                    parametre = (conn.execute("SELECT datetime('now', ?)", (f'-{int(jours)} days',)).fetchone()[0],)
+                    ids = [row[0] for row in conn.execute(
+                        f"SELECT id FROM main.annonces WHERE {condition}", parametre
+                    )]
+                    if ids:
+                        conn.execute(f"""
+                            INSERT OR REPLACE INTO archive.annonces ({liste})
+                            SELECT {liste} FROM main.annonces WHERE {condition}
+                        """, parametre)
+                        doublons.oublier(conn, ids)
+                        conn.execute(f"DELETE FROM main.annonces WHERE {condition}", parametre)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+        return ids
+
+    def lire_annonce_archivee(self, annonce_id: int) -> Optional[sqlite3.Row]:
+        if not os.path.exists(self.chemin_archive):
+            return None
+        conn = sqlite3.connect(self.chemin_archive)
+        conn.row_factory = sqlite3.Row
+        try:
+            return conn.execute("SELECT * FROM annonces WHERE id = ?", (annonce_id,)).fetchone()
+        except sqlite3.OperationalError:  # archive encore vide
+            return None
+        finally:
+            conn.close()
+
+    def lire_evenements(self, conn: sqlite3.Connection, debut: str, fin: str,
+                        conditions: Sequence[str] = (), params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Événements d'horodatage dans [``debut``, ``fin``[, partitions comprises.
+
+        Seules les partitions des mois couverts sont attachées, par groupes
+        de ``LIMITE_ATTACH`` unis par ``UNION ALL`` avec la table principale.
+        ``conn`` ne doit pas avoir de transaction ouverte.
+        """
+        mois = [m for m in self.partitions() if _debut_mois(_mois_suivant(m)) > debut and _debut_mois(m) < fin]
+        groupes = [mois[i:i + LIMITE_ATTACH] for i in range(0, len(mois), LIMITE_ATTACH)] or [[]]
+        filtre = " AND ".join(["timestamp >= ?", "timestamp < ?", *conditions])
+        evenements: List[Dict[str, Any]] = []
+        for position, groupe in enumerate(groupes):
+            schemas = {f"p{indice}": self.chemin_partition(m) for indice, m in enumerate(groupe)}
+            sources = [f"{schema}.analytics" for schema in schemas]
+            if position == len(groupes) - 1:
+                sources.append("main.analytics")
+            requete = " UNION ALL ".join(
+                f"SELECT {_LISTE_ANALYTICS} FROM {source} WHERE {filtre}" for source in sources
+            ) + " ORDER BY timestamp, id"
+            with self._attacher(conn, schemas):
+                rows = conn.execute(requete, [debut, fin, *params] * len(sources)).fetchall()
+            evenements.extend(dict(row) for row in rows)
+        return evenements
+
+    def supprimer_partitions(self, mois_conservation: int) -> List[str]:
+        """Supprimer les partitions de plus de ``mois_conservation`` mois."""
+        maintenant = datetime.now(timezone.utc)
+        total = maintenant.year * 12 + maintenant.month - 1 - mois_conservation
+        limite = f"{total // 12:04d}-{total % 12 + 1:02d}"
+        supprimees = [m for m in self.partitions() if m < limite]
+        for m in supprimees:
+            os.remove(self.chemin_partition(m))
+        return supprimees
+
+    def vacuum(self, chemins: Sequence[str]) -> None:
+        """Compacter des fichiers de partition ou d'archive (connexion dédiée par fichier)."""
+        for chemin in chemins:
+            if os.path.exists(chemin):
+                conn = sqlite3.connect(chemin, isolation_level=None)
+                try:
+                    conn.execute("VACUUM")
+                finally:
+                    conn.close()
+
+    def maintenir(self, mois_conservation: Optional[int] = None, jours_archivage: int = 30,
+                  vacuum: bool = True) -> Dict[str, Any]:
+        """Rotation complète : pivoter, archiver, purger les vieilles partitions, compacter."""
+        deplaces = self.pivoter_analytics()
+        archivees = self.archiver_annonces(jours_archivage)
+        supprimees = self.supprimer_partitions(mois_conservation) if mois_conservation is not None else []
+        if vacuum:
+            modifies = [self.chemin_partition(m) for m in deplaces if m not in supprimees]
+            self.vacuum(modifies + ([self.chemin_archive] if archivees else []))
+        return {
+            'evenements_deplaces': deplaces,
+            'annonces_archivees': archivees,
+            'partitions_supprimees': supprimees,
+        }
+
+
+def main():
+    import argparse
+
+    from models.database import Database
+
+    parser = argparse.ArgumentParser(description="Rotation et compactage du stockage froid")
+    parser.add_argument('db_path', nargs='?', default="data/immo_gabon.db")
+    parser.add_argument('--mois-conservation', type=int, default=None,
+                        help="supprimer les partitions analytics plus anciennes")
+    parser.add_argument('--jours-archivage', type=int, default=30)
+    parser.add_argument('--sans-vacuum', action='store_true')
+    args = parser.parse_args()
+
+    with Database(args.db_path) as db:
+        bilan = db.maintenir_stockage(args.mois_conservation, args.jours_archivage,
+                                      vacuum=not args.sans_vacuum)
+    for mois, total in sorted(bilan['evenements_deplaces'].items()):
+        print(f"analytics {mois} : {total} événements déplacés")
+    print(f"{len(bilan['annonces_archivees'])} annonces archivées")
+    for mois in bilan['partitions_supprimees']:
+        print(f"partition {mois} supprimée")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Tâches de fond périodiques
+Utilisées pour les vidages de tampons et la maintenance planifiée
+"""
+
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TachePeriodique:
+    """Exécuter ``fonction`` toutes les ``intervalle`` secondes dans un thread démon."""
+
+    def __init__(self, fonction: Callable[[], None], intervalle: float, nom: str = 'tache-periodique'):
+        if intervalle <= 0:
+            raise ValueError("L'intervalle doit être strictement positif")
+        self.fonction = fonction
+        self.intervalle = intervalle
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name=nom, daemon=True)
+        self._thread.start()
+
+    def _boucle(self) -> None:
+        while not self._arret.wait(self.intervalle):
+            try:
+                self.fonction()
+            except Exception:
+                logger.exception("Échec de la tâche périodique %s", self._thread.name)
+
+    def arreter(self) -> None:
+        """Arrêter la tâche (l'exécution en cours se termine)."""
+        self._arret.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
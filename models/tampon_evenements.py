@@ -0,0 +1,128 @@
+"""
+Tampon d'ingestion des événements analytics
+Regroupe les insertions dans `analytics` et les compteurs de `annonces`
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.taches import TachePeriodique
+
+# Événements qui incrémentent un compteur de la table annonces
+COMPTEURS_PAR_EVENEMENT = {
+    'clic_contact': 'clics_contact',
+    'partage': 'partages',
+}
+
+DURABILITES = ('fenetre', 'sortie')
+
+
+@dataclass
+class ConfigTampon:
+    """Paramètres du tampon d'événements.
+
+    ``durabilite='fenetre'`` vide le tampon au moins toutes les ``delai_ms``
+    millisecondes : en cas d'arrêt brutal on perd au plus cette fenêtre.
+    ``durabilite='sortie'`` ne vide qu'au seuil ``taille_max`` et à l'arrêt
+    du processus, pour un débit maximal.
+    """
+    taille_max: int = 500
+    delai_ms: int = 1000
+    durabilite: str = 'fenetre'
+
+    def __post_init__(self):
+        if self.durabilite not in DURABILITES:
+            raise ValueError(f"Durabilité inconnue : {self.durabilite}")
+        if self.taille_max < 1 or self.delai_ms <= 0:
+            raise ValueError("taille_max et delai_ms doivent être strictement positifs")
+
+
+class TamponEvenements:
+    """Collecter les événements en mémoire et les écrire par lots.
+
+    Chaque vidage insère tous les événements avec ``executemany`` et ne fait
+    qu'un UPDATE par annonce pour les compteurs, le tout dans une seule
+    transaction passée à ``ecrire``. Avec ``compteurs_externes=True`` les
+    compteurs sont laissés à l'appelant (voir CompteursAccumules).
+    ``apres_vidage(ids)`` reçoit les annonces dont les compteurs ont changé.
+    """
+
+    def __init__(self, ecrire: Callable[[Callable[[sqlite3.Connection], Any]], Any],
+                 config: Optional[ConfigTampon] = None, compteurs_externes: bool = False,
+                 apres_vidage: Optional[Callable[[List[int]], None]] = None):
+        self.config = config or ConfigTampon()
+        self._ecrire = ecrire
+        self._compteurs_externes = compteurs_externes
+        self._apres_vidage = apres_vidage
+        self._evenements: List[Tuple] = []
+        self._verrou = threading.Lock()
+        self._tache = None
+        if self.config.durabilite == 'fenetre':
+            self._tache = TachePeriodique(
+                self.vider, self.config.delai_ms / 1000, nom='tampon-evenements'
+            )
+
+    def ajouter(self, annonce_id: int, type_evenement: str, source_utm: Optional[str] = None,
+                ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+                donnees_json: Optional[str] = None) -> None:
+        """Mettre un événement en tampon (horodaté maintenant, en UTC comme CURRENT_TIMESTAMP)."""
+        horodatage = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        evenement = (annonce_id, type_evenement, source_utm, ip_address,
+                     user_agent, horodatage, donnees_json)
+        with self._verrou:
+            self._evenements.append(evenement)
+            plein = len(self._evenements) >= self.config.taille_max
+        if plein:
+            self.vider()
+
+    def __len__(self) -> int:
+        return len(self._evenements)
+
+    def vider(self) -> int:
+        """Écrire les événements en attente ; retourne le nombre écrit."""
+        with self._verrou:
+            evenements, self._evenements = self._evenements, []
+        if not evenements:
+            return 0
+
+        deltas: Dict[int, Dict[str, int]] = defaultdict(lambda: {'clics_contact': 0, 'partages': 0})
+        if not self._compteurs_externes:
+            for evenement in evenements:
+                colonne = COMPTEURS_PAR_EVENEMENT.get(evenement[1])
+                if colonne:
+                    deltas[evenement[0]][colonne] += 1
+
+        def operation(conn: sqlite3.Connection) -> None:
+            conn.executemany('''
+                INSERT INTO analytics (annonce_id, type_evenement, source_utm, ip_address,
+                                       user_agent, timestamp, donnees_supplementaires)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', evenements)
+            if deltas:
+                conn.executemany(
+                    "UPDATE annonces SET clics_contact = clics_contact + ?, "
+                    "partages = partages + ? WHERE id = ?",
+                    [(d['clics_contact'], d['partages'], annonce_id) for annonce_id, d in deltas.items()],
+                )
+
+        try:
+            self._ecrire(operation)
+        except Exception:
+            # Remettre les événements en tête pour le prochain vidage
+            with self._verrou:
+                self._evenements[:0] = evenements
+            raise
+        if deltas and self._apres_vidage is not None:
+            self._apres_vidage(list(deltas))
+        return len(evenements)
+
+    def fermer(self) -> None:
+        """Arrêter le vidage périodique et écrire le reliquat."""
+        if self._tache is not None:
+            self._tache.arreter()
+            self._tache = None
+        self.vider()
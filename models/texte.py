@@ -0,0 +1,36 @@
+"""
+Normalisation de texte pour la recherche
+Insensible à la casse et aux accents (« Lambaréné » == « lambarene »)
+"""
+
+import re
+import unicodedata
+from typing import Optional
+
+
+def normaliser_texte(texte: Optional[str]) -> Optional[str]:
+    """Minuscules sans accents ni espaces superflus ; None reste None."""
+    if texte is None:
+        return None
+    if texte.isascii():  # ni accents ni formes de compatibilité à décomposer
+        return ' '.join(texte.casefold().split())
+    decompose = unicodedata.normalize('NFKD', texte)
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.casefold().split())
+
+
+def expression_fts(requete: str) -> Optional[str]:
+    """Transformer une saisie libre en expression MATCH FTS5 sûre.
+
+    Chaque mot devient un terme entre guillemets recherché par préfixe,
+    tous les mots étant requis. Retourne None si la saisie est vide.
+    """
+    mots = re.findall(r'\w+', normaliser_texte(requete) or '')
+    if not mots:
+        return None
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+def borne_prefixe(prefixe: str) -> str:
+    """Plus petite chaîne strictement supérieure à tout texte commençant par ``prefixe``."""
+    return prefixe[:-1] + chr(ord(prefixe[-1]) + 1)
@@ -0,0 +1,89 @@
+"""
+Fixtures communes des tests : base SQLite temporaire et annonces d'exemple
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database  # noqa: E402
+
+
+@pytest.fixture
+def chemin_base(tmp_path) -> str:
+    return str(tmp_path / 'test.db')
+
+
+@pytest.fixture(params=['standard', 'performance'])
+def db(request, chemin_base) -> Database:
+    """Base vide, dans chacun des deux profils."""
+    base = Database(chemin_base, profil=request.param)
+    yield base
+    base.fermer()
+
+
+@pytest.fixture
+def fabrique_annonce() -> Callable[..., Dict[str, Any]]:
+    """Données d'annonce au format d'``ajouter_annonce``, complétées par ``modifications``."""
+    def fabriquer(**modifications: Any) -> Dict[str, Any]:
+        donnees = {
+            'titre': 'Villa 4 chambres avec piscine',
+            'description': 'Belle villa climatisée, quartier calme, gardiennage.',
+            'categorie': 'immobilier',
+            'type_annonce': 'location',
+            'prix': 750_000,
+            'localisation': 'Batterie IV',
+            'ville': 'Libreville',
+            'contact_nom': 'Mbadinga',
+            'contact_telephone': '+241 06 00 00 00',
+            'statut': 'publie',
+            'donnees_specifiques': {'type_bien': 'Villa', 'nombre_chambres': 4, 'surface': 220},
+        }
+        donnees.update(modifications)
+        return donnees
+
+    return fabriquer
+
+
+@pytest.fixture
+def fuseau_libreville(monkeypatch):
+    """Heure locale UTC+1, pour distinguer heure locale et UTC."""
+    monkeypatch.setenv('TZ', 'Africa/Libreville')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def lancer_threads() -> Callable[[int, Callable[[], Any]], None]:
+    """Lancer ``cible`` dans ``threads`` threads partis ensemble, et les attendre.
+
+    La première exception levée par un thread est relevée dans le test.
+    """
+    def lancer(threads: int, cible: Callable[[], Any]) -> None:
+        depart = threading.Barrier(threads)
+        erreurs = []
+
+        def travailleur() -> None:
+            depart.wait()
+            try:
+                cible()
+            except BaseException as exc:
+                erreurs.append(exc)
+
+        fils = [threading.Thread(target=travailleur) for _ in range(threads)]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+        if erreurs:
+            raise erreurs[0]
+
+    return lancer
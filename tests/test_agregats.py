@@ -0,0 +1,38 @@
+"""
+Compactage des événements analytics en agrégats
+"""
+
+import pytest
+
+EVENEMENTS = 20_000
+
+
+@pytest.fixture
+def db_evenements(db, fabrique_annonce):
+    annonce_id = db.ajouter_annonce(fabrique_annonce())
+    db._ecrire(lambda conn: conn.executemany(
+        "INSERT INTO analytics (annonce_id, type_evenement) VALUES (?, 'vue')",
+        [(annonce_id,)] * EVENEMENTS,
+    ))
+    return db
+
+
+def _totaux(db):
+    with db.connexion() as conn:
+        return {table: conn.execute(f"SELECT SUM(total) FROM {table}").fetchone()[0]
+                for table in ('analytics_horaire', 'analytics_journalier')}
+
+
+def test_compactage_compte_chaque_evenement_une_fois(db_evenements):
+    assert db_evenements.compacter_analytics() == EVENEMENTS
+    assert db_evenements.compacter_analytics() == 0
+    assert _totaux(db_evenements) == {'analytics_horaire': EVENEMENTS, 'analytics_journalier': EVENEMENTS}
+
+
+def test_compactages_concurrents_sans_double_comptage(db_evenements, lancer_threads):
+    db_evenements._agregats.taille_lot = 1000
+    avances = []
+    lancer_threads(4, lambda: avances.append(db_evenements.compacter_analytics()))
+
+    assert sum(avances) == EVENEMENTS
+    assert _totaux(db_evenements) == {'analytics_horaire': EVENEMENTS, 'analytics_journalier': EVENEMENTS}
@@ -0,0 +1,31 @@
+"""
+Façade asynchrone : même surface que Database, en coroutines
+"""
+
+import asyncio
+import inspect
+
+from models.async_database import METHODES_SYNCHRONES, AsyncDatabase
+from models.database import Database
+
+
+def test_surface_asynchrone_identique_a_database():
+    publiques = {nom for nom, attribut in vars(Database).items()
+                 if inspect.isfunction(attribut) and not nom.startswith('_')}
+    assert METHODES_SYNCHRONES <= publiques
+    for nom in publiques - METHODES_SYNCHRONES:
+        methode = getattr(AsyncDatabase, nom, None)
+        assert inspect.iscoroutinefunction(methode), nom
+        assert inspect.signature(methode) == inspect.signature(getattr(Database, nom)), nom
+
+
+def test_appel_asynchrone(db, fabrique_annonce):
+    async def scenario():
+        facade = AsyncDatabase(db)
+        annonce_id = await facade.ajouter_annonce(fabrique_annonce())
+        annonce = await facade.obtenir_annonce_par_id(annonce_id)
+        await facade.fermer()
+        return annonce_id, annonce
+
+    annonce_id, annonce = asyncio.run(scenario())
+    assert annonce['id'] == annonce_id
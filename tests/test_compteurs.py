@@ -0,0 +1,83 @@
+"""
+Compteurs accumulés en mémoire : répartition par thread, vidage concurrent, lectures
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from models.compteurs import CompteursAccumules
+from models.database import Database
+
+
+def test_threads_repartis_sur_les_fragments():
+    compteurs = CompteursAccumules(lambda operation: None, fragments=16, intervalle=None)
+    depart = threading.Barrier(16)
+
+    def travailleur() -> None:
+        depart.wait()
+        compteurs.incrementer(1, 'vues')
+
+    fils = [threading.Thread(target=travailleur) for _ in range(16)]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    assert sum(1 for fragment in compteurs._fragments if fragment) == 16
+
+
+@pytest.mark.parametrize('profil', ['standard', 'performance'])
+def test_increments_concurrents_comptes_une_fois(chemin_base, fabrique_annonce, profil):
+    with Database(chemin_base, profil=profil, intervalle_compteurs=0.005) as db:
+        annonce_id = db.ajouter_annonce(fabrique_annonce())
+        lus = []
+        fin = threading.Event()
+
+        def lecteur() -> None:
+            while not fin.is_set():
+                lus.append(db.obtenir_annonce_par_id(annonce_id)['vues'])
+
+        def ecrivain() -> None:
+            for _ in range(200):
+                db.incrementer_vues(annonce_id)
+
+        fil_lecteur = threading.Thread(target=lecteur)
+        fil_lecteur.start()
+        ecrivains = [threading.Thread(target=ecrivain) for _ in range(8)]
+        for fil in ecrivains:
+            fil.start()
+        for fil in ecrivains:
+            fil.join()
+        fin.set()
+        fil_lecteur.join()
+        db.vider_tampons()
+
+        assert db.obtenir_annonce_par_id(annonce_id)['vues'] == 1600
+        # Un delta compté deux fois ferait dépasser le total ou redescendre une lecture
+        assert lus == sorted(lus) and lus[-1] <= 1600
+    with sqlite3.connect(chemin_base) as conn:
+        assert conn.execute("SELECT vues FROM annonces WHERE id = ?", (annonce_id,)).fetchone()[0] == 1600
+
+
+@pytest.mark.parametrize('profil', ['standard', 'performance'])
+def test_lecture_non_bloquee_par_un_vidage_en_attente_de_verrou(chemin_base, fabrique_annonce, profil):
+    with Database(chemin_base, profil=profil, intervalle_compteurs=3600) as db:
+        annonce_id = db.ajouter_annonce(fabrique_annonce())
+        for _ in range(3):
+            db.incrementer_vues(annonce_id)
+
+        autre = sqlite3.connect(chemin_base, isolation_level=None)
+        autre.execute("BEGIN IMMEDIATE")  # un autre processus tient le verrou d'écriture
+        vidage = threading.Thread(target=db.vider_tampons)
+        vidage.start()
+        time.sleep(0.2)
+        debut = time.perf_counter()
+        assert db.obtenir_annonce_par_id(annonce_id)['vues'] == 3
+        assert time.perf_counter() - debut < 0.1
+        autre.execute("ROLLBACK")
+        autre.close()
+        vidage.join()
+
+        assert db.obtenir_annonce_par_id(annonce_id)['vues'] == 3
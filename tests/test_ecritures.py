@@ -0,0 +1,57 @@
+"""
+Écritures transactionnelles de Database._ecrire sous concurrence
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from models.connexions import EcrivainUnique
+
+
+def test_lecture_puis_ecriture_atomique(db, lancer_threads):
+    db.set_setting('compteur', '0')
+
+    def incrementer(conn: sqlite3.Connection) -> None:
+        valeur = int(conn.execute("SELECT valeur FROM settings WHERE cle = 'compteur'").fetchone()[0])
+        time.sleep(0.001)  # élargit la fenêtre entre lecture et écriture
+        conn.execute("UPDATE settings SET valeur = ? WHERE cle = 'compteur'", (str(valeur + 1),))
+
+    lancer_threads(8, lambda: [db._ecrire(incrementer) for _ in range(25)])
+
+    with db.connexion() as conn:
+        assert conn.execute("SELECT valeur FROM settings WHERE cle = 'compteur'").fetchone()[0] == '200'
+
+
+def test_echec_annule_toute_l_operation(db):
+    db.set_setting('cle', 'avant')
+
+    def echouer(conn: sqlite3.Connection) -> None:
+        conn.execute("UPDATE settings SET valeur = 'pendant' WHERE cle = 'cle'")
+        raise RuntimeError("échec simulé")
+
+    with pytest.raises(RuntimeError):
+        db._ecrire(echouer)
+    with db.connexion() as conn:
+        assert conn.execute("SELECT valeur FROM settings WHERE cle = 'cle'").fetchone()[0] == 'avant'
+
+
+def test_ouverture_echouee_levee_par_le_constructeur(chemin_base):
+    with pytest.raises(sqlite3.OperationalError):
+        EcrivainUnique(chemin_base, pragmas={'journal_mode': 'WAL WAL'})
+
+
+def test_ecrivain_arrete_sur_erreur_fait_echouer_les_ecritures(chemin_base, monkeypatch):
+    ecrivain = EcrivainUnique(chemin_base)
+
+    def planter(conn: sqlite3.Connection, lot: list) -> None:
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(ecrivain, '_executer_lot', planter)
+    futur = ecrivain.soumettre(lambda conn: conn.execute("CREATE TABLE t (x)"))
+    with pytest.raises(sqlite3.OperationalError, match='disk I/O'):
+        futur.result(timeout=5)
+    with pytest.raises(sqlite3.OperationalError, match='disk I/O'):
+        ecrivain.executer(lambda conn: None)
+    ecrivain.fermer()
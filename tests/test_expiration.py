@@ -0,0 +1,33 @@
+"""
+Expiration planifiée : dates d'expiration modifiées, normalisées en UTC
+"""
+
+from datetime import datetime, timedelta, timezone
+
+
+def _statut(db, annonce_id: int) -> str:
+    return db.obtenir_annonce_par_id(annonce_id)['statut']
+
+
+def test_expiration_modifiee_au_format_iso(db, fabrique_annonce):
+    annonce_id = db.ajouter_annonce(fabrique_annonce())
+    echeance = datetime.now(timezone.utc) - timedelta(minutes=30)
+    db.mettre_a_jour_annonce(annonce_id, {'date_expiration': echeance.isoformat()})
+
+    assert db.expirer_annonces() == 1
+    assert _statut(db, annonce_id) == 'expire'
+
+
+def test_expiration_modifiee_en_heure_locale(db, fabrique_annonce, fuseau_libreville):
+    passee = db.ajouter_annonce(fabrique_annonce(titre='Passée'))
+    future = db.ajouter_annonce(fabrique_annonce(titre='Future'))
+    # datetime naïf : heure locale de Libreville (UTC+1), à convertir en UTC
+    db.mettre_a_jour_annonce(passee, {'date_expiration': datetime.now() - timedelta(minutes=30)})
+    db.mettre_a_jour_annonce(future, {'date_expiration': datetime.now() + timedelta(minutes=30)})
+
+    assert db.expirer_annonces() == 1
+    assert (_statut(db, passee), _statut(db, future)) == ('expire', 'publie')
+    with db.connexion() as conn:
+        stockee = conn.execute("SELECT date_expiration FROM annonces WHERE id = ?", (future,)).fetchone()[0]
+    attendue = datetime.now(timezone.utc) + timedelta(minutes=30)
+    assert abs(datetime.fromisoformat(stockee).replace(tzinfo=timezone.utc) - attendue) < timedelta(minutes=1)
@@ -0,0 +1,174 @@
+"""
+Comptes par facette : statut par défaut, bitmaps conformes au calcul SQL et tenus à jour
+"""
+
+import random
+from array import array
+
+import pytest
+
+from models import facettes
+from models.database import Database
+
+VILLES = ['Libreville', 'LIBREVILLE', 'Lambaréné', 'lambarene', 'Port-Gentil', 'Franceville', 'Oyem']
+SPECIFIQUES = {
+    'immobilier': lambda alea: {
+        'type_bien': alea.choice(['Villa', 'villa', 'Appartement', 'Studio']),
+        'nombre_chambres': alea.randint(1, 6),
+        'surface': alea.choice([round(alea.uniform(20, 400), 1), 'inconnue', None]),
+    },
+    'vehicules': lambda alea: {
+        'marque': alea.choice(['Toyota', 'TOYOTA', 'Nissan', 'Hyundai']),
+        'annee': alea.randint(2005, 2024),
+        'kilometrage': alea.randint(0, 300_000),
+        'carburant': alea.choice(['Diesel', 'Essence']),
+        'transmission': alea.choice(['Manuelle', 'Automatique']),
+    },
+    'informatique': lambda alea: {
+        'marque': alea.choice(['HP', 'Dell', 'Samsung']),
+        'type_materiel': alea.choice(['ordinateur', 'smartphone', 'tablette']),
+        'memoire_ram': alea.choice([4, 8, 16, 32]),
+        'stockage': alea.choice([128, 256, 512, 1000]),
+    },
+}
+
+# Filtres qui ne passent pas par la table de comptes
+CAS = [
+    {'marque': 'toyota'},
+    {'categorie': 'vehicules', 'marque': 'Toyota', 'annee_min': 2015, 'kilometrage_max': 100_000},
+    {'categorie': 'immobilier', 'type_bien': 'VILLA', 'chambres_min': 3, 'ville': 'lib'},
+    {'categorie': 'informatique', 'type_materiel': 'smartphone', 'memoire_ram_min': 8, 'statut': 'expire'},
+    {'prix_max': 2_000_000},
+    {'prix_min': 123_456, 'prix_max': 9_876_543, 'type_annonce': 'vente'},
+    {'prix_min': 250_000, 'prix_max': 5_000_000, 'tranche_prix': 5},
+    {'surface_min': 100, 'surface_max': 250.5},
+    {'annee_max': 2010, 'ville': 'Lambaréné', 'ville_exacte': True},
+    {'stockage_min': 300, 'carburant': 'diesel'},
+    {'transmission': 'Automatique', 'tranche_prix': 7, 'ville': 'port'},
+    {'marque': 'Renault'},
+]
+
+
+def _donnees(alea: random.Random, fabrique_annonce, titre: str) -> dict:
+    categorie = alea.choice(list(SPECIFIQUES))
+    return fabrique_annonce(
+        titre=titre, categorie=categorie, type_annonce=alea.choice(['vente', 'location']),
+        prix=alea.choice([alea.randint(1, 150) * 100_000, alea.choice(facettes.BORNES_PRIX), 49_999.5]),
+        ville=alea.choice(VILLES), statut=alea.choice(['publie', 'publie', 'brouillon', 'expire']),
+        donnees_specifiques=SPECIFIQUES[categorie](alea),
+    )
+
+
+@pytest.fixture
+def catalogue(db, fabrique_annonce) -> Database:
+    alea = random.Random(21)
+    db.ajouter_annonces_bulk(_donnees(alea, fabrique_annonce, f'Annonce {n}') for n in range(400))
+    return db
+
+
+def reference(db: Database, filtres: dict) -> dict:
+    """Comptes recalculés en SQL, facette par facette, sans table de comptes ni bitmaps."""
+    filtres = dict(filtres)
+    if not filtres.get('statut'):
+        filtres['statut'] = 'publie'
+    expressions = {'categorie': 'categorie', 'type_annonce': 'type_annonce',
+                   'ville': "COALESCE(ville_normalisee, '')", 'tranche_prix': facettes.expression_tranche()}
+    comptes = {}
+    for facette, (_, cles) in facettes.FACETTES.items():
+        conditions, params = db._construire_filtres({cle: valeur for cle, valeur in filtres.items()
+                                                    if cle not in cles})
+        libelle = 'MIN(ville)' if facette == 'ville' else 'NULL'
+        with db.connexion() as conn:
+            comptes[facette] = [tuple(row) for row in conn.execute(f"""
+                SELECT {expressions[facette]}, {libelle}, COUNT(*) FROM annonces
+                WHERE {' AND '.join(conditions)} GROUP BY 1
+            """, params)]
+    return facettes.formater(comptes)
+
+
+def test_statut_publie_par_defaut(catalogue):
+    publiees = catalogue.compter_facettes({'statut': 'publie'})
+    assert catalogue.compter_facettes() == publiees
+    assert catalogue.compter_facettes({}) == publiees
+    with catalogue.connexion() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM annonces WHERE statut = 'publie'").fetchone()[0]
+    assert sum(entree['total'] for entree in publiees['categorie']) == total
+
+
+@pytest.mark.parametrize('filtres', CAS, ids=str)
+def test_bitmaps_conformes_au_sql(catalogue, filtres):
+    assert catalogue.compter_facettes(filtres) == reference(catalogue, filtres)
+
+
+def test_bitmaps_suivent_les_ecritures(catalogue, fabrique_annonce, chemin_base):
+    for filtres in CAS:
+        catalogue.compter_facettes(filtres)  # bitmaps construits
+    alea = random.Random(5)
+    ids = alea.sample(range(1, 401), 60)
+    for annonce_id in ids[:20]:
+        catalogue.mettre_a_jour_annonce(annonce_id, {'statut': 'publie', 'prix': alea.randint(1, 90) * 77_777})
+    for annonce_id in ids[20:40]:
+        categorie = alea.choice(list(SPECIFIQUES))
+        catalogue.mettre_a_jour_annonce(annonce_id, {
+            'categorie': categorie, 'ville': alea.choice(VILLES),
+            'donnees_specifiques': {**SPECIFIQUES[categorie](alea), 'annee': 1999, 'memoire_ram': 'beaucoup'},
+        })
+    catalogue._ecrire(lambda conn: conn.executemany("DELETE FROM annonces WHERE id = ?",
+                                                    [(annonce_id,) for annonce_id in ids[40:]]))
+    # Écritures d'une autre connexion, comme d'un autre processus
+    autre = Database(chemin_base)
+    try:
+        for n in range(30):
+            autre.ajouter_annonce(_donnees(alea, fabrique_annonce, f'Nouvelle {n}'))
+    finally:
+        autre.fermer()
+
+    for filtres in CAS:
+        assert catalogue.compter_facettes(filtres) == reference(catalogue, filtres), filtres
+
+
+def test_bitmaps_reconstruits_apres_import_differe(catalogue, fabrique_annonce):
+    filtres = {'categorie': 'vehicules', 'annee_min': 2012}
+    catalogue.compter_facettes(filtres)
+    alea = random.Random(8)
+    catalogue.ajouter_annonces_bulk((_donnees(alea, fabrique_annonce, f'Import {n}') for n in range(200)),
+                                    differer_index=True)
+    with catalogue.connexion() as conn:
+        marques = conn.execute("SELECT COUNT(*) FROM facettes_journal WHERE annonce_id IS NULL").fetchone()[0]
+    assert marques == 1
+    for filtres in CAS:
+        assert catalogue.compter_facettes(filtres) == reference(catalogue, filtres), filtres
+
+
+@pytest.mark.parametrize('distinctes', [10, 1000])
+def test_seuils_conformes_aux_comparaisons(distinctes):
+    alea = random.Random(distinctes)
+    lignes = {i: alea.choice([alea.randint(0, distinctes - 1), None, 'texte']) for i in range(1, 3000)}
+    valeurs = array('d', [float('nan')]) * 3000
+    par_valeur, textes = {}, []
+    for i, valeur in lignes.items():
+        if isinstance(valeur, int):
+            valeurs[i] = valeur
+            par_valeur[valeur] = par_valeur.get(valeur, 0) | 1 << i
+        elif valeur is not None:
+            textes.append(i)
+    seuils = facettes.Seuils.construire(
+        par_valeur if len(par_valeur) <= facettes.SEUILS_MAX else None, valeurs, facettes._bitmap(textes))
+    modifiees = {i: alea.choice([alea.randint(0, distinctes + 5), None, 'texte']) for i in alea.sample(range(1, 3100), 200)}
+    assert seuils.mettre_a_jour(~facettes._bitmap(list(modifiees)), modifiees)
+    lignes.update(modifiees)
+
+    def attendu(operateur, borne):
+        # Ordre de SQLite : NULL exclu, tout texte au-dessus des nombres
+        def vrai(valeur):
+            if valeur is None:
+                return False
+            if isinstance(valeur, str):
+                return operateur in ('>=', '>')
+            return {'>=': valeur >= borne, '>': valeur > borne,
+                    '<=': valeur <= borne, '<': valeur < borne}[operateur]
+        return facettes._bitmap([i for i, valeur in lignes.items() if vrai(valeur)])
+
+    for borne in (-1, 0, 3, 4.5, distinctes // 2, distinctes - 1, distinctes + 10):
+        for operateur in ('>=', '>', '<=', '<'):
+            assert seuils.comparer(operateur, borne) == attendu(operateur, borne), (operateur, borne)
@@ -0,0 +1,107 @@
+"""
+Import en masse : horodatages UTC et index différés rétablis après un arrêt
+"""
+
+import time
+
+import pytest
+
+from models import doublons
+from models.annonce_models import annonce_depuis_dict
+from models.database import Database
+
+
+def _dates_creation(db: Database):
+    with db.connexion() as conn:
+        return dict(conn.execute("SELECT titre, date_creation FROM annonces").fetchall())
+
+
+def test_date_creation_en_utc_quelle_que_soit_l_entree(db, fabrique_annonce, fuseau_libreville):
+    modele = annonce_depuis_dict(fabrique_annonce(titre='Modèle'))
+    modele.date_creation = modele.date_creation.replace(2026, 3, 1, 10, 0, 0, 0)
+    db.ajouter_annonces_bulk([
+        modele,
+        fabrique_annonce(titre='Dictionnaire', date_creation='2026-03-01 10:00:00'),
+        fabrique_annonce(titre='Avec fuseau', date_creation='2026-03-01T10:00:00+01:00'),
+    ])
+    dates = _dates_creation(db)
+    assert dates == {
+        'Modèle': '2026-03-01 09:00:00',
+        'Dictionnaire': '2026-03-01 10:00:00',
+        'Avec fuseau': '2026-03-01 09:00:00',
+    }
+
+
+def test_date_par_defaut_comparable_a_ajouter_annonce(db, fabrique_annonce, fuseau_libreville):
+    db.ajouter_annonce(fabrique_annonce(titre='Unitaire'))
+    db.ajouter_annonces_bulk([annonce_depuis_dict(fabrique_annonce(titre='Modèle'))])
+    dates = _dates_creation(db)
+    assert abs((_en_secondes(dates['Modèle']) - _en_secondes(dates['Unitaire']))) < 60
+
+
+def _en_secondes(horodatage: str) -> float:
+    return time.mktime(time.strptime(horodatage, '%Y-%m-%d %H:%M:%S'))
+
+
+def test_date_invalide_refusee(db, fabrique_annonce):
+    with pytest.raises(ValueError, match='n°0'):
+        db.ajouter_annonces_bulk([fabrique_annonce(date_creation='hier')])
+
+
+def _schema(db: Database):
+    with db.connexion() as conn:
+        return {tuple(row) for row in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name = 'annonces' AND sql IS NOT NULL")}
+
+
+@pytest.mark.parametrize('profil', ['standard', 'performance'])
+def test_index_differes_retablis_apres_un_arret_brutal(chemin_base, fabrique_annonce, monkeypatch, profil):
+    db = Database(chemin_base, profil=profil)
+    db.ajouter_annonce(fabrique_annonce(titre='Existante'))
+    schema = _schema(db)
+
+    def arret_brutal():
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(db, '_retablir_index', arret_brutal)
+    with pytest.raises(KeyboardInterrupt):
+        db.ajouter_annonces_bulk(
+            (fabrique_annonce(titre=f'Studio meublé {n}', ville='Port-Gentil') for n in range(50)),
+            differer_index=True, taille_lot=20,
+        )
+    assert _schema(db) < schema
+    db.fermer()
+
+    db = Database(chemin_base, profil=profil)
+    try:
+        assert _schema(db) == schema
+        assert len(db.rechercher_annonces('studio', limit=100)) == 50
+        villes = {v['valeur']: v['total'] for v in db.compter_facettes({'statut': 'publie'})['ville']}
+        assert villes == {'Libreville': 1, 'Port-Gentil': 50}
+        with db.connexion() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM annonces_signatures").fetchone()[0] == 51
+            assert conn.execute("SELECT COUNT(*) FROM objets_suspendus").fetchone()[0] == 0
+    finally:
+        db.fermer()
+
+
+def test_empreintes_rattachees_malgre_des_insertions_concurrentes(db, fabrique_annonce, lancer_threads):
+    def importer() -> None:
+        db.ajouter_annonces_bulk(
+            (fabrique_annonce(titre=f'Import {n}', description=f'Lot importé numéro {n}') for n in range(300)),
+            taille_lot=25,
+        )
+
+    def ajouter() -> None:
+        for n in range(60):
+            db.ajouter_annonce(fabrique_annonce(titre=f'Saisie {n}', description=f'Annonce saisie numéro {n}'))
+
+    taches = iter([importer, ajouter, ajouter])
+    lancer_threads(3, lambda: next(taches)())
+
+    colonnes = ', '.join(doublons.COLONNES_SIGNATURE)
+    with db.connexion() as conn:
+        lignes = [tuple(row) for row in conn.execute(f"SELECT {colonnes} FROM annonces ORDER BY id")]
+        enregistrees = doublons.lire_signatures(conn, [ligne[0] for ligne in lignes])
+    assert len(lignes) == 420
+    assert dict(doublons.signer_lignes(lignes)) == enregistrees
@@ -0,0 +1,23 @@
+"""
+Instrumentation : décodage JSON des annonces paresseuses
+"""
+
+from models.database import Database
+from models.instrumentation import Instrumentation
+
+
+def test_decodage_paresseux_mesure(chemin_base, fabrique_annonce):
+    instrumentation = Instrumentation()
+    db = Database(chemin_base, instrumentation=instrumentation)
+    try:
+        db.ajouter_annonce(fabrique_annonce())
+        annonces = db.obtenir_annonces(decodage_paresseux=True)
+        assert instrumentation.instantane()['json_differe']['appels'] == 0
+
+        assert annonces[0]['donnees_specifiques']['type_bien'] == 'Villa'
+        assert annonces[0]['photos'] == []
+        differe = instrumentation.instantane()['json_differe']
+        assert differe['appels'] == 2 and differe['duree_json'] > 0
+        assert 'immo_gabon_db_json_differe_secondes_total' in instrumentation.exposition_prometheus()
+    finally:
+        db.fermer()
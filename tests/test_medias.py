@@ -0,0 +1,88 @@
+"""
+Quota des variantes d'images : éviction LRU, miniatures affichées conservées
+"""
+
+import json
+import os
+
+import pytest
+
+from models import medias
+from models.database import Database
+from models.medias import DepotMedias
+
+OCTETS = 100
+
+
+def _variantes(depot: DepotMedias, *empreintes: str, nom: str = 'miniature.webp') -> list:
+    """Fichiers de variante factices, du plus ancien au plus récent."""
+    chemins = []
+    for rang, empreinte in enumerate(empreintes):
+        chemin = depot.chemin_variante(empreinte, nom)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, 'wb') as fichier:
+            fichier.write(b'x' * OCTETS)
+        os.utime(chemin, (1_000_000 + rang, 1_000_000 + rang))
+        chemins.append(chemin)
+    return chemins
+
+
+def test_eviction_des_moins_recemment_utilisees(tmp_path):
+    depot = DepotMedias(str(tmp_path), quota_octets=2 * OCTETS)
+    a, b, c = _variantes(depot, 'aa01', 'bb02', 'cc03')
+    depot.marquer_utilisees([a])
+
+    assert depot.appliquer_quota() == OCTETS
+    assert [os.path.exists(chemin) for chemin in (a, b, c)] == [True, False, True]
+    assert depot.appliquer_quota() == 0
+
+
+def test_variantes_epinglees_conservees(tmp_path):
+    depot = DepotMedias(str(tmp_path), quota_octets=OCTETS)
+    a, b, c = _variantes(depot, 'aa01', 'bb02', 'cc03')
+
+    assert depot.appliquer_quota(epinglee=lambda chemin: chemin == a) == 2 * OCTETS
+    assert [os.path.exists(chemin) for chemin in (a, b, c)] == [True, False, False]
+    # Tout est épinglé : rien à supprimer, pas de boucle sans fin
+    depot.quota_octets = 0
+    assert depot.appliquer_quota(epinglee=lambda chemin: True) == 0
+
+
+def test_dossier_parcouru_une_seule_fois(tmp_path, monkeypatch):
+    parcours = []
+    parcourir = os.walk
+    monkeypatch.setattr(medias.os, 'walk', lambda *args: parcours.append(args) or parcourir(*args))
+    depot = DepotMedias(str(tmp_path), quota_octets=OCTETS)
+    _variantes(depot, 'aa01', 'bb02')
+    for _ in range(3):
+        depot.appliquer_quota()
+    assert len(parcours) == 1
+
+
+@pytest.mark.parametrize('profil', ['standard', 'performance'])
+def test_miniature_affichee_jamais_evincee(tmp_path, fabrique_annonce, profil):
+    depot = DepotMedias(str(tmp_path / 'uploads'), quota_octets=2 * OCTETS)
+    db = Database(str(tmp_path / 'test.db'), profil=profil, depot_medias=depot)
+    try:
+        miniature, moyenne, autre = (
+            _variantes(depot, 'aa01') + _variantes(depot, 'aa01', nom='moyenne.webp') + _variantes(depot, 'cc03'))
+        photo = os.path.join(str(tmp_path), 'uploads', 'originaux', 'aa', 'aa01.jpg')
+        annonce_id = db.ajouter_annonce(fabrique_annonce(photos=[photo]))
+        entree = {'empreinte': 'aa01', 'variantes': {
+            'miniature.webp': {'chemin': miniature}, 'moyenne.webp': {'chemin': moyenne}}}
+        db._ecrire(lambda conn: conn.execute(
+            "UPDATE annonces SET medias = ?, miniature = ? WHERE id = ?",
+            (json.dumps({photo: entree}), miniature, annonce_id)))
+        db._invalider_annonces([annonce_id])
+
+        db.obtenir_annonce_par_id(annonce_id)  # consultation : moyenne.webp redevient récente
+        depot.appliquer_quota(db._miniature_referencee)
+        assert [os.path.exists(chemin) for chemin in (miniature, moyenne, autre)] == [True, True, False]
+
+        depot.quota_octets = 0
+        depot.appliquer_quota(db._miniature_referencee)
+        assert [os.path.exists(chemin) for chemin in (miniature, moyenne)] == [True, False]
+        assert db.obtenir_variante(annonce_id, photo) == miniature
+        assert db.obtenir_variante(annonce_id, 'inconnue.jpg') is None
+    finally:
+        db.fermer()
@@ -0,0 +1,30 @@
+"""
+Pagination à curseur (keyset) d'obtenir_annonces_par_curseur
+"""
+
+import pytest
+
+
+def test_parcours_identique_a_offset(db, fabrique_annonce):
+    for numero in range(23):
+        db.ajouter_annonce(fabrique_annonce(titre=f"Annonce {numero}"))
+
+    pages, curseur = [], None
+    while True:
+        annonces, curseur = db.obtenir_annonces_par_curseur({'statut': 'publie'}, limit=5, curseur=curseur)
+        pages.extend(annonce['id'] for annonce in annonces)
+        if curseur is None:
+            break
+    attendus = [annonce['id'] for annonce in db.obtenir_annonces({'statut': 'publie'}, limit=100)]
+    assert pages == attendus and len(pages) == 23
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_taille_de_page_invalide(db, limit):
+    with pytest.raises(ValueError):
+        db.obtenir_annonces_par_curseur({'statut': 'publie'}, limit=limit)
+
+
+def test_curseur_invalide(db):
+    with pytest.raises(ValueError):
+        db.obtenir_annonces_par_curseur({'statut': 'publie'}, curseur='pas-un-curseur!')
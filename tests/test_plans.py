@@ -0,0 +1,69 @@
+"""
+Plans d'exécution (EXPLAIN QUERY PLAN) des formes de filtre courantes
+
+Une forme qui n'utilise plus l'index attendu, ou retombe sur un tri
+temporaire ou un parcours complet, fait échouer le test.
+"""
+
+import pytest
+
+from models.database import REQUETE_MINIATURE_REFERENCEE, Database
+from models.expiration import REQUETE_ECHUES
+
+# (filtres, index attendu, tri temporaire toléré)
+PLANS_ATTENDUS = [
+    ({'statut': 'publie'}, 'idx_annonces_statut_date', False),
+    ({'categorie': 'immobilier'}, 'idx_publie_categorie_date', False),
+    ({'categorie': 'vehicules', 'type_annonce': 'vente'}, 'idx_publie_categorie_type_date', False),
+    ({'type_annonce': 'location'}, 'idx_publie_type_date', False),
+    ({'categorie': 'vehicules', 'prix_min': 1_000_000, 'prix_max': 5_000_000}, 'idx_publie_categorie_prix', True),
+    ({'ville': 'Lambaréné', 'ville_exacte': True}, 'idx_publie_ville_date', False),
+    ({'ville': 'port'}, 'idx_annonces_statut_date', False),
+    ({'statut': 'brouillon'}, 'idx_annonces_statut_date', False),
+    ({'categorie': 'vehicules', 'marque': 'Toyota', 'annee_min': 2015, 'kilometrage_max': 100_000},
+     'idx_publie_vehicules', True),
+    ({'categorie': 'immobilier', 'type_bien': 'Villa', 'chambres_min': 3}, 'idx_publie_immobilier', True),
+    ({'categorie': 'informatique', 'type_materiel': 'smartphone', 'memoire_ram_min': 8},
+     'idx_publie_informatique', True),
+]
+
+
+@pytest.fixture(scope='module')
+def db_plans(tmp_path_factory):
+    base = Database(str(tmp_path_factory.mktemp('plans') / 'plans.db'))
+    yield base
+    base.fermer()
+
+
+def ecarts(texte: str, index: str, tri_tolere: bool) -> list:
+    """Écarts entre un plan (détails joints par « | ») et l'index attendu."""
+    constates = []
+    if f"INDEX {index} " not in texte + ' ':  # USING INDEX ou USING COVERING INDEX
+        constates.append(f"index {index} attendu")
+    if not tri_tolere and 'TEMP B-TREE' in texte:
+        constates.append("tri temporaire inattendu")
+    if 'SCAN annonces' in texte:
+        constates.append("parcours complet de la table")
+    return constates
+
+
+@pytest.mark.parametrize('filtres, index, tri_tolere', PLANS_ATTENDUS, ids=lambda valeur: str(valeur))
+def test_plan_obtenir_annonces(db_plans, filtres, index, tri_tolere):
+    texte = ' | '.join(db_plans.expliquer_requete(filtres))
+    assert ecarts(texte, index, tri_tolere) == [], texte
+
+
+def test_plan_annonces_echues(db_plans):
+    with db_plans.connexion() as conn:
+        plan = [row['detail'] for row in conn.execute(
+            "EXPLAIN QUERY PLAN " + REQUETE_ECHUES, ('2024-01-01 00:00:00', 500))]
+    texte = ' | '.join(plan)
+    assert ecarts(texte, 'idx_annonces_statut_expiration', False) == [], texte
+
+
+def test_plan_miniature_referencee(db_plans):
+    with db_plans.connexion() as conn:
+        plan = [row['detail'] for row in conn.execute(
+            "EXPLAIN QUERY PLAN " + REQUETE_MINIATURE_REFERENCEE, ('uploads/variantes/ab/ab_miniature.webp',))]
+    texte = ' | '.join(plan)
+    assert ecarts(texte, 'idx_annonces_miniature', False) == [], texte
@@ -0,0 +1,82 @@
+"""
+Stockage froid : pivot des analytics par tranches et archivage des annonces
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from models.database import Database
+
+
+def test_pivot_par_transactions_courtes(db, fabrique_annonce, monkeypatch):
+    annonce_id = db.ajouter_annonce(fabrique_annonce())
+    db._ecrire(lambda conn: conn.executemany(
+        "INSERT INTO analytics (annonce_id, type_evenement, timestamp) VALUES (?, 'vue', ?)",
+        [(annonce_id, f'2020-01-{jour:02d} 10:00:00') for jour in range(1, 26)] * 40,
+    ))
+    db.compacter_analytics()
+
+    commits = []
+    connecter = db._stockage._connecter
+
+    def connecter_trace() -> sqlite3.Connection:
+        conn = connecter()
+        conn.set_trace_callback(lambda requete: requete == 'COMMIT' and commits.append(requete))
+        return conn
+
+    monkeypatch.setattr(db._stockage, '_connecter', connecter_trace)
+    assert db._stockage.pivoter_analytics(taille_lot=100) == {'2020-01': 1000}
+    assert len(commits) == 11  # dix tranches pleines, puis la tranche vide qui termine
+
+    with db.connexion() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM analytics").fetchone()[0] == 0
+    assert len(db.obtenir_evenements('2020-01-01', '2020-02-01')) == 1000
+    assert db._stockage.pivoter_analytics(taille_lot=100) == {}
+
+
+def _utc(delta: timedelta, separateur: str = ' ') -> str:
+    return (datetime.now(timezone.utc) + delta).isoformat(sep=separateur, timespec='seconds')[:19]
+
+
+def test_archivage_compare_des_horodatages_normalises(db, fabrique_annonce):
+    ids = {nom: db.ajouter_annonce(fabrique_annonce(titre=nom, statut='expire'))
+           for nom in ('ancienne', 'ancienne_iso', 'recente', 'modifiee')}
+    dates = {
+        'ancienne': _utc(-timedelta(days=30, minutes=1)),
+        'ancienne_iso': _utc(-timedelta(days=30, minutes=1), 'T'),
+        'recente': _utc(-timedelta(days=29, hours=23)),
+    }
+    db._ecrire(lambda conn: conn.executemany(
+        "UPDATE annonces SET date_modification = ? WHERE id = ?",
+        [(date, ids[nom]) for nom, date in dates.items()],
+    ))
+    db.mettre_a_jour_annonce(ids['modifiee'], {'prix': 800_000})
+
+    bilan = db.maintenir_stockage(jours_archivage=30, vacuum=False)
+    assert sorted(bilan['annonces_archivees']) == sorted([ids['ancienne'], ids['ancienne_iso']])
+
+
+def test_date_modification_en_utc(db, fabrique_annonce, fuseau_libreville):
+    annonce_id = db.ajouter_annonce(fabrique_annonce())
+    db.mettre_a_jour_annonce(annonce_id, {'prix': 800_000})
+    with db.connexion() as conn:
+        modification = conn.execute(
+            "SELECT date_modification FROM annonces WHERE id = ?", (annonce_id,)).fetchone()[0]
+    ecart = datetime.now(timezone.utc).replace(tzinfo=None) - datetime.fromisoformat(modification)
+    assert abs(ecart) < timedelta(minutes=1)
+
+
+def test_migration_des_dates_locales(chemin_base, fabrique_annonce, fuseau_libreville):
+    db = Database(chemin_base)
+    annonce_id = db.ajouter_annonce(fabrique_annonce())
+    db._ecrire(lambda conn: conn.execute(
+        "UPDATE annonces SET date_modification = '2026-03-01T10:00:00.123456' WHERE id = ?", (annonce_id,)))
+    db._ecrire(lambda conn: conn.execute("PRAGMA user_version = 9"))
+    db.fermer()
+
+    db = Database(chemin_base)
+    try:
+        with db.connexion() as conn:
+            assert conn.execute("SELECT date_modification FROM annonces").fetchone()[0] == '2026-03-01 09:00:00'
+    finally:
+        db.fermer()